@@ -38,12 +38,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'import_export',
     'django_cron'
     
 ]
 
 MIDDLEWARE = [
+    # First, so that its timings include the other middleware
+    'import_export.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -146,4 +149,117 @@ CUSTOM_ADMIN_THEME_JS = 'custom_admin_theme/custom_admin.js'
 
 # Add custom admin theme CSS and JavaScript files to the admin interface
 
-ADMIN_BASE_TEMPLATE = 'admin/base.html'
\ No newline at end of file
+ADMIN_BASE_TEMPLATE = 'admin/base.html'
+
+# Kayak CSV import
+# Number of rows written per INSERT ... ON CONFLICT batch (one transaction per batch).
+
+KAYAK_IMPORT_CHUNK_SIZE = 5000
+
+# Number of CSV rows read, processed and written at a time. Bounds import memory use.
+
+KAYAK_IMPORT_READ_CHUNK_SIZE = 50000
+
+# Rows sharing a LeadId within a chunk are coalesced to the last of them before writing.
+# Up to this many conflicting LeadIds (duplicates that disagree) are reported for audit.
+
+KAYAK_DUPLICATE_SAMPLE_SIZE = 5
+
+# Worker processes of the admin and cron imports. With more than one, files are cut into
+# byte-range shards of about KAYAK_IMPORT_SHARD_BYTES and imported in parallel
+# (import_export.parallel_import); None means one per CPU, 1 imports in the calling process.
+
+KAYAK_IMPORT_WORKERS = 1
+KAYAK_IMPORT_SHARD_BYTES = 64 * 1024 * 1024
+
+# Rows fetched per round trip from the server-side cursor when exporting transactions
+
+KAYAK_EXPORT_CHUNK_SIZE = 2000
+
+# Above this many rows, the unfiltered transactions changelist shows PostgreSQL's row
+# estimate instead of counting the whole table
+
+KAYAK_ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Hotels and locations whose ids each import process keeps in memory, so that imports
+# only query the dimension tables for values they have not seen yet
+
+KAYAK_DIMENSION_CACHE_SIZE = 100000
+
+# Rows per record batch (and Parquet row group) in the Parquet / Arrow exports
+
+KAYAK_COLUMNAR_BATCH_SIZE = 50000
+
+# Uploads from the admin are spooled here until an import worker picks them up
+# (python manage.py process_import_jobs --loop, or the ImportJobCronJob below).
+
+KAYAK_IMPORT_SPOOL_DIR = BASE_DIR / 'import_spool'
+
+# A running import job records a heartbeat every KAYAK_IMPORT_JOB_HEARTBEAT_SECONDS. Jobs
+# without one for KAYAK_IMPORT_JOB_STALE_SECONDS lost their worker (killed, e.g. out of
+# memory) and are marked as failed; their spooled file is kept.
+
+KAYAK_IMPORT_JOB_HEARTBEAT_SECONDS = 30
+KAYAK_IMPORT_JOB_STALE_SECONDS = 300
+
+# FileProcessingCronJob imports every report dropped in the inbox, then moves it to the
+# archive, or to the quarantine if the import failed (change the paths)
+
+KAYAK_INBOX_DIR = BASE_DIR / 'kayak_reports' / 'inbox'
+KAYAK_ARCHIVE_DIR = BASE_DIR / 'kayak_reports' / 'archive'
+KAYAK_QUARANTINE_DIR = BASE_DIR / 'kayak_reports' / 'quarantine'
+
+# Reports modified within this many seconds, or whose last line is unterminated, may still be
+# being written: their complete lines are imported, but they stay in the inbox.
+
+KAYAK_INBOX_SETTLE_SECONDS = 60
+
+# Rows that fail validation are written here, with the reasons, one CSV per import job
+# or report (downloadable from the import job page in the admin)
+
+KAYAK_REJECTED_DIR = BASE_DIR / 'kayak_reports' / 'rejected'
+
+# Every import records the time, rows, queries and memory of its stages (shown on the import
+# job page and logged by the cron job). Set a directory to also profile each import with
+# cProfile: a .prof file is written there per import and the slowest functions are logged.
+
+KAYAK_IMPORT_PROFILE_DIR = None
+
+# Where `manage.py archive_partitions --archive` writes the dumped monthly partitions
+
+KAYAK_PARTITION_ARCHIVE_DIR = BASE_DIR / 'kayak_reports' / 'partition_archive'
+
+# Request metrics: every request's latency, query count and database time is recorded per
+# view, and requests slower than KAYAK_SLOW_REQUEST_SECONDS are logged. Queries slower than
+# KAYAK_SLOW_QUERY_SECONDS are logged and kept, normalized and with the code that ran them,
+# in a log of the KAYAK_SLOW_QUERY_LOG_SIZE most recent ones. Both are served in Prometheus
+# text format at /admin/metrics/ (staff only); each worker process keeps its own.
+
+KAYAK_SLOW_REQUEST_SECONDS = 2.0
+KAYAK_SLOW_QUERY_SECONDS = 0.5
+KAYAK_SLOW_QUERY_LOG_SIZE = 100
+
+# Cron jobs run by python manage.py runcrons
+
+CRON_CLASSES = [
+    'import_export.cron_jobs.FileProcessingCronJob',
+    'import_export.cron_jobs.ImportJobCronJob',
+]
+
+# Default import mode for the admin import and cron job: 'bulk' (batched upsert)
+# or 'copy' (PostgreSQL COPY into a staging table, for multi-million-row reports).
+
+KAYAK_IMPORT_MODE = 'bulk'
+
+# Import diagnostics (rejected rows, duplicates, failed batches) are logged to the console
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'import_export': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
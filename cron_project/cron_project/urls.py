@@ -3,13 +3,15 @@
 from django.contrib import admin
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from import_export.views import CustomAdminLoginView, DashboardView, home
+from import_export.views import CustomAdminLoginView, DashboardView, home, metrics
 
 # Override the default admin login view
 admin.site.login = CustomAdminLoginView.as_view()
 
 urlpatterns = [
+    # Before the admin URLs, whose catch-all view would otherwise answer these paths
+    path('admin/dashboard/', DashboardView.as_view(), name='admin_dashboard'),
+    path('admin/metrics/', metrics, name='admin_metrics'),
     path('admin/', admin.site.urls),
     path('', home, name="home"),
-    path('admin/dashboard/', DashboardView.as_view(), name='admin_dashboard'),
 ]
\ No newline at end of file
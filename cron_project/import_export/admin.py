@@ -1,20 +1,67 @@
 from django.contrib import admin, messages
 from django.shortcuts import render
-from django.http import HttpResponse, HttpResponseRedirect
-from django.urls import path
-from django.db.models.functions import TruncMonth
-from django.db.models import Sum
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, JsonResponse, QueryDict, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import NullIf, TruncMonth, TruncWeek
+from django.utils.html import format_html
+from django.utils.text import smart_split, unescape_string_literal
+from django.core.exceptions import PermissionDenied
 from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+import copy
+import hashlib
+import io
 import json
 import csv
-from io import TextIOWrapper
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
 from unfold.decorators import action
 from unfold.admin import ModelAdmin
-from .models import KayakTransaction
-from .utils import CSVDataImporter
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from .models import KayakTransaction, DailyRollup, Hotel, ImportJob, Location, RevenueRollup
+from .db_modules.partitions import ensure_partitions, month_of
+from .db_modules.rollups import month_start, refresh_rollups, touched_months
+from .data_version import bump_data_version, get_data_version
+from .utils import IMPORT_MODES
+from .import_jobs import enqueue_import, fail_stale_jobs
+from .parallel_import import import_workers
+from .instrumentation import STAGES
+from .pagination import AFTER_VAR, BEFORE_VAR, KeysetPaginator
+from .exporters import ARROW, COLUMNAR_FORMATS, PARQUET, gzip_stream, import_pyarrow, stream_columnar
 from django.http import HttpRequest, HttpResponse, HttpResponseRedirect
 
 
+# Columns of the CSV export, and the model fields they are built from
+EXPORT_HEADER = [
+    'LeadId', 'LeadDate', 'LeadCheckin', 'LeadCheckout',
+    'Revenue', 'Commission', 'Hotel Location', 'hotel_id'
+]
+EXPORT_FIELDS = (
+    'lead_id', 'lead_date', 'lead_checkin', 'lead_checkout',
+    'revenue', 'commission', 'location__label', 'hotel__hotel_id'
+)
+
+# Series of the chart API (admin/import_export/kayaktransaction/charts/<series>.json)
+CHART_SERIES = ('monthly-revenue', 'country-share', 'commission', 'city-share')
+
+# Periods the line charts of the chart API can be grouped by
+CHART_GRANULARITIES = ('day', 'week', 'month')
+
+
+def chart_urls():
+    """
+    URLs of the chart API, per series, for the pages that load the charts.
+    """
+    return {
+        series.replace('-', '_'): reverse('admin:import_export_kayaktransaction_chart_data', args=[series])
+        for series in CHART_SERIES
+    }
+
+
 # Utility classes for CSV handling and chart data preparation
 class CSVHandler:
     @staticmethod
@@ -34,43 +81,180 @@ class CSVHandler:
         Write the queryset to a CSV file for export.
         """
         writer = csv.writer(response)
-        writer.writerow([
-            'LeadId', 'LeadDate', 'LeadCheckin', 'LeadCheckout',
-            'Revenue', 'Commission', 'Hotel Location' 'hotel_id'
-        ])
-        for transaction in queryset:
-            writer.writerow([
-                transaction.lead_id,
-                transaction.lead_date,
-                transaction.lead_checkin,
-                transaction.lead_checkout,
-                transaction.revenue,
-                transaction.commission,
-                transaction.hotel_location_status,
-                transaction.hotel_id
-            ])
+        writer.writerow(EXPORT_HEADER)
+        writer.writerows(CSVHandler.export_rows(queryset))
+
+    @staticmethod
+    def stream_csv(queryset, rows_per_chunk=1000):
+        """
+        Yield the queryset as CSV text, a block of rows at a time, for a StreamingHttpResponse.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_HEADER)
+        for count, row in enumerate(CSVHandler.export_rows(queryset), start=1):
+            writer.writerow(row)
+            if count % rows_per_chunk == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    @staticmethod
+    def export_rows(queryset):
+        """
+        Yield export rows read straight from a server-side cursor: only the exported columns
+        are fetched and no model instances are created, so memory use stays constant.
+        """
+        chunk_size = getattr(settings, 'KAYAK_EXPORT_CHUNK_SIZE', 2000)
+        rows = queryset.order_by().values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+        for (lead_id, lead_date, lead_checkin, lead_checkout, revenue, commission,
+             hotel_location, hotel_id) in rows:
+            yield [
+                lead_id,
+                lead_date,
+                lead_checkin,
+                lead_checkout,
+                revenue,
+                commission,
+                hotel_location or 'None',
+                hotel_id
+            ]
 
 
 class ChartDataPreparer:
+    """
+    Chart series are read from the rollup tables, so their cost depends on the number of
+    days, months and locations rather than on the number of transactions.
+    """
+
+    @staticmethod
+    def parse_filters(query):
+        """
+        Filters of the chart API from a query dict: `start` and `end` dates (YYYY-MM-DD, or
+        YYYY-MM for the whole month, both included), any number of `country` and `city`
+        values, and the `granularity` of the line charts (day, week or month).
+        Raises ValueError for an unknown granularity or an unreadable or empty date range.
+        """
+        filters = {
+            'start': None,
+            'end': None,
+            'countries': sorted(set(query.getlist('country')) - {''}),
+            'cities': sorted(set(query.getlist('city')) - {''}),
+            'granularity': query.get('granularity') or 'month',
+        }
+        if filters['granularity'] not in CHART_GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(CHART_GRANULARITIES)}, not {filters['granularity']!r}.")
+        for name in ('start', 'end'):
+            value = query.get(name)
+            if not value:
+                continue
+            try:
+                filters[name] = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                try:
+                    month = datetime.strptime(value, '%Y-%m').date()
+                except ValueError:
+                    raise ValueError(f"{name} must be a date (YYYY-MM-DD) or a month (YYYY-MM), not {value!r}.") from None
+                # A month stands for all of its days
+                filters[name] = month if name == 'start' else month_start(month, offset=1).date() - timedelta(days=1)
+        if filters['start'] and filters['end'] and filters['start'] > filters['end']:
+            raise ValueError("start must not be after end.")
+        return filters
+
+    @staticmethod
+    def rollups(start=None, end=None, countries=(), cities=(), granularity='month', by_city=False):
+        """
+        Rollup rows for the chart filters, annotated with their `period` (the first day of
+        their day, week or month) and their `country` (and `city`). Whole months without
+        cities are read from the monthly RevenueRollup, anything finer from DailyRollup.
+        """
+        whole_months = (start is None or start.day == 1) and (end is None or (end + timedelta(days=1)).day == 1)
+        if granularity == 'month' and whole_months and not cities and not by_city:
+            queryset = RevenueRollup.objects.annotate(period=F('month'), country=F('hotel_country'))
+            if start:
+                queryset = queryset.filter(month__gte=start)
+            if end:
+                queryset = queryset.filter(month__lte=end)
+            if countries:
+                queryset = queryset.filter(hotel_country__in=countries)
+            return queryset
+
+        periods = {'day': F('day'), 'week': TruncWeek('day'), 'month': TruncMonth('day')}
+        queryset = DailyRollup.objects.annotate(
+            period=periods[granularity],
+            country=NullIf(F('location__country'), Value('')),
+            city=NullIf(F('location__city'), Value('')),
+        )
+        if start:
+            queryset = queryset.filter(day__gte=start)
+        if end:
+            queryset = queryset.filter(day__lte=end)
+        if countries:
+            queryset = queryset.filter(location__country__in=countries)
+        if cities:
+            queryset = queryset.filter(location__city__in=cities)
+        return queryset
+
+    @classmethod
+    def series(cls, name, filters):
+        """
+        Data of chart series `name` (one of CHART_SERIES) for the parsed chart filters.
+        """
+        if name in ('country-share', 'city-share'):
+            field = 'country' if name == 'country-share' else 'city'
+            rollups = cls.rollups(**filters, by_city=field == 'city')
+            labels, values = cls.prepare_pie_chart_data(cls.revenue_by(rollups, field), field)
+            return {'labels': labels, 'values': values}
+        field = 'total_commission' if name == 'commission' else 'total_revenue'
+        points = cls.prepare_line_chart_data(cls.revenue_per_period(cls.rollups(**filters)), field)
+        return {'granularity': filters['granularity'], 'points': points}
+
+    @staticmethod
+    def revenue_per_period(rollups):
+        """
+        Total revenue and commission per period, oldest first.
+        """
+        return (
+            rollups
+            .values('period')
+            .annotate(total_revenue=Sum('total_revenue'), total_commission=Sum('total_commission'))
+            .order_by('period')
+        )
+
     @staticmethod
-    def prepare_line_chart_data(queryset):
+    def revenue_by(rollups, field):
         """
-        Prepare data for the line chart showing monthly revenue.
+        Total revenue per hotel country or city, largest first.
+        """
+        return (
+            rollups
+            .values(field)
+            .annotate(total_revenue=Sum('total_revenue'))
+            .order_by('-total_revenue')
+        )
+
+    @staticmethod
+    def prepare_line_chart_data(queryset, field='total_revenue'):
+        """
+        Prepare data for the line chart showing a total per period (revenue by default).
         """
         return [
             {
-                'x': record['month'].isoformat() if record['month'] else '',
-                'y': float(record['total_revenue']) if record['total_revenue'] else 0.0,
+                'x': record['period'].isoformat() if record['period'] else '',
+                'y': float(record[field]) if record[field] else 0.0,
             }
             for record in queryset
         ]
 
     @staticmethod
-    def prepare_pie_chart_data(queryset):
+    def prepare_pie_chart_data(queryset, field='country'):
         """
-        Prepare data for the pie chart showing revenue by hotel country.
+        Prepare data for the pie chart showing revenue by hotel country (or city).
         Countries contributing less than 6% are grouped under "Others".
         """
+        # Evaluated once, for the total and the shares
+        queryset = list(queryset)
         total_revenue_all = sum(
             float(item['total_revenue']) if item['total_revenue'] else 0.0
             for item in queryset
@@ -78,7 +262,7 @@ class ChartDataPreparer:
         pie_labels, pie_values, others_total = [], [], 0.0
 
         for item in queryset:
-            country = item['hotel_country'] or 'Unknown'
+            country = item[field] or 'Unknown'
             revenue = float(item['total_revenue']) if item['total_revenue'] else 0.0
             share = revenue / total_revenue_all if total_revenue_all else 0.0
 
@@ -95,16 +279,53 @@ class ChartDataPreparer:
         return pie_labels, pie_values
 
 
+class ProjectedChangeList(ChangeList):
+    """
+    Changelist that loads only the columns named in the admin's `list_select`. The links to
+    the next and previous page carry the cursor a KeysetPaginator seeks from.
+    """
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.only(*self.model_admin.list_select)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # A cursor only belongs to the page link it was made for
+        params = {AFTER_VAR: None, BEFORE_VAR: None, **(new_params or {})}
+        paginator = getattr(self, 'paginator', None)
+        if PAGE_VAR in params and isinstance(paginator, KeysetPaginator):
+            params.update(paginator.cursor_params(self.page_num, self.result_list, params[PAGE_VAR]))
+        return super().get_query_string(params, remove)
+
+
 @admin.register(KayakTransaction)
 class KayakTransactionAdmin(ModelAdmin):
     list_display = (
         'lead_id', 'lead_date', 'lead_checkin', 'lead_checkout',
-        'revenue', 'commission', 'hotel_location_status', 'hotel_id'
+        'revenue', 'commission', 'hotel_location_status', 'hotel_code'
+    )
+    list_select_related = ('hotel', 'location')
+    # Columns loaded for the changelist
+    list_select = (
+        'lead_id', 'lead_date', 'lead_checkin', 'lead_checkout',
+        'revenue', 'commission', 'location__label', 'hotel__hotel_id',
     )
-    search_fields = ('lead_id', 'hotel_city', 'hotel_country', 'hotel_id')
-    list_filter = ('lead_date', 'lead_checkin', 'lead_checkout', 'hotel_id')
-    actions = ['export_as_csv']
-    actions_list = ['import_csv_action']
+    # Newest first, in the order the keyset paginator can seek on the (lead_date, id) index
+    ordering = KeysetPaginator.keyset_ordering
+    paginator = KeysetPaginator
+    show_full_result_count = False
+    # Searched through the dimension tables, see get_search_results
+    search_fields = ('lead_id', 'location__city', 'location__country', 'hotel__hotel_id')
+    list_filter = ('lead_date', 'lead_checkin', 'lead_checkout', 'hotel')
+    raw_id_fields = ('hotel', 'location')
+    actions = ['export_as_csv', 'export_as_csv_gzip', 'export_as_parquet', 'export_as_arrow']
+    actions_list = ['import_csv_action', 'export_filtered_csv_action']
 
     def has_import_csv_permission(self, request: HttpRequest, obj=None):
         """
@@ -131,32 +352,29 @@ class KayakTransactionAdmin(ModelAdmin):
                 return HttpResponseRedirect("../")
 
             try:
-                # Read the CSV file with UTF-8 encoding
-                csv_file = TextIOWrapper(file.file, encoding='utf-8')
-
-                # Use the CSVDataImporter class to process the file
-                import_results = CSVDataImporter.import_csv_data(csv_file)
-
-                # Check for error key in the returned dictionary
-                if 'error' in import_results:
-                    self._send_message(request, f"Error importing CSV: {import_results['error']}", messages.ERROR)
-                    return HttpResponseRedirect("../")
-
-                # Provide feedback based on the import results
-                success_count = import_results.get('success_count', 0)
-                error_count = import_results.get('error_count', 0)
+                workers = int(request.POST.get('import_workers') or 1)
+                if workers < 1:
+                    raise ValueError
+            except ValueError:
+                self._send_message(request, "The number of workers must be a positive whole number.", messages.ERROR)
+                return HttpResponseRedirect("../")
 
-                if success_count > 0:
-                    self._send_message(request, f"Successfully imported {success_count} records.", messages.SUCCESS)
-                if error_count > 0:
-                    self._send_message(request, f"{error_count} records failed to import.", messages.WARNING)
+            try:
+                # Spool the upload and let the import worker process it in the background
+                job = enqueue_import(file, mode=request.POST.get('import_mode'), user=request.user, workers=workers)
             except Exception as e:
                 self._send_message(request, f"Unexpected error: {e}", messages.ERROR)
+                return HttpResponseRedirect("../")
 
-            return HttpResponseRedirect("../")
+            self._send_message(request, f"Import job #{job.pk} queued for {job.original_name}.", messages.SUCCESS)
+            return HttpResponseRedirect(reverse('admin:import_export_importjob_status', args=[job.pk]))
 
         # Show a simple form prompting user to upload CSV
-        return render(request, 'admin/import_csv_form.html', context={'title': 'Import CSV'})
+        return render(request, 'admin/import_csv_form.html', context={
+            'title': 'Import CSV',
+            'import_modes': IMPORT_MODES,
+            'import_workers': import_workers(),
+        })
 
     def has_import_csv_permission(self, request: HttpRequest, obj=None):
         """
@@ -165,48 +383,118 @@ class KayakTransactionAdmin(ModelAdmin):
         """
         return request.user.is_staff  # Or any other permission logic you want
 
-    def changelist_view(self, request, extra_context=None):
+    @admin.display(description="Hotel Location", ordering='location__label', empty_value='None')
+    def hotel_location_status(self, obj):
+        return obj.location.label if obj.location_id else None
+
+    @admin.display(description="Hotel ID", ordering='hotel__hotel_id')
+    def hotel_code(self, obj):
+        return obj.hotel.hotel_id if obj.hotel_id else None
+
+    def get_search_results(self, request, queryset, search_term):
         """
-        Add supply dynamic chart data to the changelist view.
-        """
-        # --------------------------------------------------------------------
-        # 1. Monthly Revenue for the Line Chart
-        # --------------------------------------------------------------------
-        monthly_revenue_qs = (
-            KayakTransaction.objects
-            .annotate(month=TruncMonth('lead_date'))
-            .values('month')
-            .annotate(total_revenue=Sum('revenue'))
-            .order_by('month')
-        )
+        Matches each search term against the lead id and, through the dimension tables, the
+        hotel id, city and country. The small Hotel and Location tables are searched first, so
+        the transactions are filtered on indexed id lists rather than on a join per row.
+        """
+        for term in smart_split(search_term):
+            if term[0] in ('"', "'") and term[0] == term[-1]:
+                term = unescape_string_literal(term)
+            locations = Location.objects.filter(Q(city__icontains=term) | Q(country__icontains=term))
+            hotels = Hotel.objects.filter(hotel_id__icontains=term)
+            queryset = queryset.filter(
+                Q(lead_id__icontains=term)
+                | Q(location__in=list(locations.values_list('id', flat=True)))
+                | Q(hotel__in=list(hotels.values_list('id', flat=True)))
+            )
+        return queryset, False
 
-        # Convert the queryset into a list of { x, y } for Chart.js
-        line_chart_data = ChartDataPreparer.prepare_line_chart_data(monthly_revenue_qs)
+    def get_changelist(self, request, **kwargs):
+        return ProjectedChangeList
 
-        # --------------------------------------------------------------------
-        # 2. Revenue by Hotel Country (Pie Chart), grouping < 8% as "Others"
-        # --------------------------------------------------------------------
-        country_revenue_qs = (
-            KayakTransaction.objects
-            .values('hotel_country')
-            .annotate(total_revenue=Sum('revenue'))
-            .order_by('-total_revenue')
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            after=request.GET.get(AFTER_VAR), before=request.GET.get(BEFORE_VAR),
         )
 
-        # Prepare pie chart labels and values
-        pie_labels, pie_values = ChartDataPreparer.prepare_pie_chart_data(country_revenue_qs)
+    def get_urls(self):
+        urls = [
+            path(
+                'charts/<slug:series>.json',
+                # Cacheable: the browser keeps the series and revalidates them with their ETag
+                self.admin_site.admin_view(condition(etag_func=self._chart_etag)(self.chart_data_view), cacheable=True),
+                name='import_export_kayaktransaction_chart_data',
+            ),
+        ]
+        return urls + super().get_urls()
 
-        # --------------------------------------------------------------------
-        # 3. Serialize data for Chart.js
-        # --------------------------------------------------------------------
+    def changelist_view(self, request, extra_context=None):
+        """
+        Add the chart API URLs to the changelist view; the page loads the charts from them.
+        """
         extra_context = extra_context or {}
-        extra_context.update({
-            'line_chart_data': json.dumps(line_chart_data, cls=DjangoJSONEncoder),
-            'pie_labels': json.dumps(pie_labels, cls=DjangoJSONEncoder),
-            'pie_values': json.dumps(pie_values, cls=DjangoJSONEncoder),
+        extra_context['chart_urls'] = chart_urls()
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def chart_data_view(self, request, series):
+        """
+        One chart series as JSON, over the months and countries the query string selects.
+        Sent with an ETag of the data version, so repeat requests get a 304 until data changes.
+        """
+        try:
+            filters = self._chart_filters(request, series)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        response = JsonResponse({
+            'series': series,
+            **ChartDataPreparer.series(series, filters),
         })
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-        return super().changelist_view(request, extra_context=extra_context)
+    def _chart_etag(self, request, series):
+        """
+        Strong ETag of a chart series: the data version, and a hash of the series and filters.
+        None for requests the view rejects, so errors are never answered with a 304.
+        """
+        try:
+            filters = self._chart_filters(request, series)
+        except (Http404, PermissionDenied, ValueError):
+            return None
+        key = json.dumps([series, filters], cls=DjangoJSONEncoder)
+        return f"{get_data_version()}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+    def _chart_filters(self, request, series):
+        if series not in CHART_SERIES:
+            raise Http404(f"Unknown chart series {series!r}.")
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        return ChartDataPreparer.parse_filters(request.GET)
+
+    def save_model(self, request, obj, form, change):
+        """
+        Keep the revenue rollups and the data version in step with transactions edited in the admin.
+        The fingerprint is cleared, so the next import of the lead rewrites it.
+        """
+        obj.fingerprint = None
+        months = touched_months([obj.lead_id, form.initial.get('lead_id')])
+        ensure_partitions({month_of(obj.lead_date)})
+        super().save_model(request, obj, form, change)
+        refresh_rollups(months | touched_months([obj.lead_id]))
+        bump_data_version()
+
+    def delete_model(self, request, obj):
+        months = touched_months([obj.lead_id])
+        super().delete_model(request, obj)
+        refresh_rollups(months)
+        bump_data_version()
+
+    def delete_queryset(self, request, queryset):
+        months = touched_months(list(queryset.values_list('lead_id', flat=True)))
+        super().delete_queryset(request, queryset)
+        refresh_rollups(months)
+        bump_data_version()
 
     @staticmethod
     def _send_message(request, message, level):
@@ -219,9 +507,219 @@ class KayakTransactionAdmin(ModelAdmin):
         """
         Export selected transactions as a CSV file.
         """
-        response = HttpResponse(content_type='text/csv')
+        return self._csv_response(queryset)
+
+    export_as_csv.short_description = "Export Selected as CSV"
+
+    def export_as_csv_gzip(self, request, queryset):
+        """
+        Export selected transactions as a gzip-compressed CSV file.
+        """
+        response = StreamingHttpResponse(gzip_stream(CSVHandler.stream_csv(queryset)), content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="kayak_transactions.csv.gz"'
+        return response
+
+    export_as_csv_gzip.short_description = "Export Selected as CSV (gzip)"
+
+    def export_as_parquet(self, request, queryset):
+        """
+        Export selected transactions as a Parquet file.
+        """
+        return self._columnar_response(request, queryset, PARQUET)
+
+    export_as_parquet.short_description = "Export Selected as Parquet"
+
+    def export_as_arrow(self, request, queryset):
+        """
+        Export selected transactions as an Arrow IPC file.
+        """
+        return self._columnar_response(request, queryset, ARROW)
+
+    export_as_arrow.short_description = "Export Selected as Arrow"
+
+    @action(
+        description=("Export CSV"),
+        url_path="export-csv",
+        permissions=["export_csv"]
+    )
+    def export_filtered_csv_action(self, request: HttpRequest):
+        """
+        Export every transaction matching the current changelist search and filters.
+        The changelist query string is taken from the request, or else from the changelist
+        page the button was clicked on.
+        """
+        query = request.GET.urlencode() or urlsplit(request.META.get('HTTP_REFERER', '')).query
+        changelist_request = copy.copy(request)
+        changelist_request.GET = QueryDict(query)
+        try:
+            queryset = self.get_changelist_instance(changelist_request).queryset
+        except Exception as e:
+            self._send_message(request, f"Could not apply the changelist filters: {e}", messages.ERROR)
+            return HttpResponseRedirect(reverse('admin:import_export_kayaktransaction_changelist'))
+        return self._csv_response(queryset)
+
+    def has_export_csv_permission(self, request: HttpRequest, obj=None):
+        return self.has_view_permission(request, obj)
+
+    @staticmethod
+    def _csv_response(queryset):
+        response = StreamingHttpResponse(CSVHandler.stream_csv(queryset), content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="kayak_transactions.csv"'
-        CSVHandler.write_csv(response, queryset)
         return response
 
-    export_as_csv.short_description = "Export Selected as CSV"
\ No newline at end of file
+    def _columnar_response(self, request, queryset, file_format):
+        try:
+            import_pyarrow()
+        except ImportError as e:
+            self._send_message(request, str(e), messages.ERROR)
+            return None
+        content_type, extension = COLUMNAR_FORMATS[file_format]
+        response = StreamingHttpResponse(stream_columnar(queryset, file_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="kayak_transactions.{extension}"'
+        return response
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(ModelAdmin):
+    list_display = (
+        'id', 'original_name', 'mode', 'workers', 'status', 'progress_display',
+        'inserted_count', 'updated_count', 'unchanged_count', 'duplicate_count', 'error_count',
+        'rejected_rows_link', 'created_by', 'created_at', 'finished_at'
+    )
+    list_filter = ('status', 'mode', 'created_at')
+    readonly_fields = [field.name for field in ImportJob._meta.fields]
+
+    def has_add_permission(self, request):
+        # Jobs are created by the "Import CSV" action on Kayak Transactions
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Progress")
+    def progress_display(self, obj):
+        percent = obj.progress_percent
+        return '-' if percent is None else f"{percent}%"
+
+    @admin.display(description="Rejected Rows")
+    def rejected_rows_link(self, obj):
+        if not obj.rejected_file_path:
+            return '-'
+        return format_html('<a href="{}">Download CSV</a>', self._rejected_rows_url(obj))
+
+    @staticmethod
+    def _stage_timings(job):
+        """
+        The job's stage timings as a list in pipeline order (JSONField keys come back unordered).
+        """
+        timings = job.stage_timings or {}
+        names = [name for name in STAGES if name in timings] + sorted(set(timings) - set(STAGES))
+        return [{'stage': name, **timings[name]} for name in names]
+
+    def _get_job(self, request, job_id):
+        """
+        The job of a status or download view, for users who may view import jobs.
+        """
+        job = get_object_or_404(ImportJob, pk=job_id)
+        if not self.has_view_permission(request, job):
+            raise PermissionDenied
+        return job
+
+    @staticmethod
+    def _rejected_rows_url(job):
+        if not job.rejected_file_path:
+            return None
+        return reverse('admin:import_export_importjob_rejected_rows', args=[job.pk])
+
+    def get_urls(self):
+        urls = [
+            path(
+                '<int:job_id>/status/',
+                self.admin_site.admin_view(self.status_view),
+                name='import_export_importjob_status',
+            ),
+            path(
+                '<int:job_id>/status.json',
+                self.admin_site.admin_view(self.status_json_view),
+                name='import_export_importjob_status_json',
+            ),
+            path(
+                '<int:job_id>/rejected.csv',
+                self.admin_site.admin_view(self.rejected_rows_view),
+                name='import_export_importjob_rejected_rows',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def status_view(self, request, job_id):
+        """
+        Page showing the progress of one import job; it polls status_json_view until the job finishes.
+        """
+        job = self._get_job(request, job_id)
+        return render(request, 'admin/import_job_status.html', context={
+            **self.admin_site.each_context(request),
+            'title': f"Import job #{job.pk}",
+            'job': job,
+            'status_url': reverse('admin:import_export_importjob_status_json', args=[job.pk]),
+            'rejected_url': self._rejected_rows_url(job),
+            'stage_timings': self._stage_timings(job),
+        })
+
+    def status_json_view(self, request, job_id):
+        job = self._get_job(request, job_id)
+        # Polled while the job runs: a job whose worker was killed must end up failed
+        if fail_stale_jobs(ImportJob.objects.filter(pk=job.pk)):
+            job.refresh_from_db()
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'finished': job.is_finished,
+            'total_rows': job.total_rows,
+            'processed_rows': job.processed_rows,
+            'progress_percent': job.progress_percent,
+            'success_count': job.success_count,
+            'inserted_count': job.inserted_count,
+            'updated_count': job.updated_count,
+            'unchanged_count': job.unchanged_count,
+            'duplicate_count': job.duplicate_count,
+            'error_count': job.error_count,
+            'reject_reasons': job.reject_reasons,
+            'rejected_url': self._rejected_rows_url(job),
+            'stage_timings': self._stage_timings(job),
+            'error': job.error,
+        })
+
+    def rejected_rows_view(self, request, job_id):
+        """
+        Downloads the rows of a job that failed validation, with the reasons they were rejected for.
+        """
+        job = self._get_job(request, job_id)
+        try:
+            rejected_file = open(job.rejected_file_path, 'rb')
+        except (OSError, ValueError):
+            raise Http404("The rejected rows of this import are no longer available.")
+        return FileResponse(
+            rejected_file, as_attachment=True, content_type='text/csv',
+            filename=f"import-{job.pk}-rejected.csv",
+        )
+
+
+@admin.register(Hotel)
+class HotelAdmin(ModelAdmin):
+    list_display = ('hotel_id', 'name', 'brand_id')
+    search_fields = ('hotel_id', 'name')
+
+    def has_delete_permission(self, request, obj=None):
+        # Transactions and rollups refer to hotels, and imports cache their ids
+        return False
+
+
+@admin.register(Location)
+class LocationAdmin(ModelAdmin):
+    list_display = ('label', 'country', 'city')
+    search_fields = ('country', 'city')
+
+    def has_delete_permission(self, request, obj=None):
+        # Transactions and rollups refer to locations, and imports cache their ids
+        return False
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ImportExportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'import_export'
+
+    def ready(self):
+        # Connects the signal receivers and registers the system checks
+        from import_export import checks, signals  # noqa: F401
@@ -0,0 +1,239 @@
+import csv
+import functools
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import DateField, Exists, OuterRef
+from django.db.models.functions import TruncMonth
+
+from import_export.data_version import bump_data_version
+from import_export.db_modules.dimensions import clear_caches
+from import_export.db_modules.rollups import refresh_rollups
+from import_export.models import DailyRollup, KayakTransaction
+
+# Sample Kayak report shipped at the repository root.
+SAMPLE_REPORT_PATH = settings.BASE_DIR.parent / 'KayakTransactionReport.csv'
+
+
+def scale_report(rows, source_path=SAMPLE_REPORT_PATH, start=0, lead_id_prefix=''):
+    """
+    Returns a DataFrame of `rows` rows made by repeating the sample report, beginning at
+    row `start` of the infinite repetition. LeadIds get the repetition number as suffix
+    (and `lead_id_prefix` as prefix) so they stay unique.
+    """
+    sample = pd.read_csv(source_path)
+    repeat, position = np.divmod(np.arange(start, start + rows), len(sample))
+    df = sample.iloc[position].reset_index(drop=True)
+    df['LeadId'] = lead_id_prefix + df['LeadId'].astype(str) + '-' + pd.Series(repeat).astype(str)
+    return df
+
+
+def write_scaled_report(path, rows, source_path=SAMPLE_REPORT_PATH, lead_id_prefix='', chunk_rows=100_000):
+    """
+    Writes a scaled copy of the sample report with `rows` rows to `path`, chunk by chunk
+    so that multi-million-row files can be generated in bounded memory.
+    """
+    for start in range(0, rows, chunk_rows):
+        df = scale_report(min(chunk_rows, rows - start), source_path, start, lead_id_prefix)
+        df.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+# Synthetic reports are generated in blocks of this many rows, each from its own random
+# stream, so that a given seed yields the same rows whatever the file size around them.
+SYNTHETIC_BLOCK_ROWS = 100_000
+
+# Hotels the synthetic rows are spread over; a few are booked far more often than the rest.
+SYNTHETIC_HOTELS = 20_000
+
+# First lead date of the synthetic reports, and the number of days lead dates are spread over.
+SYNTHETIC_START_DATE = '2023-01-01'
+SYNTHETIC_DAYS = 730
+
+# Values of the constant and enumerated columns, with their share of the rows.
+SYNTHETIC_VERTICALS = {'Hotel': 0.89, 'Flight': 0.05, 'Package': 0.04, 'Car': 0.02}
+SYNTHETIC_CLIENT_COUNTRIES = {'US': 0.94, 'CA': 0.06}
+SYNTHETIC_LIDS = {
+    'Hybrid-pu': 0.68, 'Category-pu': 0.12, 'SubCategory:MonthlyStay-pu': 0.12, 'SubCategory:VacationRental-pu': 0.02,
+    'SubCategory:ShortTermStay-pu': 0.02, 'SubCategory:Oceanfront-pu': 0.02, 'SubCategory:Cabin-pu': 0.02,
+}
+SYNTHETIC_CONSTANTS = {
+    'LanguageCode': 'EN', 'DeviceCategory': 'Desktop', 'BrandID': '561434',
+    'TransactionType': 'Click', 'TransactionTypeCode': '1', 'TransactionStatus': 'Active',
+    'TransactionStatusCode': '1', 'Eid': 'False', 'Pid': 'deeplinks', 'IntegrationCode': 'kan_235046_561434',
+}
+NOT_APPLICABLE = 'Not Applicable'
+
+LEAD_ID_ALPHABET = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_$'))
+HOTEL_NAME_WORDS = (
+    ['Grand', 'Royal', 'Sunrise', 'Harbor', 'Palm', 'Ocean', 'Park', 'Garden', 'Boutique', 'Historic', 'Cozy', 'Modern'],
+    ['Hotel', 'Inn', 'Resort', 'Suites', 'Lodge', 'Villa', 'Apartments', 'Beach House', 'Cabin', 'Residences'],
+)
+
+
+def write_synthetic_report(path, rows, seed=0, lead_id_prefix='', duplicate_rate=0.02, invalid_rate=0.001):
+    """
+    Writes a synthetic Kayak report with `rows` rows to `path`, block by block so that
+    multi-million-row files are generated in bounded memory. See synthetic_report.
+    """
+    for block, start in enumerate(range(0, rows, SYNTHETIC_BLOCK_ROWS)):
+        df = synthetic_report(min(SYNTHETIC_BLOCK_ROWS, rows - start), seed, block, lead_id_prefix, duplicate_rate, invalid_rate)
+        df.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False, quoting=csv.QUOTE_ALL)
+
+
+def synthetic_report(rows, seed=0, block=0, lead_id_prefix='', duplicate_rate=0.02, invalid_rate=0.001):
+    """
+    Returns block `block` of the synthetic report of `seed` as a DataFrame of text columns,
+    with the columns and value formats of the sample report. The same arguments always give
+    the same rows.
+    Like the real reports, most leads are hotel leads over a skewed pool of hotels in the
+    sample report's locations, some have no hotel ('Not Applicable') or no hotel data at all,
+    and a `duplicate_rate` share repeats an earlier LeadId of the block, half of them with a
+    changed revenue. An `invalid_rate` share has a missing date or a non-numeric revenue.
+    """
+    rng = np.random.default_rng([seed, 1, block])
+    hotels = synthetic_hotels(seed)
+    dates = _synthetic_dates()
+
+    # Lead, check-in and check-out dates, as day offsets into the date table
+    lead_day = rng.integers(0, SYNTHETIC_DAYS, rows)
+    checkin_day = lead_day + np.minimum(rng.exponential(37, rows).astype(int), 330)
+    checkout_day = checkin_day + np.minimum(rng.geometric(0.4, rows), 30)
+
+    vertical = rng.choice(list(SYNTHETIC_VERTICALS), rows, p=list(SYNTHETIC_VERTICALS.values()))
+    hotel = rng.choice(len(hotels), rows, p=hotels['weight'].to_numpy())
+    hotel_data = rng.choice(3, rows, p=[0.65, 0.25, 0.10])  # known hotel, not applicable, missing
+    not_applicable = (vertical != 'Hotel') | (hotel_data == 1)
+    missing = ~not_applicable & (hotel_data == 2)
+
+    revenue = np.where(rng.random(rows) < 0.07, 0.0, rng.lognormal(0.5, 1.1, rows)).round(6)
+    df = pd.DataFrame({
+        'LeadId': lead_id_prefix + pd.Series(_random_tokens(rng, rows, 22)),
+        'LeadDate': dates['day'][lead_day],
+        'LeadCheckin': dates['day'][checkin_day],
+        'LeadCheckout': dates['day'][checkout_day],
+        'BookingId': '', 'BookingDate': '', 'BookingCheckinDate': '', 'BookingCheckoutDate': '',
+        'Revenue': revenue,
+        'Commission': (revenue * 0.7).round(6),
+        'LanguageCode': SYNTHETIC_CONSTANTS['LanguageCode'],
+        'DeviceCategory': SYNTHETIC_CONSTANTS['DeviceCategory'],
+        'ClientCountryCode': rng.choice(list(SYNTHETIC_CLIENT_COUNTRIES), rows, p=list(SYNTHETIC_CLIENT_COUNTRIES.values())),
+        'BrandID': SYNTHETIC_CONSTANTS['BrandID'],
+        'Label': '',
+        'HotelID': hotels['HotelID'].to_numpy()[hotel],
+        'HotelCountry': hotels['HotelCountry'].to_numpy()[hotel],
+        'HotelCity': hotels['HotelCity'].to_numpy()[hotel],
+        'HotelName': hotels['HotelName'].to_numpy()[hotel],
+        'PaymentMonth': dates['month'][lead_day],
+        'TransactionType': SYNTHETIC_CONSTANTS['TransactionType'],
+        'TransactionTypeCode': SYNTHETIC_CONSTANTS['TransactionTypeCode'],
+        'TransactionStatus': SYNTHETIC_CONSTANTS['TransactionStatus'],
+        'TransactionStatusCode': SYNTHETIC_CONSTANTS['TransactionStatusCode'],
+        'Vertical': vertical,
+        'Eid': SYNTHETIC_CONSTANTS['Eid'],
+        'Pid': SYNTHETIC_CONSTANTS['Pid'],
+        'Cid': 'k-rbo_g-' + pd.Series(_random_tokens(rng, rows, 28)) + '_t-gp',
+        'Lid': rng.choice(list(SYNTHETIC_LIDS), rows, p=list(SYNTHETIC_LIDS.values())),
+        'IntegrationCode': SYNTHETIC_CONSTANTS['IntegrationCode'],
+        'Bookings': '',
+    })
+    df.loc[not_applicable, ['HotelID', 'HotelCountry', 'HotelCity', 'HotelName']] = ['-100'] + [NOT_APPLICABLE] * 3
+    df.loc[missing, ['HotelID', 'HotelCountry', 'HotelCity', 'HotelName']] = ['0', '', '', '']
+    df['Label'] = ('sem/GwECAA==' + df['Cid'] + df['Lid']).str.pad(132, side='right', fillchar='.')
+
+    # Re-delivered leads: copies of an earlier row of the block (following chains of copies
+    # back to an original row), half of them with a new revenue
+    source = np.arange(rows)
+    repeated = rng.random(rows) < duplicate_rate
+    repeated[:1] = False
+    source[repeated] = (rng.random(repeated.sum()) * np.flatnonzero(repeated)).astype(int)
+    while not np.array_equal(source, source[source]):
+        source = source[source]
+    changed = repeated & (rng.random(rows) < 0.5)
+    df = df.iloc[source].reset_index(drop=True)
+    df.loc[changed, 'Revenue'] = revenue[changed]
+    df.loc[changed, 'Commission'] = (revenue[changed] * 0.7).round(6)
+
+    invalid = np.flatnonzero(rng.random(rows) < invalid_rate)
+    df['Revenue'] = df['Revenue'].astype(object)
+    df.loc[invalid[::2], 'LeadDate'] = ''
+    df.loc[invalid[1::2], 'Revenue'] = '#VALUE!'
+    return df
+
+
+@functools.lru_cache(maxsize=4)
+def synthetic_hotels(seed=0, source_path=SAMPLE_REPORT_PATH):
+    """
+    Returns the SYNTHETIC_HOTELS hotels of the synthetic report of `seed`: HotelID, HotelName,
+    HotelCountry, HotelCity and the share of the hotel leads each one gets. Locations are
+    drawn from the hotel locations of the sample report, as often as they occur there.
+    """
+    rng = np.random.default_rng([seed, 0])
+    sample = pd.read_csv(source_path, usecols=['HotelCountry', 'HotelCity'], dtype=str).dropna()
+    locations = sample[sample['HotelCountry'] != NOT_APPLICABLE].value_counts()
+    location = rng.choice(len(locations), SYNTHETIC_HOTELS, p=(locations / locations.sum()).to_numpy())
+    countries, cities = zip(*locations.index)
+
+    adjectives, kinds = HOTEL_NAME_WORDS
+    hotel_ids = rng.choice(np.arange(100_000, 10_000_000), SYNTHETIC_HOTELS, replace=False)
+    weights = 1 / np.arange(1, SYNTHETIC_HOTELS + 1) ** 0.9
+    return pd.DataFrame({
+        'HotelID': hotel_ids.astype(str),
+        'HotelName': (
+            pd.Series(np.array(adjectives)[rng.integers(0, len(adjectives), SYNTHETIC_HOTELS)]) + ' '
+            + pd.Series(np.array(kinds)[rng.integers(0, len(kinds), SYNTHETIC_HOTELS)]) + ' '
+            + pd.Series(np.array(cities)[location])
+        ),
+        'HotelCountry': np.array(countries)[location],
+        'HotelCity': np.array(cities)[location],
+        'weight': weights / weights.sum(),
+    })
+
+
+@functools.lru_cache(maxsize=1)
+def _synthetic_dates():
+    # Formatted once: day offset -> date and payment month, in the sample report's format
+    days = pd.date_range(SYNTHETIC_START_DATE, periods=SYNTHETIC_DAYS + 400)
+    return {
+        'day': days.strftime('%m/%d/%Y %H:%M:%S').to_numpy(),
+        'month': days.strftime('%m/01/%Y %H:%M:%S').to_numpy(),
+    }
+
+
+def _random_tokens(rng, rows, length):
+    return LEAD_ID_ALPHABET[rng.integers(0, len(LEAD_ID_ALPHABET), (rows, length))].view(f'<U{length}').ravel()
+
+
+def delete_benchmark_rows(lead_id_prefix, hotels=None, locations=None):
+    """
+    Deletes the benchmark rows with LeadIds starting with `lead_id_prefix` and the rows of the
+    `hotels` and `locations` querysets nothing uses any more, and brings the rollups of the
+    months the benchmark rows were in back in line.
+    """
+    rows = KayakTransaction.objects.filter(lead_id__startswith=lead_id_prefix)
+    months = set(
+        rows.annotate(month=TruncMonth('lead_date', output_field=DateField())).values_list('month', flat=True).distinct()
+    )
+    rows.delete()
+    if hotels is not None:
+        hotels.filter(~Exists(KayakTransaction.objects.filter(hotel=OuterRef('pk')))).delete()
+    refresh_rollups(months)
+    if locations is not None:
+        (
+            locations
+            .filter(~Exists(KayakTransaction.objects.filter(location=OuterRef('pk'))))
+            .filter(~Exists(DailyRollup.objects.filter(location=OuterRef('pk'))))
+            .delete()
+        )
+    clear_caches()
+    bump_data_version()
+
+
+def timed(func, *args, **kwargs):
+    """
+    Calls func and returns (result, elapsed seconds).
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
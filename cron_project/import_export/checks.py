@@ -0,0 +1,44 @@
+from django.core.checks import Error, Tags, register
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.loader import MigrationLoader
+
+from import_export.db_modules.partitions import is_partitioned
+from import_export.models import KayakTransaction
+
+
+@register(Tags.database)
+def check_partitioned_transactions(app_configs, databases=None, **kwargs):
+    """
+    Once `manage.py partition_transactions` ran, the KayakTransaction table no longer matches
+    its model: the primary key is (id, lead_date) and lead_id is unique per lead_date only.
+    Migrations generated from the model assume the unpartitioned table, so applying one that
+    alters KayakTransaction is an error until it has been reviewed (and the check silenced).
+    Runs as part of `manage.py migrate`.
+    """
+    if DEFAULT_DB_ALIAS not in (databases or ()) or not is_partitioned():
+        return []
+    loader = MigrationLoader(connections[DEFAULT_DB_ALIAS])
+    pending = [
+        migration for key, migration in sorted(loader.graph.nodes.items())
+        if key not in loader.applied_migrations and migration.app_label == KayakTransaction._meta.app_label
+        and any(_alters_transactions(operation) for operation in migration.operations)
+    ]
+    return [
+        Error(
+            f"Migration {migration.app_label}.{migration.name} alters {KayakTransaction._meta.db_table}, "
+            "which is partitioned.",
+            hint=(
+                "Its constraints and primary key differ from the model once partitioned (see "
+                "partition_transactions). Rewrite the migration's SQL for the partitioned table, "
+                "then add 'import_export.E001' to SILENCED_SYSTEM_CHECKS to apply it."
+            ),
+            obj=KayakTransaction,
+            id='import_export.E001',
+        )
+        for migration in pending
+    ]
+
+
+def _alters_transactions(operation):
+    model_name = getattr(operation, 'model_name_lower', None) or getattr(operation, 'name_lower', None)
+    return model_name == KayakTransaction._meta.model_name
@@ -1,36 +1,193 @@
 from django_cron import CronJobBase, Schedule
-import csv
+from django.conf import settings
+from django.utils import timezone
+from pathlib import Path
+import io
+import json
+import logging
+import os
+import shutil
+import time
+from .import_jobs import get_rejected_dir, process_import_jobs
+from .instrumentation import format_stage_timings, merge_stage_timings
+from .incremental import commit, get_checkpoint, read_blocks, read_header, resume_offset
+from .parallel_import import ParallelCSVImporter, import_workers
+from .utils import CSVDataImporter
+
+logger = logging.getLogger(__name__)
+
 
 class FileProcessingCronJob(CronJobBase):
+    """
+    Imports the Kayak reports dropped in the inbox directory into KayakTransaction, using the
+    same CSVDataImporter pipeline as the admin import.
+    Imported reports are moved to the archive directory, reports that fail to import to the
+    quarantine directory. A report that may still be being written (modified within the last
+    KAYAK_INBOX_SETTLE_SECONDS, or with an unterminated last line) stays in the inbox: its
+    complete lines are imported and the rest is picked up by later runs. Rows that fail
+    validation are written to a "<report>-rejected.csv" file in the rejected directory, named
+    after the moved report. A report is committed block by block, so a run that stops part way
+    resumes from the last committed block, and an unchanged report is skipped. Each run
+    returns (and logs) a JSON summary, with the time, rows and queries of each import stage.
+    """
     RUN_EVERY_MINS = 60
     schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
     code = 'import_export.file_processing_cron_job'
 
     def do(self):
-        print("Cron job started.")
-        #change the path
-        file_path = "C:/Users/User/Downloads/KayakTransactionReport.csv"
-        output_file = "C:/Users/User/Downloads/ProcessedReport.csv"
+        logger.info("Kayak report import run started")
+        # Directories are configured with KAYAK_INBOX_DIR / KAYAK_ARCHIVE_DIR / KAYAK_QUARANTINE_DIR in settings.py
+        inbox_dir = Path(settings.KAYAK_INBOX_DIR)
+        inbox_dir.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+
+        summary = {
+            'files': [],
+            'files_archived': 0,
+            'files_quarantined': 0,
+            'files_pending': 0,
+            'rows_upserted': 0,
+            'rows_inserted': 0,
+            'rows_updated': 0,
+            'rows_unchanged': 0,
+            'rows_coalesced': 0,
+            'rows_rejected': 0,
+            'stage_timings': {},
+        }
+        for file_path in sorted(inbox_dir.glob('*.csv'), key=lambda path: path.stat().st_mtime):
+            logger.info("Processing %s", file_path)
+            complete = self._is_complete(file_path)
+            results = self._import_file(file_path, complete)
+            if 'error' in results:
+                logger.error("Error processing %s, moving it to quarantine: %s", file_path, results['error'])
+                destination = self._move(file_path, settings.KAYAK_QUARANTINE_DIR)
+                summary['files_quarantined'] += 1
+            elif complete:
+                destination = self._move(file_path, settings.KAYAK_ARCHIVE_DIR)
+                summary['files_archived'] += 1
+            else:
+                logger.info("Leaving %s in the inbox until it is complete", file_path)
+                destination = file_path
+                summary['files_pending'] += 1
+            summary['rows_upserted'] += results['success_count']
+            summary['rows_inserted'] += results.get('inserted_count', 0)
+            summary['rows_updated'] += results.get('updated_count', 0)
+            summary['rows_unchanged'] += results.get('unchanged_count', 0)
+            summary['rows_coalesced'] += results.get('duplicate_count', 0)
+            summary['rows_rejected'] += results['error_count']
+            merge_stage_timings(summary['stage_timings'], results.get('stage_timings', {}))
+            logger.info("Imported %s: %s", file_path.name, format_stage_timings(results.get('stage_timings', {})))
+            # The rejected rows of a report imported over several runs are renamed once it is moved
+            if destination != file_path and self._rejected_file(file_path).exists():
+                results['rejected_file'] = str(self._move_rejected(file_path, destination))
+            summary['files'].append({'file': file_path.name, 'moved_to': str(destination), **results})
+
+        elapsed = time.perf_counter() - started
+        summary['seconds'] = round(elapsed, 3)
+        summary['rows_per_sec'] = round((summary['rows_upserted'] + summary['rows_rejected']) / elapsed, 1) if elapsed else 0.0
 
+        message = json.dumps(summary)
+        logger.info("Kayak report import run: %s", message)
+        # django_cron stores the returned message in the CronJobLog of this run
+        return message
+
+    @staticmethod
+    def _rejected_file(file_path):
+        return get_rejected_dir() / f"{file_path.stem}-rejected.csv"
+
+    @staticmethod
+    def _is_complete(file_path):
+        """
+        Whether a report is done being written: unchanged for KAYAK_INBOX_SETTLE_SECONDS and
+        ending with a line break.
+        """
+        stat = file_path.stat()
+        if time.time() - stat.st_mtime < getattr(settings, 'KAYAK_INBOX_SETTLE_SECONDS', 60):
+            return False
+        if stat.st_size:
+            with open(file_path, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b'\n':
+                    logger.warning("%s stopped changing, but its last line is unterminated; leaving it in the inbox", file_path)
+                    return False
+        return True
+
+    @staticmethod
+    def _import_file(file_path, complete=True):
+        """
+        Imports the complete lines of one report from its last checkpoint on, committing the
+        checkpoint after each block. With more than one KAYAK_IMPORT_WORKERS, the rest of a
+        `complete` report is imported in parallel and committed once at the end. The rollups
+        of the months the report touched are refreshed once, after the last block.
+        Returns the aggregated CSVDataImporter result dictionary.
+        """
+        results = {'success_count': 0, 'error_count': 0}
+        rejected_file = FileProcessingCronJob._rejected_file(file_path)
         try:
-            print(f"Processing file at: {file_path}")
-            with open(file_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-
-                # Update fieldnames to include the 'Processed' field
-                fieldnames = reader.fieldnames + ['Processed']
-
-                with open(output_file, 'w', encoding='utf-8', newline='') as out_file:
-                    writer = csv.DictWriter(out_file, fieldnames=fieldnames)
-                    writer.writeheader()
-                    
-                    for row in reader:
-                        # Add the 'Processed' field
-                        row['Processed'] = True
-                        writer.writerow(row)
-
-            print(f"Processed data saved to {output_file}")
-        except FileNotFoundError:
-            print(f"File not found: {file_path}")
+            checkpoint = get_checkpoint(file_path)
+            start = resume_offset(file_path, checkpoint)
+            if start is None:
+                # Fully imported by an earlier run that stopped before moving the file
+                return results
+
+            workers = import_workers()
+            if complete and workers > 1:
+                size = file_path.stat().st_size
+                CSVDataImporter._merge_results(results, ParallelCSVImporter.import_csv_file(
+                    file_path, workers=workers, rejected_file=rejected_file, start=start,
+                ))
+                if 'error' not in results:
+                    commit(file_path, size, checkpoint=checkpoint)
+                return results
+
+            header = read_header(file_path)
+            for data, offset in read_blocks(file_path, start):
+                CSVDataImporter._merge_results(
+                    results, CSVDataImporter.import_csv_data(
+                        io.BytesIO(header + data), rejected_file=rejected_file, defer_rollups=True,
+                    ),
+                )
+                if 'error' in results:
+                    break
+                checkpoint = commit(file_path, offset, checkpoint=checkpoint)
         except Exception as e:
-            print(f"Error processing file: {e}")
+            CSVDataImporter._merge_results(results, {'success_count': 0, 'error_count': 0, 'error': str(e)})
+        return CSVDataImporter.refresh_touched_rollups(results)
+
+    @staticmethod
+    def _move(file_path, directory):
+        """
+        Moves a processed report out of the inbox (timestamped, so names never clash)
+        and forgets its checkpoint.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        destination = directory / f"{file_path.stem}-{timezone.now():%Y%m%d%H%M%S}{file_path.suffix}"
+        shutil.move(str(file_path), str(destination))
+        checkpoint = get_checkpoint(file_path)
+        if checkpoint:
+            checkpoint.delete()
+        return destination
+
+    @staticmethod
+    def _move_rejected(file_path, destination):
+        """
+        Renames the rejected rows of a processed report after its archived (or quarantined) name.
+        """
+        rejected_file = FileProcessingCronJob._rejected_file(file_path)
+        renamed = rejected_file.with_name(f"{destination.stem}-rejected.csv")
+        shutil.move(str(rejected_file), str(renamed))
+        return renamed
+
+
+class ImportJobCronJob(CronJobBase):
+    """
+    Runs the CSV import jobs queued from the admin.
+    """
+    RUN_EVERY_MINS = 1
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'import_export.import_job_cron_job'
+
+    def do(self):
+        jobs = process_import_jobs()
+        return f"Ran {len(jobs)} import job(s)."
@@ -0,0 +1,22 @@
+from django.db.models import F
+
+from .models import DataVersion
+
+# Dataset bumped by every write to KayakTransaction (imports and admin edits).
+KAYAK_TRANSACTIONS = 'kayak_transactions'
+
+
+def get_data_version(name=KAYAK_TRANSACTIONS):
+    """
+    Current version of a dataset; 0 if it was never bumped.
+    """
+    return DataVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def bump_data_version(name=KAYAK_TRANSACTIONS):
+    """
+    Marks a dataset as changed.
+    """
+    if not DataVersion.objects.filter(name=name).update(version=F('version') + 1):
+        DataVersion.objects.get_or_create(name=name)
+        DataVersion.objects.filter(name=name).update(version=F('version') + 1)
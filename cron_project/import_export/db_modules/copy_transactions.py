@@ -0,0 +1,88 @@
+import io
+
+from django.db import connection, transaction
+
+from import_export.db_modules.partitions import conflict_fields, is_partitioned
+from import_export.models import KayakTransaction
+
+# Columns loaded through the staging table, in COPY order.
+COPY_COLUMNS = [
+    'lead_id', 'lead_date', 'lead_checkin', 'lead_checkout', 'revenue', 'commission',
+    'hotel_id', 'location_id', 'fingerprint',
+]
+
+# Columns the target table requires; staged rows missing any of them are rejected.
+REQUIRED_COLUMNS = [
+    'lead_id', 'lead_date', 'lead_checkin', 'lead_checkout', 'revenue', 'commission',
+]
+
+STAGING_TABLE = 'kayak_transaction_staging'
+
+# Marker used for missing values in the COPY stream, so empty strings stay empty strings.
+NULL_MARKER = '\\N'
+
+
+def copy_upsert_transaction_data(df, new_lead_ids=frozenset()):
+    """
+    Load a DataFrame of transactions (columns named after model fields, unique lead_ids)
+    with PostgreSQL COPY and merge it into the KayakTransaction table.
+    `new_lead_ids` are the lead_ids known not to be stored yet, which are counted as inserted.
+
+    The rows are streamed into a temporary staging table with COPY FROM STDIN and then
+    merged with one set-based INSERT ... ON CONFLICT (lead_id) DO UPDATE, which leaves stored
+    rows with the same fingerprint untouched (no dead tuple, no WAL). Temporary
+    tables are never WAL-logged, so the staging load costs no more than an unlogged table,
+    and being session-private it allows concurrent imports. Rows missing a required
+    value are left out of the merge and counted as errors. On a partitioned table the merge
+    conflicts on (lead_id, lead_date), and stored rows of the staged leads with another
+    lead_date are deleted first, so a lead whose date changed is moved rather than duplicated.
+    Returns an (inserted_count, updated_count, error_count) tuple; unchanged rows are in none of them.
+    """
+    table = connection.ops.quote_name(KayakTransaction._meta.db_table)
+    columns = ', '.join(COPY_COLUMNS)
+    valid_rows = _valid_rows()
+    conflict = conflict_fields()
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in COPY_COLUMNS if column not in conflict)
+
+    buffer = io.StringIO()
+    df[COPY_COLUMNS].to_csv(buffer, header=False, index=False, na_rep=NULL_MARKER)
+    buffer.seek(0)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {STAGING_TABLE}')
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {STAGING_TABLE} ON COMMIT DROP AS '
+            f'SELECT {columns} FROM {table} WITH NO DATA'
+        )
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')",
+            buffer,
+        )
+        if is_partitioned():
+            cursor.execute(
+                f'DELETE FROM {table} AS stored USING {STAGING_TABLE} AS staged '
+                f'WHERE stored.lead_id = staged.lead_id AND stored.lead_date <> staged.lead_date '
+                f'AND {_valid_rows("staged.")}'
+            )
+        cursor.execute(
+            f'INSERT INTO {table} AS stored ({columns}) '
+            f'SELECT {columns} FROM {STAGING_TABLE} WHERE {valid_rows} '
+            f'ON CONFLICT ({", ".join(conflict)}) DO UPDATE SET {updates} '
+            f'WHERE stored.fingerprint IS DISTINCT FROM EXCLUDED.fingerprint '
+            f'RETURNING lead_id'
+        )
+        written = [lead_id for lead_id, in cursor.fetchall()]
+        cursor.execute(f'SELECT COUNT(*) FROM {STAGING_TABLE} WHERE NOT ({valid_rows})')
+        error_count = cursor.fetchone()[0]
+        # Drop it now as well, in case we are running inside an outer transaction.
+        cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+
+    inserted_count = sum(lead_id in new_lead_ids for lead_id in written)
+    return inserted_count, len(written) - inserted_count, error_count
+
+
+def _valid_rows(prefix=''):
+    """
+    SQL condition for staged rows that have every required value.
+    """
+    return ' AND '.join(f'{prefix}{column} IS NOT NULL' for column in REQUIRED_COLUMNS)
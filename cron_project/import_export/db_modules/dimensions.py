@@ -0,0 +1,150 @@
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from import_export.models import Hotel, Location
+
+DEFAULT_CACHE_SIZE = 100000
+
+# SQLSTATE of a foreign key violation.
+FOREIGN_KEY_VIOLATION = '23503'
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Bounded key -> id mapping that forgets the least recently used keys first.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get_many(self, keys):
+        """
+        Returns ({key: id} of the cached keys, [keys that are not cached]).
+        """
+        found, missing = {}, []
+        for key in keys:
+            if key in self._data:
+                self._data.move_to_end(key)
+                found[key] = self._data[key]
+            else:
+                missing.append(key)
+        return found, missing
+
+    def update(self, mapping):
+        self._data.update(mapping)
+        for key in mapping:
+            self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+_cache_size = getattr(settings, 'KAYAK_DIMENSION_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+_hotel_cache = LRUCache(_cache_size)
+_location_cache = LRUCache(_cache_size)
+
+
+def location_ids(pairs):
+    """
+    Returns {(country, city): Location id} for the given pairs ('' for missing values),
+    creating the locations that do not exist yet. Pairs the database refuses to store are
+    left out (see _create_each).
+    """
+    found, missing = _location_cache.get_many(pairs)
+    if missing:
+        resolved = _create_each(_create_locations, missing, 'location')
+        _remember(_location_cache, resolved)
+        found.update(resolved)
+    return found
+
+
+def _create_locations(pairs):
+    Location.objects.bulk_create(
+        [Location(country=country, city=city, label=Location.build_label(country, city)) for country, city in pairs],
+        ignore_conflicts=True,
+    )
+    wanted = set(pairs)
+    stored = Location.objects.filter(
+        country__in={country for country, _ in pairs},
+        city__in={city for _, city in pairs},
+    ).values_list('country', 'city', 'id')
+    return {(country, city): pk for country, city, pk in stored if (country, city) in wanted}
+
+
+def hotel_ids(hotels):
+    """
+    Returns {hotel_id: Hotel id} for a {hotel_id: (name, brand_id)} mapping, creating the
+    hotels that do not exist yet and filling in a stored name or brand that is still blank.
+    Hotels the database refuses to store are left out (see _create_each).
+    """
+    found, missing = _hotel_cache.get_many(hotels)
+    if missing:
+        resolved = _create_each(lambda codes: _create_hotels(codes, hotels), missing, 'hotel')
+        _remember(_hotel_cache, resolved)
+        found.update(resolved)
+    return found
+
+
+def _create_hotels(codes, hotels):
+    Hotel.objects.bulk_create(
+        [Hotel(hotel_id=code, name=hotels[code][0], brand_id=hotels[code][1]) for code in codes],
+        ignore_conflicts=True,
+    )
+    resolved, incomplete = {}, []
+    for hotel in Hotel.objects.filter(hotel_id__in=codes):
+        name, brand_id = hotels[hotel.hotel_id]
+        if (name and not hotel.name) or (brand_id and not hotel.brand_id):
+            hotel.name, hotel.brand_id = hotel.name or name, hotel.brand_id or brand_id
+            incomplete.append(hotel)
+        resolved[hotel.hotel_id] = hotel.pk
+    Hotel.objects.bulk_update(incomplete, ['name', 'brand_id'])
+    return resolved
+
+
+def _create_each(create, keys, kind):
+    """
+    Calls create(keys) for the {key: id} of the keys, in a savepoint. One value the database
+    refuses (e.g. a city longer than the column) fails the whole batch; the keys are then
+    created one at a time, and the ones that still fail are left out of the result, for
+    their rows to be counted as errors instead of failing the chunk.
+    """
+    try:
+        with transaction.atomic():
+            return create(keys)
+    except Exception as e:
+        logger.warning("Storing %d new %ss failed, storing them one by one: %s", len(keys), kind, e)
+    resolved = {}
+    for key in keys:
+        try:
+            with transaction.atomic():
+                resolved.update(create([key]))
+        except Exception as e:
+            logger.error("Cannot store %s %r: %s", kind, key, e)
+    return resolved
+
+
+def clear_caches():
+    _hotel_cache.clear()
+    _location_cache.clear()
+
+
+def is_missing_dimension(error):
+    """
+    Whether a write failed on a foreign key, as when a hotel or location was deleted (by
+    another process) after its id was cached. The caches are then cleared and the ids resolved again.
+    """
+    return isinstance(error, IntegrityError) and getattr(error.__cause__, 'pgcode', None) == FOREIGN_KEY_VIOLATION
+
+
+def _remember(cache, mapping):
+    # Cache ids only once they are committed: a rolled back import must not leave ids of
+    # rows that no longer exist behind (on_commit runs right away outside a transaction).
+    transaction.on_commit(lambda: cache.update(mapping))
@@ -0,0 +1,118 @@
+from datetime import date
+from functools import lru_cache
+
+from django.db import connection, transaction
+from django.utils.timezone import get_current_timezone
+
+from import_export.db_modules.rollups import month_start
+from import_export.models import KayakTransaction
+
+# Conflict target of the upserts. A unique constraint on a partitioned table has to include
+# the partition key, so once the table is partitioned lead_id is unique per lead_date only.
+CONFLICT_FIELDS = ['lead_id']
+PARTITIONED_CONFLICT_FIELDS = ['lead_id', 'lead_date']
+
+# Serializes partition creation between concurrent imports (e.g. the parallel importer).
+PARTITION_LOCK_ID = 0x4B415950  # 'KAYP'
+
+
+@lru_cache(maxsize=None)
+def is_partitioned():
+    """
+    Whether KayakTransaction is stored as a partitioned table (see `manage.py partition_transactions`).
+    Looked up once per process: restart the web server and workers after converting the table.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+            [KayakTransaction._meta.db_table],
+        )
+        return cursor.fetchone()[0]
+
+
+def conflict_fields():
+    """
+    Columns the upserts of KayakTransaction conflict on.
+    """
+    return PARTITIONED_CONFLICT_FIELDS if is_partitioned() else CONFLICT_FIELDS
+
+
+def partition_name(month):
+    return f'{KayakTransaction._meta.db_table}_p{month:%Y%m}'
+
+
+def month_of(value):
+    """
+    First day of the month of an aware datetime, in the current timezone (as TruncMonth buckets).
+    """
+    value = value.astimezone(get_current_timezone())
+    return date(value.year, value.month, 1)
+
+
+def months_of(lead_dates):
+    """
+    Months (first-of-month dates) of a pandas Series of aware lead_date values.
+    """
+    days = lead_dates.dropna().dt.tz_convert(get_current_timezone()).dt.normalize().unique()
+    return {date(day.year, day.month, 1) for day in days}
+
+
+def ensure_partitions(months):
+    """
+    Creates the monthly partitions of the given months that do not exist yet.
+    Does nothing while the table is not partitioned.
+    """
+    if not months or not is_partitioned():
+        return
+    missing = set(months) - {month for month, _ in list_partitions()}
+    if not missing:
+        return
+    table = connection.ops.quote_name(KayakTransaction._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [PARTITION_LOCK_ID])
+        for month in sorted(missing):
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(partition_name(month))} '
+                f'PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+                [month_start(month), month_start(month, offset=1)],
+            )
+
+
+def delete_moved_rows(lead_ids, lead_dates):
+    """
+    On a partitioned table the upsert only matches rows with the same lead_id *and* lead_date,
+    so a re-imported lead whose lead_date changed would be inserted a second time. Deletes the
+    stored rows of these leads whose lead_date differs, before they are upserted.
+    Returns the number of rows deleted.
+    """
+    if not lead_ids or not is_partitioned():
+        return 0
+    table = connection.ops.quote_name(KayakTransaction._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} AS stored '
+            f'USING unnest(%s::varchar[], %s::timestamptz[]) AS incoming (lead_id, lead_date) '
+            f'WHERE stored.lead_id = incoming.lead_id AND stored.lead_date <> incoming.lead_date',
+            [list(lead_ids), list(lead_dates)],
+        )
+        return cursor.rowcount
+
+
+def list_partitions():
+    """
+    Returns (month, partition table name) of the attached monthly partitions, oldest first.
+    """
+    prefix = f'{KayakTransaction._meta.db_table}_p'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname',
+            [KayakTransaction._meta.db_table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return [
+        (date(int(name[len(prefix):len(prefix) + 4]), int(name[len(prefix) + 4:]), 1), name)
+        for name in names
+        if name.startswith(prefix) and name[len(prefix):].isdigit() and len(name) == len(prefix) + 6
+    ]
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import Count, DateField, F, Q, Sum, Value
+from django.db.models.functions import NullIf, TruncDate, TruncMonth
+from django.utils.timezone import make_aware
+
+from import_export.models import DailyRollup, KayakTransaction, RevenueRollup
+
+# Serializes rollup refreshes, so concurrent imports touching the same month cannot interleave.
+ROLLUP_LOCK_ID = 0x4B415941  # 'KAYA'
+
+
+def touched_months(lead_ids):
+    """
+    Returns the months (as first-of-month dates) of the transactions with the given lead_ids.
+    Called before and after a write, so that months rows move out of are refreshed too.
+    """
+    if not lead_ids:
+        return set()
+    return set(
+        KayakTransaction.objects
+        .filter(lead_id__in=lead_ids)
+        .annotate(month=TruncMonth('lead_date', output_field=DateField()))
+        .values_list('month', flat=True)
+        .distinct()
+    )
+
+
+def refresh_rollups(months):
+    """
+    Recomputes the daily and monthly rollup rows of the given months from KayakTransaction.
+    Only the transactions of those months are read, through lead_date range filters, into
+    the daily rows; the monthly rows are then summed from the daily ones.
+    """
+    months = sorted(month for month in months if month)
+    if not months:
+        return
+
+    in_months, in_days = Q(), Q()
+    for month in months:
+        in_months |= Q(lead_date__gte=month_start(month), lead_date__lt=month_start(month, offset=1))
+        in_days |= Q(day__gte=month, day__lt=month_start(month, offset=1).date())
+
+    with transaction.atomic():
+        _lock_rollups()
+        DailyRollup.objects.filter(in_days).delete()
+        DailyRollup.objects.bulk_create(_aggregate_days(KayakTransaction.objects.filter(in_months)))
+        RevenueRollup.objects.filter(month__in=months).delete()
+        RevenueRollup.objects.bulk_create(_aggregate_months(DailyRollup.objects.filter(in_days)))
+
+
+def rebuild_rollups():
+    """
+    Recomputes every rollup row from scratch. Returns the number of rows written.
+    """
+    with transaction.atomic():
+        _lock_rollups()
+        DailyRollup.objects.all().delete()
+        RevenueRollup.objects.all().delete()
+        daily_count = len(DailyRollup.objects.bulk_create(_aggregate_days(KayakTransaction.objects.all())))
+        return daily_count + len(RevenueRollup.objects.bulk_create(_aggregate_months(DailyRollup.objects.all())))
+
+
+def _aggregate_days(queryset):
+    """
+    Groups transactions by day and location into unsaved DailyRollup rows.
+    """
+    rows = (
+        queryset
+        .annotate(day=TruncDate('lead_date'))
+        .values('day', 'location_id')
+        .annotate(
+            total_revenue=Sum('revenue'),
+            total_commission=Sum('commission'),
+            transaction_count=Count('id'),
+        )
+        .order_by()
+    )
+    return [DailyRollup(**row) for row in rows]
+
+
+def _aggregate_months(daily_rollups):
+    """
+    Groups daily rollup rows by month and hotel country into unsaved RevenueRollup rows.
+    Rows without a country are rolled up under a NULL country.
+    """
+    rows = (
+        daily_rollups
+        .annotate(
+            month=TruncMonth('day'),
+            hotel_country=NullIf(F('location__country'), Value('')),
+        )
+        .values('month', 'hotel_country')
+        .annotate(
+            total_revenue=Sum('total_revenue'),
+            total_commission=Sum('total_commission'),
+            transaction_count=Sum('transaction_count'),
+        )
+        .order_by()
+    )
+    return [RevenueRollup(**row) for row in rows]
+
+
+def month_start(month, offset=0):
+    """
+    Aware datetime at the start of `month` (plus `offset` months) in the current timezone,
+    matching how TruncMonth buckets lead_date.
+    """
+    year, month_index = divmod(month.year * 12 + month.month - 1 + offset, 12)
+    return make_aware(datetime(year, month_index + 1, 1))
+
+
+def _lock_rollups():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ROLLUP_LOCK_ID])
@@ -1,16 +1,116 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from import_export.db_modules.dimensions import is_missing_dimension
+from import_export.db_modules.partitions import conflict_fields, delete_moved_rows
 from import_export.models import KayakTransaction
 
-def upsert_transaction_data(lead_id, lead_date, lead_checkin, lead_checkout, revenue, commission, hotel_id, hotel_country, hotel_city):
-    KayakTransaction.objects.update_or_create(
-        lead_id=lead_id,
-        defaults={
-            'lead_date': lead_date,
-            'lead_checkin': lead_checkin,
-            'lead_checkout': lead_checkout,
-            'revenue': revenue,
-            'commission': commission,
-            'hotel_id': hotel_id,
-            'hotel_country': hotel_country,
-            'hotel_city': hotel_city,
-        }
+# Model fields that are overwritten when a row with an existing lead_id is imported again.
+UPSERT_UPDATE_FIELDS = [
+    'lead_date', 'lead_checkin', 'lead_checkout', 'revenue', 'commission',
+    'hotel_id', 'location_id', 'fingerprint',
+]
+
+DEFAULT_CHUNK_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+
+def upsert_transaction_data(lead_id, lead_date, lead_checkin, lead_checkout, revenue, commission, hotel_id, location_id, fingerprint=None):
+    """
+    Upserts one transaction, matching on the same conflict_fields() as the bulk upsert.
+    Returns True if it was inserted, False if it was updated.
+    """
+    record = {
+        'lead_id': lead_id,
+        'lead_date': lead_date,
+        'lead_checkin': lead_checkin,
+        'lead_checkout': lead_checkout,
+        'revenue': revenue,
+        'commission': commission,
+        'hotel_id': hotel_id,
+        'location_id': location_id,
+        'fingerprint': fingerprint,
+    }
+    unique_fields = conflict_fields()
+    moved = delete_moved_rows([lead_id], [lead_date])
+    _, created = KayakTransaction.objects.update_or_create(
+        **{field: record[field] for field in unique_fields},
+        defaults={field: value for field, value in record.items() if field not in unique_fields},
     )
+    return created and not moved
+
+
+def stored_fingerprints(lead_ids):
+    """
+    Returns {lead_id: fingerprint} for the given lead_ids that are already stored
+    (the fingerprint is None for rows not written by an import).
+    """
+    if not lead_ids:
+        return {}
+    return dict(KayakTransaction.objects.filter(lead_id__in=lead_ids).values_list('lead_id', 'fingerprint'))
+
+
+def bulk_upsert_transaction_data(records, chunk_size=None, new_lead_ids=frozenset()):
+    """
+    Upsert a list of transaction dicts (keyed by model field name) in batches.
+    `new_lead_ids` are the lead_ids known not to be stored yet, which are counted as inserted.
+
+    Each chunk is written with a single INSERT ... ON CONFLICT DO UPDATE inside its own
+    transaction, on the conflict_fields() of the table. If a chunk fails, it is rolled back
+    and replayed row by row so that success and error counts are still reported per row,
+    unless it refers to a deleted hotel or location: that error is raised, for the caller to
+    resolve the ids again.
+    Returns an (inserted_count, updated_count, error_count) tuple.
+    """
+    chunk_size = chunk_size or getattr(settings, 'KAYAK_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    inserted_count, updated_count, error_count = 0, 0, 0
+    unique_fields = conflict_fields()
+    update_fields = [field for field in UPSERT_UPDATE_FIELDS if field not in unique_fields]
+
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                delete_moved_rows([record['lead_id'] for record in chunk], [record['lead_date'] for record in chunk])
+                KayakTransaction.objects.bulk_create(
+                    [KayakTransaction(**record) for record in chunk],
+                    update_conflicts=True,
+                    unique_fields=unique_fields,
+                    update_fields=update_fields,
+                )
+            chunk_inserted = sum(record['lead_id'] in new_lead_ids for record in chunk)
+            inserted_count += chunk_inserted
+            updated_count += len(chunk) - chunk_inserted
+        except Exception as e:
+            if is_missing_dimension(e):
+                raise
+            logger.warning("Bulk upsert of rows %d-%d failed, retrying row by row: %s", start, start + len(chunk) - 1, e)
+            chunk_inserted, chunk_updated, chunk_errors = _upsert_row_by_row(chunk)
+            inserted_count += chunk_inserted
+            updated_count += chunk_updated
+            error_count += chunk_errors
+
+    return inserted_count, updated_count, error_count
+
+
+def _upsert_row_by_row(records):
+    """
+    Fallback for a failed chunk: upsert each row on its own so one bad row
+    does not take the rest of the chunk down with it.
+    """
+    inserted_count, updated_count, error_count = 0, 0, 0
+    for record in records:
+        try:
+            with transaction.atomic():
+                created = upsert_transaction_data(**record)
+            if created:
+                inserted_count += 1
+            else:
+                updated_count += 1
+        except Exception as e:
+            logger.error("Error processing row with LeadId %s: %s", record.get('lead_id', 'Unknown'), e)
+            error_count += 1
+    return inserted_count, updated_count, error_count
@@ -0,0 +1,208 @@
+import os
+import threading
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ImportJob
+from .parallel_import import ParallelCSVImporter, import_workers
+from .utils import CSVDataImporter, IMPORT_MODE_BULK
+
+
+def get_spool_dir():
+    """
+    Directory where uploaded CSV files wait for the import worker.
+    """
+    spool_dir = Path(getattr(settings, 'KAYAK_IMPORT_SPOOL_DIR', settings.BASE_DIR / 'import_spool'))
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    return spool_dir
+
+
+def get_rejected_dir():
+    """
+    Directory where the rows rejected by validation are written, one CSV per import.
+    """
+    rejected_dir = Path(getattr(settings, 'KAYAK_REJECTED_DIR', settings.BASE_DIR / 'kayak_reports' / 'rejected'))
+    rejected_dir.mkdir(parents=True, exist_ok=True)
+    return rejected_dir
+
+
+def enqueue_import(uploaded_file, mode=None, user=None, workers=None):
+    """
+    Spools an uploaded CSV file to disk and queues an ImportJob for it, to be imported by
+    `workers` processes (see import_workers).
+    """
+    file_path = get_spool_dir() / f"{uuid.uuid4().hex}.csv"
+    with open(file_path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+
+    return ImportJob.objects.create(
+        original_name=uploaded_file.name,
+        file_path=str(file_path),
+        mode=mode or getattr(settings, 'KAYAK_IMPORT_MODE', IMPORT_MODE_BULK),
+        workers=import_workers(workers),
+        created_by=user if user and user.is_authenticated else None,
+    )
+
+
+def claim_next_job():
+    """
+    Marks the oldest pending job as running and returns it, or None if the queue is empty.
+    Rows locked by another worker are skipped, so several workers can poll the queue.
+    """
+    with transaction.atomic():
+        job = (
+            ImportJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=ImportJob.STATUS_PENDING)
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ImportJob.STATUS_RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+    return job
+
+
+def fail_stale_jobs(jobs=None):
+    """
+    Marks the running jobs (of `jobs`, by default all) whose heartbeat is older than
+    KAYAK_IMPORT_JOB_STALE_SECONDS as failed: their worker was killed part way. The rows
+    imported so far stay, and importing the file again only writes the rest.
+    Returns the number of jobs failed.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, 'KAYAK_IMPORT_JOB_STALE_SECONDS', 300))
+    return (
+        (ImportJob.objects.all() if jobs is None else jobs)
+        .filter(status=ImportJob.STATUS_RUNNING)
+        .filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at=None, started_at__lt=cutoff))
+        .update(
+            status=ImportJob.STATUS_FAILED,
+            error="The import worker stopped responding (it was probably killed); import the file again.",
+            finished_at=now,
+        )
+    )
+
+
+class _Heartbeat(threading.Thread):
+    """
+    Refreshes the heartbeat of a running job every KAYAK_IMPORT_JOB_HEARTBEAT_SECONDS. It runs
+    in a thread of its own, so a long stage (a large chunk, the parse phase of a parallel
+    import) does not make the job look stale.
+    """
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job_pk = job.pk
+        self.stopped = threading.Event()
+
+    def run(self):
+        interval = getattr(settings, 'KAYAK_IMPORT_JOB_HEARTBEAT_SECONDS', 30)
+        while not self.stopped.wait(interval):
+            try:
+                ImportJob.objects.filter(pk=self.job_pk, status=ImportJob.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+            finally:
+                # Not kept open between beats, so parallel import workers never fork with it
+                connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_import_job(job):
+    """
+    Runs a claimed job to completion, recording progress after every chunk.
+    The spooled file is removed once the import succeeds; the rejected rows, if any, are kept
+    in get_rejected_dir() for download.
+    """
+    def record_progress(results):
+        ImportJob.objects.filter(pk=job.pk).update(
+            processed_rows=results['success_count'] + results['error_count'],
+            success_count=results['success_count'],
+            error_count=results['error_count'],
+            inserted_count=results.get('inserted_count', 0),
+            updated_count=results.get('updated_count', 0),
+            unchanged_count=results.get('unchanged_count', 0),
+            duplicate_count=results.get('duplicate_count', 0),
+            reject_reasons=results.get('reject_reasons', {}),
+            stage_timings=results.get('stage_timings', {}),
+        )
+
+    heartbeat = _Heartbeat(job)
+    heartbeat.start()
+    try:
+        job.total_rows = _count_rows(job.file_path)
+        job.save(update_fields=['total_rows'])
+        rejected_file = get_rejected_dir() / f"import-{job.pk}-rejected.csv"
+        if job.workers > 1:
+            results = ParallelCSVImporter.import_csv_file(
+                job.file_path, workers=job.workers, mode=job.mode, progress_callback=record_progress,
+                rejected_file=rejected_file,
+            )
+        else:
+            results = CSVDataImporter.import_csv_data(
+                job.file_path, mode=job.mode, progress_callback=record_progress, rejected_file=rejected_file,
+            )
+    except Exception as e:
+        results = {'success_count': 0, 'error_count': 0, 'error': str(e)}
+    finally:
+        heartbeat.stop()
+
+    job.refresh_from_db()
+    job.success_count = results.get('success_count', 0)
+    job.error_count = results.get('error_count', 0)
+    job.inserted_count = results.get('inserted_count', 0)
+    job.updated_count = results.get('updated_count', 0)
+    job.unchanged_count = results.get('unchanged_count', 0)
+    job.duplicate_count = results.get('duplicate_count', 0)
+    job.reject_reasons = results.get('reject_reasons', {})
+    job.rejected_file_path = results.get('rejected_file', '')
+    job.stage_timings = results.get('stage_timings', {})
+    job.processed_rows = job.success_count + job.error_count
+    job.error = results.get('error', '')
+    job.status = ImportJob.STATUS_FAILED if job.error else ImportJob.STATUS_SUCCEEDED
+    job.finished_at = timezone.now()
+    job.save()
+
+    if job.status == ImportJob.STATUS_SUCCEEDED and os.path.exists(job.file_path):
+        os.remove(job.file_path)
+    return job
+
+
+def process_import_jobs(max_jobs=None):
+    """
+    Runs pending jobs one after the other until the queue is empty or `max_jobs` jobs ran,
+    after failing the jobs whose worker died. Returns the jobs that were run.
+    """
+    fail_stale_jobs()
+    processed = []
+    while max_jobs is None or len(processed) < max_jobs:
+        job = claim_next_job()
+        if job is None:
+            break
+        processed.append(run_import_job(job))
+    return processed
+
+
+def _count_rows(file_path):
+    """
+    Counts the data rows of a spooled CSV file (lines minus the header).
+    """
+    lines, last_byte = 0, b''
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            lines += chunk.count(b'\n')
+            last_byte = chunk[-1:]
+    if last_byte and last_byte != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
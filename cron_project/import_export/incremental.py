@@ -0,0 +1,99 @@
+import hashlib
+import os
+
+from .models import FileCheckpoint
+
+# Bytes hashed at each end of the committed part of a file to detect rewrites.
+FINGERPRINT_BYTES = 64 * 1024
+
+# Approximate amount of data handed out per block by read_blocks.
+DEFAULT_BLOCK_BYTES = 8 * 1024 * 1024
+
+
+def content_hash(path, offset):
+    """
+    Hashes the first and the last FINGERPRINT_BYTES of the first `offset` bytes of a file.
+    Cheap to recompute on every run, and enough to tell an appended file from a rewritten one.
+    """
+    digest = hashlib.sha256(str(offset).encode())
+    with open(path, 'rb') as file:
+        digest.update(file.read(min(offset, FINGERPRINT_BYTES)))
+        if offset > FINGERPRINT_BYTES:
+            file.seek(max(FINGERPRINT_BYTES, offset - FINGERPRINT_BYTES))
+            digest.update(file.read(offset - file.tell()))
+    return digest.hexdigest()
+
+
+def get_checkpoint(path):
+    """
+    Returns the stored checkpoint for `path`, or None if the file was never processed.
+    """
+    return FileCheckpoint.objects.filter(path=str(path)).first()
+
+
+def resume_offset(path, checkpoint):
+    """
+    Decides where processing of `path` has to start:
+    None if the file is unchanged since it was fully processed, the committed offset if the
+    file is the same one and only grew (or a previous run stopped part way), 0 otherwise.
+    """
+    if checkpoint is None:
+        return 0
+
+    stat = os.stat(path)
+    same_file = (checkpoint.device, checkpoint.inode) == (stat.st_dev, stat.st_ino)
+    if not same_file or stat.st_size < checkpoint.offset:
+        return 0
+    if stat.st_size == checkpoint.size == checkpoint.offset and stat.st_mtime == checkpoint.mtime:
+        return None
+    if content_hash(path, checkpoint.offset) != checkpoint.content_hash:
+        return 0
+    return None if checkpoint.offset == stat.st_size else checkpoint.offset
+
+
+def read_header(path):
+    """
+    Returns the first line of the file (the CSV header) as bytes.
+    """
+    with open(path, 'rb') as file:
+        return file.readline()
+
+
+def read_blocks(path, start, block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    Yields (data, end_offset) blocks of complete lines from `start` on. When `start` is 0 the
+    header line is skipped. A last line without a line break may still be being written and
+    is left for the next run.
+    """
+    with open(path, 'rb') as file:
+        if start == 0:
+            file.readline()
+        else:
+            file.seek(start)
+        position = file.tell()
+
+        while True:
+            data = file.read(block_bytes)
+            if not data:
+                return
+            data += file.readline()
+            complete = data[:data.rfind(b'\n') + 1]
+            if complete:
+                position += len(complete)
+                yield complete, position
+            if len(complete) < len(data):
+                return
+
+
+def commit(path, offset, checkpoint=None):
+    """
+    Records that `path` was processed up to `offset`. Returns the saved checkpoint.
+    """
+    stat = os.stat(path)
+    checkpoint = checkpoint or FileCheckpoint(path=str(path))
+    checkpoint.device, checkpoint.inode = stat.st_dev, stat.st_ino
+    checkpoint.size, checkpoint.mtime = stat.st_size, stat.st_mtime
+    checkpoint.offset = offset
+    checkpoint.content_hash = content_hash(path, offset)
+    checkpoint.save()
+    return checkpoint
@@ -0,0 +1,171 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Stages of an import, in the order each chunk goes through them.
+STAGES = ['read', 'parse', 'clean', 'write']
+
+# Functions listed in the log when an import is profiled.
+PROFILE_TOP_FUNCTIONS = 20
+
+
+class ImportInstrumentation:
+    """
+    Records what each stage of an import costs: wall time, rows processed, database queries
+    and the time spent in them, and the memory high-water mark of the process. A stage that
+    runs once per chunk adds up over the chunks.
+    Subclasses can override stage() to forward the timings elsewhere, or run() to attach
+    another profiler.
+    """
+
+    def __init__(self, profile_dir=None, trace_memory=False):
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.profile_file = None
+        self.timings = {}
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Instrumentation of the admin, cron and command imports: profiled into
+        settings.KAYAK_IMPORT_PROFILE_DIR when that is set.
+        """
+        return cls(profile_dir=getattr(settings, 'KAYAK_IMPORT_PROFILE_DIR', None))
+
+    @contextmanager
+    def run(self):
+        """
+        Wraps a whole import. With a profile directory, the import runs under cProfile; the
+        stats are written to a .prof file there (for pstats or snakeviz) and the functions
+        with the highest cumulative time are logged.
+        With trace_memory, tracemalloc runs during the import and each stage also records the
+        peak memory allocated through Python (slower, but per stage).
+        """
+        if self.trace_memory:
+            tracemalloc.start()
+        profiler = cProfile.Profile() if self.profile_dir else None
+        if profiler:
+            profiler.enable()
+        try:
+            yield self
+        finally:
+            if profiler:
+                profiler.disable()
+                self._save_profile(profiler)
+            if self.trace_memory:
+                tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        """
+        Times the block as (part of) stage `name`, over `rows` rows. Yields the stage's timing
+        dictionary, for rows only known inside the block. Queries are counted on the default
+        connection; the data of a COPY is not a query and only counts in the stage's time.
+        """
+        timing = self.timings.setdefault(name, {'seconds': 0.0, 'rows': 0, 'queries': 0, 'query_seconds': 0.0})
+        timing['rows'] += rows
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(_QueryTimer(timing)):
+                yield timing
+        finally:
+            timing['seconds'] += time.perf_counter() - started
+            timing['peak_rss_mb'] = peak_rss_mb()
+            if tracing:
+                traced_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                timing['peak_traced_mb'] = max(timing.get('peak_traced_mb', 0.0), traced_mb)
+
+    def results(self):
+        """
+        Result dictionary entries of the instrumentation: stage_timings, and the profile_file
+        of a profiled import.
+        """
+        results = {'stage_timings': {name: _rounded(timing) for name, timing in self.timings.items()}}
+        if self.profile_file:
+            results['profile_file'] = str(self.profile_file)
+        return results
+
+    def _save_profile(self, profiler):
+        profile_dir = Path(self.profile_dir)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        self.profile_file = profile_dir / f"import-{timezone.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}.prof"
+        profiler.dump_stats(self.profile_file)
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        logger.info("Import profile written to %s\n%s", self.profile_file, summary.getvalue())
+
+
+class _QueryTimer:
+    """
+    Database execute wrapper adding each query and its duration to a stage's timing.
+    """
+
+    def __init__(self, timing):
+        self.timing = timing
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timing['queries'] += 1
+            self.timing['query_seconds'] += time.perf_counter() - started
+
+
+def merge_stage_timings(total, timings):
+    """
+    Adds the stage timings of one import (or chunk, or shard) to `total` in place: durations,
+    rows and queries add up, memory high-water marks keep the highest value. Timings of
+    parallel workers therefore add up to more than the wall time of the import.
+    """
+    for name, timing in timings.items():
+        stage = total.setdefault(name, {})
+        for key, value in timing.items():
+            if key.startswith('peak_'):
+                stage[key] = max(stage.get(key, 0.0), value)
+            else:
+                stage[key] = stage.get(key, 0) + value
+        total[name] = _rounded(stage)
+    return total
+
+
+def format_stage_timings(timings):
+    """
+    One-line summary of stage timings for logs and command output, in STAGES order.
+    """
+    names = [name for name in STAGES if name in timings] + [name for name in timings if name not in STAGES]
+    return ', '.join(
+        f"{name} {timings[name]['seconds']:.2f}s/{timings[name]['rows']} rows/{timings[name]['queries']} queries"
+        for name in names
+    )
+
+
+def peak_rss_mb():
+    """
+    Memory high-water mark of this process in MB (ru_maxrss is in kilobytes on Linux).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _rounded(timing):
+    return {
+        key: round(value, 3 if key.endswith('seconds') else 1) if isinstance(value, float) else value
+        for key, value in timing.items()
+    }
@@ -0,0 +1,69 @@
+import gzip
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from import_export.data_version import bump_data_version
+from import_export.db_modules.partitions import is_partitioned, list_partitions
+from import_export.db_modules.rollups import refresh_rollups
+from import_export.models import KayakTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Detach the monthly KayakTransaction partitions older than a month. Detached partitions "
+        "stay in the database as standalone tables; with --archive they are dumped to gzip CSV "
+        "files and dropped instead. The revenue rollups of those months are refreshed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help="First month to keep, as YYYY-MM.")
+        parser.add_argument(
+            '--archive', action='store_true',
+            help="Dump each partition to KAYAK_PARTITION_ARCHIVE_DIR and drop it, instead of only detaching it.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only list the partitions that would be removed.")
+
+    def handle(self, *args, **options):
+        try:
+            before = datetime.strptime(options['before'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError("--before must be a month formatted as YYYY-MM.")
+        if not is_partitioned():
+            raise CommandError("KayakTransaction is not partitioned; run partition_transactions first.")
+
+        partitions = [(month, name) for month, name in list_partitions() if month < before]
+        if not partitions:
+            self.stdout.write("No partitions before that month.")
+            return
+        if options['dry_run']:
+            for month, name in partitions:
+                self.stdout.write(f"{month:%Y-%m}: {name}")
+            return
+
+        archive_dir = Path(getattr(settings, 'KAYAK_PARTITION_ARCHIVE_DIR', settings.BASE_DIR / 'kayak_reports' / 'partition_archive'))
+        if options['archive']:
+            archive_dir.mkdir(parents=True, exist_ok=True)
+
+        table = connection.ops.quote_name(KayakTransaction._meta.db_table)
+        for month, name in partitions:
+            partition = connection.ops.quote_name(name)
+            with transaction.atomic(), connection.cursor() as cursor:
+                if options['archive']:
+                    archive_path = archive_dir / f'{name}.csv.gz'
+                    with gzip.open(archive_path, 'wb') as archive:
+                        cursor.copy_expert(f'COPY {partition} TO STDOUT WITH (FORMAT csv, HEADER)', archive)
+                cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {partition}')
+                if options['archive']:
+                    cursor.execute(f'DROP TABLE {partition}')
+            if options['archive']:
+                self.stdout.write(f"{month:%Y-%m}: archived {name} to {archive_path}")
+            else:
+                self.stdout.write(f"{month:%Y-%m}: detached {name}")
+
+        refresh_rollups([month for month, _ in partitions])
+        bump_data_version()
+        self.stdout.write(self.style.SUCCESS(f"Removed {len(partitions)} partition(s)."))
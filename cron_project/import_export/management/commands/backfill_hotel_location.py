@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from import_export.models import Location
+
+# Location.build_label in SQL: NULL when the country or the city is missing or blank
+# (Python's str.strip() whitespace), "City, Country" otherwise.
+WHITESPACE = " \t\n\r\f\v"
+LABEL_SQL = (
+    "CASE WHEN btrim(coalesce(country, ''), %(ws)s) = '' OR btrim(coalesce(city, ''), %(ws)s) = '' "
+    "THEN NULL ELSE city || ', ' || country END"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill in Location.label, the stored hotel location, for locations written without it, "
+        "in id ranges so that each batch is a short transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000, help="Ids per UPDATE (default 50000).")
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Recompute every location, not only the ones whose label is still empty.",
+        )
+
+    def handle(self, *args, **options):
+        bounds = Location.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write("No locations.")
+            return
+
+        table = connection.ops.quote_name(Location._meta.db_table)
+        label = LABEL_SQL % {'ws': '%s'}
+        only_missing = '' if options['all'] else ' AND label IS NULL'
+        batch_size = options['batch_size']
+
+        updated = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET label = {label} '
+                    f'WHERE id >= %s AND id < %s{only_missing} '
+                    f'AND label IS DISTINCT FROM {label}',
+                    [WHITESPACE, WHITESPACE, start, start + batch_size, WHITESPACE, WHITESPACE],
+                )
+                updated += cursor.rowcount
+            if options['verbosity'] > 1:
+                self.stdout.write(f"ids {start}-{start + batch_size - 1}: {updated} locations updated so far")
+
+        self.stdout.write(self.style.SUCCESS(f"Updated the label of {updated} locations."))
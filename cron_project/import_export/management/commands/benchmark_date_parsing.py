@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from import_export.benchmarking import SAMPLE_REPORT_PATH, scale_report, timed
+from import_export.utils import CSVDataImporter, DATE_COLUMNS
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-cell date parsing (CSVDataImporter._parse_date) with the vectorized "
+        "CSVDataImporter._parse_dates on the sample Kayak report scaled to --rows rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Number of rows to parse.")
+        parser.add_argument('--source', default=str(SAMPLE_REPORT_PATH), help="Report to scale up.")
+
+    def handle(self, *args, **options):
+        df = scale_report(options['rows'], options['source'])
+        self.stdout.write(f"Parsing {len(df)} rows x {len(DATE_COLUMNS)} date columns")
+
+        total_per_cell, total_vectorized = 0.0, 0.0
+        for column in DATE_COLUMNS:
+            expected, per_cell = timed(df[column].apply, CSVDataImporter._parse_date)
+            parsed, vectorized = timed(CSVDataImporter._parse_dates, df[column])
+            # _parse_date yields None where _parse_dates yields NaT
+            if not parsed.equals(expected.astype(parsed.dtype)):
+                raise CommandError(f"Vectorized parsing of {column} does not match per-cell parsing.")
+            total_per_cell += per_cell
+            total_vectorized += vectorized
+            self.stdout.write(
+                f"{column:<14} per-cell {per_cell:8.2f}s  vectorized {vectorized:8.2f}s  "
+                f"speedup {per_cell / vectorized:6.1f}x"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Total':<14} per-cell {total_per_cell:8.2f}s  vectorized {total_vectorized:8.2f}s  "
+            f"speedup {total_per_cell / total_vectorized:6.1f}x"
+        ))
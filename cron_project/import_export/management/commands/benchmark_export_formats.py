@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from import_export.admin import CSVHandler
+from import_export.benchmarking import timed
+from import_export.exporters import ARROW, PARQUET, gzip_stream, import_pyarrow, stream_columnar
+from import_export.models import KayakTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Export KayakTransaction as CSV, gzip CSV, Parquet and Arrow and compare the file size, "
+        "the export time and the time pandas needs to load each file back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=None, help="Only export the first N transactions.")
+
+    def handle(self, *args, **options):
+        try:
+            import_pyarrow()
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        queryset = KayakTransaction.objects.order_by('id')
+        if options['rows']:
+            queryset = KayakTransaction.objects.filter(pk__in=queryset.values('pk')[:options['rows']])
+        row_count = queryset.count()
+        if not row_count:
+            raise CommandError("There are no transactions to export.")
+
+        formats = [
+            ('csv', lambda: (chunk.encode('utf-8') for chunk in CSVHandler.stream_csv(queryset)), pd.read_csv),
+            ('csv.gz', lambda: gzip_stream(CSVHandler.stream_csv(queryset)), pd.read_csv),
+            ('parquet', lambda: stream_columnar(queryset, PARQUET), pd.read_parquet),
+            ('arrow', lambda: stream_columnar(queryset, ARROW), pd.read_feather),
+        ]
+
+        self.stdout.write(f"Exporting {row_count} transactions")
+        self.stdout.write(f"{'format':<10}{'bytes':>14}{'export s':>12}{'load s':>10}")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, stream, load in formats:
+                path = os.path.join(directory, f"kayak_transactions.{name}")
+                _, export_seconds = timed(self._write, path, stream())
+                df, load_seconds = timed(load, path)
+                if len(df) != row_count:
+                    raise CommandError(f"{name}: loaded {len(df)} rows, expected {row_count}.")
+                self.stdout.write(f"{name:<10}{os.path.getsize(path):>14}{export_seconds:>12.2f}{load_seconds:>10.2f}")
+
+    @staticmethod
+    def _write(path, chunks):
+        with open(path, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
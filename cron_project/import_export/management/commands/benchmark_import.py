@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from contextlib import nullcontext
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from import_export.benchmarking import delete_benchmark_rows, timed, write_synthetic_report
+from import_export.instrumentation import STAGES, ImportInstrumentation, peak_rss_mb
+from import_export.models import Hotel, KayakTransaction, Location
+from import_export.utils import CSVDataImporter, IMPORT_MODE_BULK, IMPORT_MODES
+
+BENCHMARK_LEAD_ID_PREFIX = 'synthetic-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the CSV import stage by stage (read, parse, clean, write) on a synthetic Kayak "
+        "report, and print the timings, queries, rows/s and peak memory as JSON. Writes to the configured "
+        f"database: benchmark rows use LeadIds starting with '{BENCHMARK_LEAD_ID_PREFIX}' and are "
+        "deleted after the run, with the hotels and locations the run created."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help="Rows in the synthetic report.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic report.")
+        parser.add_argument('--duplicate-rate', type=float, default=0.02, help="Share of re-delivered LeadIds.")
+        parser.add_argument('--mode', choices=dict(IMPORT_MODES), help="Import mode of the write stage.")
+        parser.add_argument('--read-chunk-size', type=int, help="Rows read per chunk.")
+        parser.add_argument('--chunk-size', type=int, help="Rows per batch of the bulk upsert.")
+        parser.add_argument(
+            '--rollback', action='store_true',
+            help="Import in a transaction that is rolled back, leaving the database as it was.",
+        )
+        parser.add_argument(
+            '--trace-memory', action='store_true',
+            help="Also report the peak Python memory of each stage (tracemalloc; slows the run down).",
+        )
+        parser.add_argument('--output', help="Also write the JSON report to this file.")
+        parser.add_argument('--baseline', help="JSON report of an earlier run to compare against.")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError("--rows must be positive.")
+        baseline = self._load_baseline(options['baseline'])
+        options['mode'] = options['mode'] or getattr(settings, 'KAYAK_IMPORT_MODE', IMPORT_MODE_BULK)
+        if not options['rollback'] and KayakTransaction.objects.filter(lead_id__startswith=BENCHMARK_LEAD_ID_PREFIX).exists():
+            raise CommandError(f"Rows with LeadIds starting with '{BENCHMARK_LEAD_ID_PREFIX}' already exist.")
+
+        if options['verbosity'] < 2:
+            # Per-chunk duplicate and rejection warnings; their totals are in the report
+            logging.getLogger('import_export').setLevel(logging.ERROR)
+
+        last_hotel = Hotel.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        last_location = Location.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, 'report.csv')
+            _, generate_seconds = timed(
+                write_synthetic_report, csv_path, options['rows'], options['seed'],
+                BENCHMARK_LEAD_ID_PREFIX, options['duplicate_rate'],
+            )
+            try:
+                report = self._run(csv_path, options)
+            finally:
+                if not options['rollback']:
+                    delete_benchmark_rows(
+                        BENCHMARK_LEAD_ID_PREFIX, hotels=Hotel.objects.filter(pk__gt=last_hotel),
+                        locations=Location.objects.filter(pk__gt=last_location),
+                    )
+
+        report.update({
+            'rows': options['rows'],
+            'seed': options['seed'],
+            'duplicate_rate': options['duplicate_rate'],
+            'mode': options['mode'],
+            'generate_seconds': round(generate_seconds, 3),
+            'environment': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'cpu_count': os.cpu_count(),
+            },
+        })
+        if baseline:
+            report['speedup'] = self._speedup(report, baseline)
+
+        output = json.dumps(report, indent=2, default=str)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+
+    def _run(self, csv_path, options):
+        """
+        Imports the report with CSVDataImporter.import_csv_data, with an ImportInstrumentation
+        timing each stage. Returns the report without the run parameters.
+        """
+        instrumentation = ImportInstrumentation(trace_memory=options['trace_memory'])
+        started = time.perf_counter()
+        with transaction.atomic() if options['rollback'] else nullcontext():
+            results = CSVDataImporter.import_csv_data(
+                csv_path, chunk_size=options['chunk_size'], mode=options['mode'],
+                read_chunk_size=options['read_chunk_size'], instrumentation=instrumentation,
+            )
+            total_seconds = time.perf_counter() - started
+            if options['rollback']:
+                transaction.set_rollback(True)
+
+        stages = results.pop('stage_timings')
+        for stage in stages.values():
+            stage['rows_per_sec'] = round(stage['rows'] / stage['seconds'], 1) if stage['seconds'] else None
+
+        results.pop('duplicate_samples', None)
+        return {
+            'stages': {name: stages[name] for name in STAGES if name in stages},
+            'total_seconds': round(total_seconds, 3),
+            'rows_per_sec': round(options['rows'] / total_seconds, 1),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'results': results,
+        }
+
+    @staticmethod
+    def _load_baseline(path):
+        if not path:
+            return None
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
+
+    @staticmethod
+    def _speedup(report, baseline):
+        """
+        Rows/s of this run / rows/s of the baseline, per stage and in total (above 1 is faster).
+        Throughputs are compared rather than durations, so runs of different sizes compare too.
+        """
+        speedup = {}
+        for stage, timings in report['stages'].items():
+            previous = baseline.get('stages', {}).get(stage, {}).get('rows_per_sec')
+            if previous and timings['rows_per_sec']:
+                speedup[stage] = round(timings['rows_per_sec'] / previous, 2)
+        if baseline.get('rows_per_sec'):
+            speedup['total'] = round(report['rows_per_sec'] / baseline['rows_per_sec'], 2)
+        return speedup
@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from import_export.benchmarking import SAMPLE_REPORT_PATH, delete_benchmark_rows, timed, write_scaled_report
+from import_export.models import Hotel, KayakTransaction, Location
+from import_export.parallel_import import ParallelCSVImporter
+from import_export.utils import IMPORT_MODES
+
+BENCHMARK_LEAD_ID_PREFIX = 'bench-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure parallel import throughput for increasing worker counts on a synthetic report "
+        "built from the sample Kayak report. Writes to the configured database: benchmark rows "
+        f"use LeadIds starting with '{BENCHMARK_LEAD_ID_PREFIX}' and are deleted after each run, with "
+        "the hotels and locations the run created."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5_000_000, help="Rows in the synthetic report.")
+        parser.add_argument(
+            '--workers', type=int, nargs='+',
+            help="Worker counts to measure (default: powers of two up to the number of CPUs).",
+        )
+        parser.add_argument('--mode', choices=dict(IMPORT_MODES), help="Import mode used by the workers.")
+        parser.add_argument('--source', default=str(SAMPLE_REPORT_PATH), help="Report to scale up.")
+
+    def handle(self, *args, **options):
+        worker_counts = options['workers'] or self._default_worker_counts()
+        if KayakTransaction.objects.filter(lead_id__startswith=BENCHMARK_LEAD_ID_PREFIX).exists():
+            raise CommandError(f"Rows with LeadIds starting with '{BENCHMARK_LEAD_ID_PREFIX}' already exist.")
+        # Hotels and locations with higher ids are created by the benchmark
+        last_hotel = Hotel.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        last_location = Location.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, 'report.csv')
+            self.stdout.write(f"Generating {options['rows']} rows...")
+            write_scaled_report(csv_path, options['rows'], options['source'], BENCHMARK_LEAD_ID_PREFIX)
+
+            baseline = None
+            for workers in worker_counts:
+                try:
+                    results, elapsed = timed(
+                        ParallelCSVImporter.import_csv_file, csv_path, workers=workers, mode=options['mode'],
+                    )
+                finally:
+                    delete_benchmark_rows(
+                        BENCHMARK_LEAD_ID_PREFIX, hotels=Hotel.objects.filter(pk__gt=last_hotel),
+                        locations=Location.objects.filter(pk__gt=last_location),
+                    )
+                if 'error' in results:
+                    raise CommandError(f"Import with {workers} workers failed: {results['error']}")
+
+                rows_per_sec = options['rows'] / elapsed
+                baseline = baseline or rows_per_sec
+                self.stdout.write(
+                    f"{workers:>3} workers  {elapsed:8.2f}s  {rows_per_sec:10.0f} rows/s  "
+                    f"speedup {rows_per_sec / baseline:5.2f}x"
+                )
+
+    @staticmethod
+    def _default_worker_counts():
+        counts, workers = [], 1
+        while workers < os.cpu_count():
+            counts.append(workers)
+            workers *= 2
+        return counts + [os.cpu_count()]
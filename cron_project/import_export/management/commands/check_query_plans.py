@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from import_export.models import Hotel, KayakTransaction, Location
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot admin and rollup queries on KayakTransaction and check that each one "
+        "is served by its index. Sequential scans are disabled while planning (small tables are "
+        "always scanned); pass --planner-choice to check the plans the planner picks on its own. "
+        "On a partitioned table the indexes of the partitions count as their parent index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--planner-choice', action='store_true',
+            help="Keep sequential scans enabled, to check the plans on a production-sized table.",
+        )
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan.")
+
+    def handle(self, *args, **options):
+        failures = 0
+        for label, queryset, expected_indexes in self.hot_queries():
+            plan = self._explain(queryset, options['planner_choice'])
+            missing = [
+                name for name in expected_indexes
+                if not any(index in plan for index in self._index_names(name))
+            ]
+            if 'Seq Scan' in plan and not options['planner_choice'] and not missing:
+                missing = ['an index on every partition']
+            if missing:
+                failures += 1
+                self.stderr.write(f"FAIL {label}: {', '.join(missing)} not used\n{plan}")
+                continue
+            self.stdout.write(self.style.SUCCESS(f"ok   {label}"))
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"{failures} quer{'y' if failures == 1 else 'ies'} not served by the expected index.")
+
+    @staticmethod
+    def hot_queries():
+        """
+        (label, queryset, index names the plan has to mention) for the queries the admin
+        changelist and the rollup refresh run on every request or import. An empty list
+        accepts any index.
+        """
+        model_admin = admin.site._registry[KayakTransaction]
+        request = RequestFactory().get('/')
+        transactions = KayakTransaction.objects.all()
+        # A month that has data, so that partition pruning leaves something to plan
+        latest = transactions.aggregate(latest=Max('lead_date'))['latest'] or timezone.now()
+        start = latest.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=7)
+        end = start + timedelta(days=8)
+
+        # The admin search resolves the matching hotels and locations first, then filters
+        # the transactions on lead_id and on the resulting id lists
+        search, _ = model_admin.get_search_results(request, transactions, 'ams')
+        return [
+            ('admin search: locations', Location.objects.filter(Q(city__icontains='ams') | Q(country__icontains='ams')), [
+                'location_city_trgm', 'location_country_trgm',
+            ]),
+            ('admin search: hotels', Hotel.objects.filter(hotel_id__icontains='ams'), ['hotel_hotel_id_trgm']),
+            ('admin search: transactions', search, ['kayak_tx_lead_id_trgm']),
+            # First changelist page, in the keyset order the admin pages by
+            ('admin lead_date filter (past 7 days)', transactions.filter(lead_date__gte=start, lead_date__lt=end).order_by(*model_admin.ordering)[:model_admin.list_per_page], [
+                'kayak_tx_lead_date_id_idx',
+            ]),
+            ('admin hotel filter', transactions.filter(hotel=1), ['kayak_tx_hotel_idx']),
+            ('country report over a date range', transactions.filter(location__country='Aruba', lead_date__gte=start, lead_date__lt=end), [
+                'kayak_tx_location_date_idx',
+            ]),
+            ('upsert lookup by lead_id', transactions.filter(lead_id__in=['a', 'b']), []),
+        ]
+
+    @staticmethod
+    def _index_names(name):
+        """
+        The index itself and, on a partitioned table, the indexes of its partitions.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(%s)',
+                [name],
+            )
+            return [name] + [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _explain(queryset, planner_choice):
+        with transaction.atomic():
+            if not planner_choice:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
@@ -0,0 +1,58 @@
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from import_export.models import KayakTransaction
+from import_export.utils import CSVDataImporter, IMPORT_MODES
+
+# Compared KayakTransaction values. Hotels and locations are compared by their natural keys:
+# those created by a rolled back run get new ids in the next one.
+COMPARED_FIELDS = [
+    'lead_id', 'lead_date', 'lead_checkin', 'lead_checkout', 'revenue', 'commission',
+    'hotel__hotel_id', 'location__country', 'location__city', 'fingerprint',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the same CSV file once per import mode, each inside a rolled back transaction, "
+        "and check that every mode leaves the same KayakTransaction rows behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help="Path of the Kayak report to import.")
+
+    def handle(self, *args, **options):
+        csv_path = options['csv_path']
+        try:
+            lead_ids = pd.read_csv(csv_path, usecols=['LeadId'])['LeadId'].dropna().astype(str).unique().tolist()
+        except Exception as e:
+            raise CommandError(f"Could not read {csv_path}: {e}")
+
+        snapshots = {}
+        for mode, label in IMPORT_MODES:
+            with transaction.atomic():
+                results = CSVDataImporter.import_csv_data(csv_path, mode=mode)
+                snapshots[mode] = list(
+                    KayakTransaction.objects
+                    .filter(lead_id__in=lead_ids)
+                    .order_by('lead_id')
+                    .values_list(*COMPARED_FIELDS)
+                )
+                transaction.set_rollback(True)
+            self.stdout.write(f"{label}: {results}, {len(snapshots[mode])} rows")
+
+        (reference_mode, reference), *others = snapshots.items()
+        mismatches = 0
+        for mode, rows in others:
+            if rows != reference:
+                mismatches += 1
+                differing = [(a, b) for a, b in zip(reference, rows) if a != b]
+                self.stderr.write(
+                    f"'{mode}' differs from '{reference_mode}': {len(reference)} vs {len(rows)} rows, "
+                    f"{len(differing)} differing, first: {differing[:1]}"
+                )
+
+        if mismatches:
+            raise CommandError("Import modes produced different rows.")
+        self.stdout.write(self.style.SUCCESS("All import modes produced identical rows."))
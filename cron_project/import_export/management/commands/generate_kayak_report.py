@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from import_export.benchmarking import timed, write_synthetic_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a synthetic Kayak report with the columns of the sample report, for load tests of "
+        "the admin import and the cron job. The same --seed always gives the same file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to write.")
+        parser.add_argument('--rows', type=int, default=100_000, help="Rows in the report.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the report.")
+        parser.add_argument('--duplicate-rate', type=float, default=0.02, help="Share of re-delivered LeadIds.")
+        parser.add_argument('--invalid-rate', type=float, default=0.001, help="Share of rows that fail validation.")
+        parser.add_argument('--lead-id-prefix', default='', help="Prefix of the generated LeadIds.")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError("--rows must be positive.")
+        _, elapsed = timed(
+            write_synthetic_report, options['path'], options['rows'], options['seed'],
+            options['lead_id_prefix'], options['duplicate_rate'], options['invalid_rate'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['rows']} rows to {options['path']} in {elapsed:.2f}s"))
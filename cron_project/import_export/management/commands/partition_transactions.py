@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import DateField, Max
+from django.db.models.functions import TruncMonth
+
+from import_export.db_modules.partitions import ensure_partitions, is_partitioned
+from import_export.models import KayakTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the KayakTransaction table into a table partitioned by month of lead_date. "
+        "The data is copied into monthly partitions and the tables are swapped in one transaction, "
+        "which holds an exclusive lock on the table for the duration: run it in a maintenance "
+        "window, then restart the web server and the import workers."
+    )
+
+    def handle(self, *args, **options):
+        if is_partitioned():
+            raise CommandError("KayakTransaction is already partitioned.")
+
+        self.verbose = options['verbosity'] > 1
+        table = KayakTransaction._meta.db_table
+        legacy = f'{table}_unpartitioned'
+        quoted, quoted_legacy = connection.ops.quote_name(table), connection.ops.quote_name(legacy)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            self._execute(cursor, f'LOCK TABLE {quoted} IN ACCESS EXCLUSIVE MODE')
+
+            cursor.execute(
+                'SELECT conname, conrelid::regclass FROM pg_constraint WHERE contype = %s AND confrelid = to_regclass(%s)',
+                ['f', table],
+            )
+            referencing = cursor.fetchall()
+            if referencing:
+                raise CommandError(
+                    "Foreign keys reference the table and cannot follow it to a partitioned table: "
+                    + ', '.join(f'{name} on {relation}' for name, relation in referencing)
+                )
+
+            # Definitions replayed on the new table. Unique indexes are not: a unique index on a
+            # partitioned table has to include lead_date, so they are replaced below.
+            cursor.execute(
+                'SELECT pg_get_indexdef(indexrelid) FROM pg_index '
+                'WHERE indrelid = to_regclass(%s) AND NOT indisunique AND NOT indisprimary',
+                [table],
+            )
+            index_definitions = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE contype = %s AND conrelid = to_regclass(%s)',
+                ['f', table],
+            )
+            foreign_keys = cursor.fetchall()
+
+            months = set(
+                KayakTransaction.objects
+                .annotate(month=TruncMonth('lead_date', output_field=DateField()))
+                .values_list('month', flat=True)
+                .distinct()
+            )
+            last_id = KayakTransaction.objects.aggregate(last_id=Max('id'))['last_id']
+
+            self._execute(cursor, f'ALTER TABLE {quoted} RENAME TO {quoted_legacy}')
+            self._execute(
+                cursor,
+                f'CREATE TABLE {quoted} (LIKE {quoted_legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+                f'INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY RANGE (lead_date)',
+            )
+            is_partitioned.cache_clear()
+            ensure_partitions(months)
+            self._execute(cursor, f'INSERT INTO {quoted} SELECT * FROM {quoted_legacy}')
+            copied = cursor.rowcount
+            # Frees the index, constraint and sequence names of the old table
+            self._execute(cursor, f'DROP TABLE {quoted_legacy}')
+
+            primary_key = connection.ops.quote_name(f'{table}_pkey')
+            unique_lead = connection.ops.quote_name(f'{table}_lead_id_lead_date_key')
+            self._execute(cursor, f'ALTER TABLE {quoted} ADD CONSTRAINT {primary_key} PRIMARY KEY (id, lead_date)')
+            self._execute(cursor, f'ALTER TABLE {quoted} ADD CONSTRAINT {unique_lead} UNIQUE (lead_id, lead_date)')
+            sequence = connection.ops.quote_name(f'{table}_id_seq')
+            self._execute(cursor, f'CREATE SEQUENCE {sequence} OWNED BY {quoted}.id')
+            self._execute(cursor, f'ALTER TABLE {quoted} ALTER COLUMN id SET DEFAULT nextval(\'{sequence}\')')
+            if last_id:
+                self._execute(cursor, f"SELECT setval('{sequence}', {int(last_id)})")
+            for definition in index_definitions:
+                self._execute(cursor, definition)
+            for name, definition in foreign_keys:
+                self._execute(cursor, f'ALTER TABLE {quoted} ADD CONSTRAINT {connection.ops.quote_name(name)} {definition}')
+
+        with connection.cursor() as cursor:
+            self._execute(cursor, f'ANALYZE {quoted}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Partitioned {table}: {copied} rows in {len(months)} monthly partitions. "
+            "Restart the web server and the import workers."
+        ))
+
+    def _execute(self, cursor, sql):
+        if self.verbose:
+            self.stdout.write(f"{sql};")
+        cursor.execute(sql)
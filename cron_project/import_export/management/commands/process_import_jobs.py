@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from import_export.import_jobs import process_import_jobs
+from import_export.instrumentation import format_stage_timings
+
+
+class Command(BaseCommand):
+    help = "Run queued CSV import jobs. With --loop, keep polling the queue instead of exiting when it is empty."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new jobs.")
+        parser.add_argument('--sleep', type=float, default=5.0, help="Seconds between polls with --loop.")
+        parser.add_argument('--max-jobs', type=int, help="Stop after running this many jobs.")
+
+    def handle(self, *args, **options):
+        max_jobs = options['max_jobs']
+        total = 0
+        while True:
+            jobs = process_import_jobs(max_jobs=None if max_jobs is None else max_jobs - total)
+            for job in jobs:
+                self.stdout.write(
+                    f"{job}: {job.status}, {job.inserted_count} inserted, {job.updated_count} updated, "
+                    f"{job.unchanged_count} unchanged, {job.duplicate_count} duplicates coalesced, "
+                    f"{job.error_count} failed"
+                    + (f" ({job.error})" if job.error else "")
+                )
+                if job.stage_timings:
+                    self.stdout.write(f"  stages: {format_stage_timings(job.stage_timings)}")
+            total += len(jobs)
+            if not options['loop'] or (max_jobs is not None and total >= max_jobs):
+                break
+            if not jobs:
+                time.sleep(options['sleep'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from import_export.db_modules.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily / per-location and monthly / per-country revenue rollups from all Kayak transactions."
+
+    def handle(self, *args, **options):
+        row_count = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {row_count} revenue rollup rows."))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0003_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True, verbose_name='File Path')),
+                ('device', models.BigIntegerField(verbose_name='Device')),
+                ('inode', models.BigIntegerField(verbose_name='Inode')),
+                ('size', models.BigIntegerField(verbose_name='Size')),
+                ('mtime', models.FloatField(verbose_name='Modified Time')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Committed Offset')),
+                ('output_offset', models.BigIntegerField(default=0, verbose_name='Output Offset')),
+                ('content_hash', models.CharField(blank=True, max_length=64, verbose_name='Content Hash')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'File Checkpoint',
+                'verbose_name_plural': 'File Checkpoints',
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:48
+
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    """
+    Fill the rollups from the transactions already in the database.
+    """
+    KayakTransaction = apps.get_model('import_export', 'KayakTransaction')
+    RevenueRollup = apps.get_model('import_export', 'RevenueRollup')
+    rows = (
+        KayakTransaction.objects
+        .annotate(month=TruncMonth('lead_date', output_field=DateField()))
+        .values('month', 'hotel_country')
+        .annotate(
+            total_revenue=Sum('revenue'),
+            total_commission=Sum('commission'),
+            transaction_count=Count('id'),
+        )
+        .order_by()
+    )
+    RevenueRollup.objects.bulk_create([RevenueRollup(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0004_filecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Month')),
+                ('hotel_country', models.CharField(blank=True, max_length=100, null=True, verbose_name='Hotel Country')),
+                ('total_revenue', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Total Revenue')),
+                ('total_commission', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Total Commission')),
+                ('transaction_count', models.PositiveIntegerField(verbose_name='Transactions')),
+            ],
+            options={
+                'verbose_name': 'Revenue Rollup',
+                'verbose_name_plural': 'Revenue Rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='revenuerollup',
+            constraint=models.UniqueConstraint(fields=('month', 'hotel_country'), name='unique_revenue_rollup_month_country'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:53
+
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0006_dataversion'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=models.Index(fields=['lead_date'], name='kayak_tx_lead_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=models.Index(fields=['hotel_id'], name='kayak_tx_hotel_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=models.Index(fields=['hotel_country', 'lead_date'], name='kayak_tx_country_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('lead_id'), name='gin_trgm_ops'), name='kayak_tx_lead_id_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('hotel_city'), name='gin_trgm_ops'), name='kayak_tx_city_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('hotel_country'), name='gin_trgm_ops'), name='kayak_tx_country_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('hotel_id'), name='gin_trgm_ops'), name='kayak_tx_hotel_id_trgm'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0007_kayaktransaction_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='kayaktransaction',
+            name='kayak_tx_lead_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=models.Index(fields=['lead_date', 'id'], name='kayak_tx_lead_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0008_kayaktransaction_lead_date_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kayaktransaction',
+            name='hotel_location',
+            field=models.CharField(blank=True, editable=False, max_length=210, null=True, verbose_name='Hotel Location'),
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=models.Index(fields=['hotel_location'], name='kayak_tx_location_idx'),
+        ),
+    ]
@@ -0,0 +1,171 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:04
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+# Location.build_label in SQL: NULL when the country or the city is blank, "City, Country" otherwise.
+LABEL_SQL = (
+    "CASE WHEN btrim(country, E' \\t\\n\\r\\f\\v') = '' OR btrim(city, E' \\t\\n\\r\\f\\v') = '' "
+    "THEN NULL ELSE city || ', ' || country END"
+)
+
+FILL_DIMENSIONS = [
+    f"""
+    INSERT INTO import_export_location (country, city, label)
+    SELECT country, city, {LABEL_SQL}
+    FROM (
+        SELECT DISTINCT coalesce(hotel_country, '') AS country, coalesce(hotel_city, '') AS city
+        FROM import_export_kayaktransaction
+    ) AS locations
+    """,
+    """
+    INSERT INTO import_export_hotel (hotel_id, name, brand_id)
+    SELECT DISTINCT hotel_code, '', '' FROM import_export_kayaktransaction
+    WHERE hotel_code IS NOT NULL AND hotel_code <> ''
+    """,
+    """
+    UPDATE import_export_kayaktransaction AS tx SET location_id = loc.id
+    FROM import_export_location AS loc
+    WHERE loc.country = coalesce(tx.hotel_country, '')
+      AND loc.city = coalesce(tx.hotel_city, '')
+    """,
+    """
+    UPDATE import_export_kayaktransaction AS tx SET hotel_id = h.id
+    FROM import_export_hotel AS h
+    WHERE h.hotel_id = tx.hotel_code
+    """,
+]
+
+RESTORE_TEXT_COLUMNS = [
+    """
+    UPDATE import_export_kayaktransaction AS tx SET hotel_code = h.hotel_id
+    FROM import_export_hotel AS h WHERE h.id = tx.hotel_id
+    """,
+    """
+    UPDATE import_export_kayaktransaction AS tx
+    SET hotel_country = nullif(loc.country, ''), hotel_city = nullif(loc.city, ''),
+        hotel_location = loc.label
+    FROM import_export_location AS loc WHERE loc.id = tx.location_id
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0009_kayaktransaction_hotel_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hotel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hotel_id', models.CharField(max_length=255, unique=True, verbose_name='Hotel ID')),
+                ('name', models.CharField(blank=True, default='', max_length=255, verbose_name='Hotel Name')),
+                ('brand_id', models.CharField(blank=True, default='', max_length=64, verbose_name='Brand ID')),
+            ],
+            options={
+                'verbose_name': 'Hotel',
+                'verbose_name_plural': 'Hotels',
+            },
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(blank=True, default='', max_length=100, verbose_name='Country')),
+                ('city', models.CharField(blank=True, default='', max_length=100, verbose_name='City')),
+                ('label', models.CharField(blank=True, db_index=True, editable=False, max_length=210, null=True, verbose_name='Location')),
+            ],
+            options={
+                'verbose_name': 'Location',
+                'verbose_name_plural': 'Locations',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(fields=('country', 'city'), name='unique_location_country_city'),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('hotel_id'), name='gin_trgm_ops'), name='hotel_hotel_id_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('city'), name='gin_trgm_ops'), name='location_city_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('country'), name='gin_trgm_ops'), name='location_country_trgm'),
+        ),
+        migrations.RemoveIndex(
+            model_name='kayaktransaction',
+            name='kayak_tx_hotel_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='kayaktransaction',
+            name='kayak_tx_hotel_id_trgm',
+        ),
+        # The hotel foreign key takes over the hotel_id column name, so the text column steps
+        # aside until its values have been moved to the Hotel table.
+        migrations.RenameField(
+            model_name='kayaktransaction',
+            old_name='hotel_id',
+            new_name='hotel_code',
+        ),
+        migrations.AddField(
+            model_name='kayaktransaction',
+            name='hotel',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='import_export.hotel', verbose_name='Hotel'),
+        ),
+        migrations.AddField(
+            model_name='kayaktransaction',
+            name='location',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='import_export.location', verbose_name='Hotel Location'),
+        ),
+        migrations.RunSQL(FILL_DIMENSIONS, reverse_sql=RESTORE_TEXT_COLUMNS),
+        migrations.RemoveIndex(
+            model_name='kayaktransaction',
+            name='kayak_tx_country_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='kayaktransaction',
+            name='kayak_tx_city_trgm',
+        ),
+        migrations.RemoveIndex(
+            model_name='kayaktransaction',
+            name='kayak_tx_country_trgm',
+        ),
+        migrations.RemoveIndex(
+            model_name='kayaktransaction',
+            name='kayak_tx_location_idx',
+        ),
+        migrations.RemoveField(
+            model_name='kayaktransaction',
+            name='hotel_city',
+        ),
+        migrations.RemoveField(
+            model_name='kayaktransaction',
+            name='hotel_country',
+        ),
+        migrations.RemoveField(
+            model_name='kayaktransaction',
+            name='hotel_code',
+        ),
+        migrations.RemoveField(
+            model_name='kayaktransaction',
+            name='hotel_location',
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=models.Index(fields=['hotel'], name='kayak_tx_hotel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kayaktransaction',
+            index=models.Index(fields=['location', 'lead_date'], name='kayak_tx_location_date_idx'),
+        ),
+    ]
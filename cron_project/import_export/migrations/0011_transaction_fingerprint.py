@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0010_hotel_location_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='inserted_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Inserted'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='unchanged_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Unchanged'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='updated_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Updated'),
+        ),
+        migrations.AddField(
+            model_name='kayaktransaction',
+            name='fingerprint',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Fingerprint'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0011_transaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='duplicate_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Duplicates Coalesced'),
+        ),
+    ]
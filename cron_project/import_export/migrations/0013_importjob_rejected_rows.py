@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0012_importjob_duplicate_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='reject_reasons',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Rejected Rows'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='rejected_file_path',
+            field=models.CharField(blank=True, max_length=500, verbose_name='Rejected Rows File'),
+        ),
+    ]
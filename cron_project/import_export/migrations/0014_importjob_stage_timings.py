@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0013_importjob_rejected_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Stage Timings'),
+        ),
+    ]
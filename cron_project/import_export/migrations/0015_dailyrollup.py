@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:44
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def build_daily_rollups(apps, schema_editor):
+    """
+    Fill the daily rollups from the transactions already in the database.
+    """
+    KayakTransaction = apps.get_model('import_export', 'KayakTransaction')
+    DailyRollup = apps.get_model('import_export', 'DailyRollup')
+    rows = (
+        KayakTransaction.objects
+        .annotate(day=TruncDate('lead_date'))
+        .values('day', 'location_id')
+        .annotate(
+            total_revenue=Sum('revenue'),
+            total_commission=Sum('commission'),
+            transaction_count=Count('id'),
+        )
+        .order_by()
+    )
+    DailyRollup.objects.bulk_create([DailyRollup(**row) for row in rows], batch_size=10_000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0014_importjob_stage_timings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('total_revenue', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Total Revenue')),
+                ('total_commission', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Total Commission')),
+                ('transaction_count', models.PositiveIntegerField(verbose_name='Transactions')),
+                ('location', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='daily_rollups', to='import_export.location', verbose_name='Hotel Location')),
+            ],
+            options={
+                'verbose_name': 'Daily Rollup',
+                'verbose_name_plural': 'Daily Rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'location'), name='unique_daily_rollup_day_location'),
+        ),
+        migrations.RunPython(build_daily_rollups, migrations.RunPython.noop),
+    ]
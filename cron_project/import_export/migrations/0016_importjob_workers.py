@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0015_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='workers',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='Workers'),
+        ),
+    ]
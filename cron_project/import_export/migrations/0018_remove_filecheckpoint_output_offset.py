@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:55
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_export', '0017_importjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='filecheckpoint',
+            name='output_offset',
+        ),
+    ]
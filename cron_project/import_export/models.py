@@ -1,43 +1,283 @@
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
+
+class Hotel(models.Model):
+    """
+    A hotel of the Kayak reports. Transactions reference it instead of repeating its text.
+    """
+    hotel_id = models.CharField(max_length=255, unique=True, verbose_name="Hotel ID")
+    name = models.CharField(max_length=255, blank=True, default='', verbose_name="Hotel Name")
+    brand_id = models.CharField(max_length=64, blank=True, default='', verbose_name="Brand ID")
+
+    class Meta:
+        verbose_name = "Hotel"
+        verbose_name_plural = "Hotels"
+        indexes = [
+            GinIndex(OpClass(Upper('hotel_id'), name='gin_trgm_ops'), name='hotel_hotel_id_trgm'),
+        ]
+
+    def __str__(self):
+        return self.hotel_id
+
+
+class Location(models.Model):
+    """
+    A (country, city) pair of the Kayak reports. Missing values are stored as '' so that
+    each pair exists once; `label` is "City, Country", or NULL when the location is invalid.
+    """
+    country = models.CharField(max_length=100, blank=True, default='', verbose_name="Country")
+    city = models.CharField(max_length=100, blank=True, default='', verbose_name="City")
+    # Stored and indexed so that the changelist can sort and filter by it
+    label = models.CharField(max_length=210, null=True, blank=True, editable=False, db_index=True, verbose_name="Location")
+
+    def save(self, *args, **kwargs):
+        self.label = self.build_label(self.country, self.city)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def build_label(cls, country, city):
+        """
+        The value stored in label: None if the location data is invalid.
+        """
+        if cls._is_location_invalid(country, city):
+            return None
+        return cls._format_location(country, city)
+
+    @staticmethod
+    def _is_location_invalid(country, city):
+        """
+        Check if the location data is invalid (e.g., missing or empty country or city).
+        """
+        return (
+            not country or not city or  # Missing country or city
+            country.strip() == '' or city.strip() == ''  # Empty country or city
+        )
+
+    @staticmethod
+    def _format_location(country, city):
+        """
+        Format the hotel location string.
+        """
+        return f"{city}, {country}"
+
+    class Meta:
+        verbose_name = "Location"
+        verbose_name_plural = "Locations"
+        constraints = [
+            models.UniqueConstraint(fields=['country', 'city'], name='unique_location_country_city'),
+        ]
+        indexes = [
+            # Admin search on transactions looks the matching locations up here first
+            GinIndex(OpClass(Upper('city'), name='gin_trgm_ops'), name='location_city_trgm'),
+            GinIndex(OpClass(Upper('country'), name='gin_trgm_ops'), name='location_country_trgm'),
+        ]
+
+    def __str__(self):
+        return self.label or 'None'
+
 
 class KayakTransaction(models.Model):
+    # Once the table is partitioned (partition_transactions) the database only enforces
+    # UNIQUE (lead_id, lead_date), as a unique constraint must include the partition key. The
+    # imports keep lead_id unique by deleting a lead's row of another lead_date (see
+    # delete_moved_rows), and check_partitioned_transactions stops migrations made from this
+    # declaration from being applied to the partitioned table.
     lead_id = models.CharField(max_length=255, unique=True, verbose_name="Lead ID")
     lead_date = models.DateTimeField(verbose_name="Lead Date")
     lead_checkin = models.DateTimeField(verbose_name="Lead Check-in")
     lead_checkout = models.DateTimeField(verbose_name="Lead Checkout")
     revenue = models.DecimalField(max_digits=10, decimal_places=2)
     commission = models.DecimalField(max_digits=10, decimal_places=2)
-    hotel_country = models.CharField(max_length=100, null=True, blank=True, verbose_name="Hotel Country")
-    hotel_city = models.CharField(max_length=100, null=True, blank=True, verbose_name="Hotel City")
-    hotel_id = models.CharField(max_length=255, null=True, blank=True, verbose_name="Hotel ID")  # NEW FIELD
+    # Indexed through Meta.indexes
+    hotel = models.ForeignKey(
+        Hotel, on_delete=models.PROTECT, null=True, blank=True, db_index=False,
+        related_name='transactions', verbose_name="Hotel",
+    )
+    location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, null=True, blank=True, db_index=False,
+        related_name='transactions', verbose_name="Hotel Location",
+    )
+    # Hash of the imported content of the row, so re-imports can skip rows that did not change.
+    # NULL for rows not written by an import (or edited since), which the next import rewrites.
+    fingerprint = models.BigIntegerField(null=True, blank=True, editable=False, verbose_name="Fingerprint")
 
     @property
     def hotel_location_status(self):
         """
         Returns a formatted location string or 'None' if the location data is invalid.
         """
-        if self._is_location_invalid():
-            return 'None'
-        return self._format_location()
+        return (self.location.label if self.location_id else None) or 'None'
 
-    def _is_location_invalid(self):
-        """
-        Check if the location data is invalid (e.g., missing, invalid, or negative hotel_id).
-        """
-        return (
-            not self.hotel_country or not self.hotel_city or  # Missing country or city
-            self.hotel_country.strip() == '' or self.hotel_city.strip() == ''  # Empty country or city
-        )
+    class Meta:
+        verbose_name = "Kayak Transaction"
+        verbose_name_plural = "Kayak Transactions"
+        indexes = [
+            # Admin date filters, date ranges of the rollup refresh and per-country reports.
+            # The id makes it the index the admin changelist pages through (see KeysetPaginator).
+            models.Index(fields=['lead_date', 'id'], name='kayak_tx_lead_date_id_idx'),
+            models.Index(fields=['hotel'], name='kayak_tx_hotel_idx'),
+            models.Index(fields=['location', 'lead_date'], name='kayak_tx_location_date_idx'),
+            # Admin search: icontains compares UPPER(column) LIKE '%...%', which only a
+            # trigram index on the same expression can serve
+            GinIndex(OpClass(Upper('lead_id'), name='gin_trgm_ops'), name='kayak_tx_lead_id_trgm'),
+        ]
+
+    def __str__(self):
+        return self.lead_id
 
-    def _format_location(self):
+
+class RevenueRollup(models.Model):
+    """
+    Revenue totals of KayakTransaction per month and hotel country. Kept up to date by the
+    import pipeline for the months an import touches; rebuilt with `manage.py rebuild_rollups`.
+    """
+    month = models.DateField(verbose_name="Month")
+    hotel_country = models.CharField(max_length=100, null=True, blank=True, verbose_name="Hotel Country")
+    total_revenue = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Total Revenue")
+    total_commission = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Total Commission")
+    transaction_count = models.PositiveIntegerField(verbose_name="Transactions")
+
+    class Meta:
+        verbose_name = "Revenue Rollup"
+        verbose_name_plural = "Revenue Rollups"
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'hotel_country'], name='unique_revenue_rollup_month_country'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.hotel_country or 'Unknown'}"
+
+
+class DailyRollup(models.Model):
+    """
+    Revenue totals of KayakTransaction per day and hotel location, for the daily and weekly
+    charts and the per-city drill-down. Refreshed with RevenueRollup, whose monthly rows are
+    aggregated from these.
+    """
+    day = models.DateField(verbose_name="Day")
+    location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, null=True, blank=True, db_index=False,
+        related_name='daily_rollups', verbose_name="Hotel Location",
+    )
+    total_revenue = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Total Revenue")
+    total_commission = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Total Commission")
+    transaction_count = models.PositiveIntegerField(verbose_name="Transactions")
+
+    class Meta:
+        verbose_name = "Daily Rollup"
+        verbose_name_plural = "Daily Rollups"
+        constraints = [
+            # Its index also serves the date-range filters of the charts
+            models.UniqueConstraint(fields=['day', 'location'], name='unique_daily_rollup_day_location'),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%Y-%m-%d} {self.location or 'Unknown'}"
+
+
+class DataVersion(models.Model):
+    """
+    Counter bumped whenever a dataset changes, so caches keyed by it go stale on new data.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Dataset")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Version")
+
+    class Meta:
+        verbose_name = "Data Version"
+        verbose_name_plural = "Data Versions"
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class ImportJob(models.Model):
+    """
+    A CSV import queued from the admin and run in the background by a worker
+    (the process_import_jobs command or ImportJobCronJob).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    original_name = models.CharField(max_length=255, verbose_name="File Name")
+    file_path = models.CharField(max_length=500, verbose_name="Spooled File")
+    mode = models.CharField(max_length=20, verbose_name="Import Mode")
+    # More than one imports the file in parallel, see import_export.parallel_import
+    workers = models.PositiveSmallIntegerField(default=1, verbose_name="Workers")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    total_rows = models.PositiveIntegerField(null=True, blank=True, verbose_name="Total Rows")
+    processed_rows = models.PositiveIntegerField(default=0, verbose_name="Processed Rows")
+    success_count = models.PositiveIntegerField(default=0, verbose_name="Imported")
+    inserted_count = models.PositiveIntegerField(default=0, verbose_name="Inserted")
+    updated_count = models.PositiveIntegerField(default=0, verbose_name="Updated")
+    unchanged_count = models.PositiveIntegerField(default=0, verbose_name="Unchanged")
+    duplicate_count = models.PositiveIntegerField(default=0, verbose_name="Duplicates Coalesced")
+    # Rows rejected by validation, per reason, and the CSV they were written to with their reasons
+    reject_reasons = models.JSONField(default=dict, blank=True, verbose_name="Rejected Rows")
+    rejected_file_path = models.CharField(max_length=500, blank=True, verbose_name="Rejected Rows File")
+    # Per-stage (read, parse, clean, write) time, rows, queries and memory, see import_export.instrumentation
+    stage_timings = models.JSONField(default=dict, blank=True, verbose_name="Stage Timings")
+    error_count = models.PositiveIntegerField(default=0, verbose_name="Failed")
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, verbose_name="Created By"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Started At")
+    # Refreshed by the worker while the job runs; a running job without a recent one lost its worker
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="Heartbeat At")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Finished At")
+
+    @property
+    def progress_percent(self):
         """
-        Format the hotel location string.
+        Share of rows processed so far, or None while the row count is unknown.
         """
-        return f"{self.hotel_city}, {self.hotel_country}"
+        if self.status == self.STATUS_SUCCEEDED:
+            return 100
+        if not self.total_rows:
+            return None
+        return min(100, int(self.processed_rows * 100 / self.total_rows))
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
 
     class Meta:
-        verbose_name = "Kayak Transaction"
-        verbose_name_plural = "Kayak Transactions"
+        ordering = ['-created_at']
+        verbose_name = "Import Job"
+        verbose_name_plural = "Import Jobs"
 
     def __str__(self):
-        return self.lead_id
+        return f"Import #{self.pk} ({self.original_name})"
+
+
+class FileCheckpoint(models.Model):
+    """
+    How far a cron job got through a report file, so later runs can skip the file when
+    it is unchanged, process only the appended tail when it grew, and resume after a crash.
+    """
+    path = models.CharField(max_length=500, unique=True, verbose_name="File Path")
+    device = models.BigIntegerField(verbose_name="Device")
+    inode = models.BigIntegerField(verbose_name="Inode")
+    size = models.BigIntegerField(verbose_name="Size")
+    mtime = models.FloatField(verbose_name="Modified Time")
+    offset = models.BigIntegerField(default=0, verbose_name="Committed Offset")
+    content_hash = models.CharField(max_length=64, blank=True, verbose_name="Content Hash")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    class Meta:
+        verbose_name = "File Checkpoint"
+        verbose_name_plural = "File Checkpoints"
+
+    def __str__(self):
+        return f"{self.path} @ {self.offset}"
@@ -0,0 +1,131 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Above this many rows (estimated), unfiltered changelists show the planner's row estimate
+# instead of running an exact COUNT(*).
+DEFAULT_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Query string parameters of the links to the next and previous changelist page: the
+# "<lead_date>,<id>" of the last row of the current page, or of its first row.
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+
+def estimated_count(model):
+    """
+    Row estimate of a model's table from pg_class.reltuples, kept up to date by autovacuum.
+    For a partitioned table the estimates of its partitions are added up. Returns None if
+    the table has never been analyzed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT SUM(reltuples) FILTER (WHERE reltuples >= 0), COUNT(*) FILTER (WHERE reltuples < 0) '
+            'FROM pg_class WHERE relkind = %s AND ('
+            '  oid = to_regclass(%s) OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))'
+            ')',
+            ['r', model._meta.db_table, model._meta.db_table],
+        )
+        total, never_analyzed = cursor.fetchone()
+    if total is None or never_analyzed:
+        return None
+    return int(total)
+
+
+class KeysetPaginator(Paginator):
+    """
+    Changelist paginator for large tables.
+
+    * count: unfiltered querysets use the reltuples estimate once it is above
+      KAYAK_ADMIN_ESTIMATED_COUNT_THRESHOLD; filtered ones are still counted exactly.
+    * pages: when the queryset is in `keyset_ordering`, the next (previous) page is found by
+      seeking past the (lead_date, id) of the last (first) row of the current one, passed as
+      `after` (`before`), so its cost does not grow with depth. A page number jumped to
+      directly still skips OFFSET rows, but reads its boundary from the index alone before
+      seeking to it, instead of making the database build and skip full rows.
+    """
+    keyset_ordering = ('-lead_date', '-id')
+
+    def __init__(self, *args, after=None, before=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.after = parse_cursor(after)
+        self.before = parse_cursor(before)
+
+    @cached_property
+    def seekable(self):
+        # The admin changelist repeats the model admin's ordering, so compare without repeats
+        return tuple(dict.fromkeys(self.object_list.query.order_by)) == self.keyset_ordering
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            threshold = getattr(settings, 'KAYAK_ADMIN_ESTIMATED_COUNT_THRESHOLD', DEFAULT_ESTIMATED_COUNT_THRESHOLD)
+            estimate = estimated_count(self.object_list.model)
+            if estimate is not None and estimate >= threshold:
+                return estimate
+        return super().count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        offset = (number - 1) * self.per_page
+        if offset == 0 or not self.seekable:
+            return super().page(number)
+        if self.after:
+            return self._get_page(self.object_list.filter(_rows_after(*self.after))[:self.per_page], number, self)
+        if self.before:
+            rows = self.object_list.filter(_rows_before(*self.before)).reverse()[:self.per_page]
+            return self._get_page(list(rows)[::-1], number, self)
+
+        fields = [field.lstrip('-') for field in self.keyset_ordering]
+        boundary = list(self.object_list.values_list(*fields)[offset:offset + 1])
+        if not boundary:
+            # The estimated count overshot the table
+            return self._get_page([], number, self)
+        lead_date, pk = boundary[0]
+        # (lead_date, id) <= boundary
+        seek = Q(lead_date__lte=lead_date) & (Q(lead_date__lt=lead_date) | Q(id__lte=pk))
+        return self._get_page(self.object_list.filter(seek)[:self.per_page], number, self)
+
+    def cursor_params(self, number, object_list, target):
+        """
+        Query string parameters of the link from page `number`, showing `object_list`, to page
+        `target`: the cursor to seek from when it is the next or previous page.
+        """
+        rows = list(object_list)
+        if not rows or not self.seekable:
+            return {}
+        if target == number + 1:
+            return {AFTER_VAR: make_cursor(rows[-1])}
+        if target == number - 1 > 1:
+            return {BEFORE_VAR: make_cursor(rows[0])}
+        return {}
+
+
+def make_cursor(transaction):
+    return f"{transaction.lead_date.isoformat()},{transaction.pk}"
+
+
+def parse_cursor(value):
+    """
+    (lead_date, id) of a cursor made by make_cursor, or None if it is missing or malformed.
+    """
+    try:
+        lead_date, pk = value.rsplit(',', 1)
+        return datetime.fromisoformat(lead_date), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _rows_after(lead_date, pk):
+    # (lead_date, id) < cursor, with a plain lead_date bound the index scan can start from
+    return Q(lead_date__lte=lead_date) & (Q(lead_date__lt=lead_date) | Q(id__lt=pk))
+
+
+def _rows_before(lead_date, pk):
+    # (lead_date, id) > cursor
+    return Q(lead_date__gte=lead_date) & (Q(lead_date__gt=lead_date) | Q(id__gt=pk))
@@ -0,0 +1,208 @@
+import io
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+import pandas as pd
+from django.conf import settings
+from django.db import connections
+
+from .instrumentation import ImportInstrumentation
+from .utils import CSVDataImporter, CSV_DTYPES, IMPORT_MODE_BULK
+
+logger = logging.getLogger(__name__)
+
+
+class ParallelCSVImporter:
+    """
+    Imports a CSV file on several CPU cores.
+
+    The file is cut into byte-range shards on line boundaries. Shards are parsed and
+    cleaned in a ProcessPoolExecutor (phase 1), then written to the database by the
+    workers, each over its own connection (phase 2). Between the two phases every
+    LeadId is assigned to the last shard it appears in, and earlier shards drop it, so
+    the last row in the file wins no matter in which order the workers commit.
+    Shards assume one CSV record per line (no quoted line breaks), as in Kayak reports.
+    """
+
+    @staticmethod
+    def import_csv_file(csv_path, workers=None, mode=None, chunk_size=None, shard_bytes=None, rejected_file=None,
+                        progress_callback=None, start=0):
+        """
+        Imports the CSV file at `csv_path` with `workers` processes (see import_workers). Must
+        not be called inside a transaction, since the parent's connections are closed before forking.
+        Rows rejected by validation are appended to `rejected_file` in file order, if given.
+        If given, `progress_callback` is called with the running totals after every shard is
+        written. Data rows before byte offset `start` are skipped (the header is always read).
+        The rollups of the touched months are refreshed once all shards are written.
+        Returns the same result dictionary as CSVDataImporter.import_csv_data; its stage_timings
+        add up the time of all workers.
+        """
+        workers = import_workers(workers)
+        mode = mode or getattr(settings, 'KAYAK_IMPORT_MODE', IMPORT_MODE_BULK)
+        shard_bytes = shard_bytes or getattr(settings, 'KAYAK_IMPORT_SHARD_BYTES', 64 * 1024 * 1024)
+
+        try:
+            header, shards = ParallelCSVImporter._split_shards(csv_path, shard_bytes, start)
+        except Exception as e:
+            logger.exception("Error reading CSV file")
+            return {'success_count': 0, 'error_count': 1, 'error': str(e)}
+
+        results = {'success_count': 0, 'error_count': 0}
+        spool_dir = tempfile.mkdtemp(prefix='kayak_import_')
+        # Forked workers must not share the parent's database sockets.
+        connections.close_all()
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+                prepared = list(executor.map(
+                    _prepare_shard,
+                    [(csv_path, header, start, end, os.path.join(spool_dir, f'{index}.pkl'))
+                     for index, (start, end) in enumerate(shards)],
+                ))
+                for shard in prepared:
+                    CSVDataImporter._merge_results(results, shard['results'])
+                    if rejected_file and shard.get('rejected_path'):
+                        CSVDataImporter._write_rejected(pd.read_pickle(shard['rejected_path']), rejected_file)
+                if 'error' in results:
+                    return results
+
+                drop_ids = ParallelCSVImporter._superseded_lead_ids([shard['lead_ids'] for shard in prepared])
+                written = executor.map(
+                    _write_shard,
+                    [(shard['path'], drop, mode, chunk_size) for shard, drop in zip(prepared, drop_ids)],
+                )
+                for shard_results in written:
+                    CSVDataImporter._merge_results(results, shard_results)
+                    if progress_callback:
+                        progress_callback(results)
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+            CSVDataImporter.refresh_touched_rollups(results)
+
+        if rejected_file and results.get('reject_reasons'):
+            results['rejected_file'] = str(rejected_file)
+        return results
+
+    @staticmethod
+    def _split_shards(csv_path, shard_bytes, start=0):
+        """
+        Returns the header columns and a list of (start, end) byte ranges covering the
+        data rows from byte offset `start` on (a line start), each range starting at the
+        beginning of a line.
+        """
+        with open(csv_path, 'rb') as file:
+            header_line = file.readline()
+            data_start, size = max(file.tell(), start), os.fstat(file.fileno()).st_size
+
+            boundaries = [data_start]
+            while boundaries[-1] + shard_bytes < size:
+                file.seek(boundaries[-1] + shard_bytes)
+                file.readline()
+                if file.tell() >= size:
+                    break
+                boundaries.append(file.tell())
+            boundaries.append(size)
+
+        header = pd.read_csv(io.BytesIO(header_line), nrows=0).columns.tolist()
+        return header, list(zip(boundaries[:-1], boundaries[1:]))
+
+    @staticmethod
+    def _superseded_lead_ids(shard_lead_ids):
+        """
+        For each shard, returns the LeadIds that also appear in a later shard.
+        """
+        seen_later, superseded = set(), []
+        for lead_ids in reversed(shard_lead_ids):
+            superseded.append(seen_later.intersection(lead_ids))
+            seen_later.update(lead_ids)
+        return list(reversed(superseded))
+
+
+def import_workers(workers=None):
+    """
+    Number of worker processes of an import: `workers` if given, else
+    settings.KAYAK_IMPORT_WORKERS, where None means one per CPU.
+    """
+    if workers:
+        return workers
+    workers = getattr(settings, 'KAYAK_IMPORT_WORKERS', 1)
+    return workers or os.cpu_count()
+
+
+def _init_worker():
+    """
+    Makes sure Django is set up in worker processes that were spawned rather than forked.
+    """
+    django.setup()
+
+
+def _prepare_shard(args):
+    """
+    Phase 1: parses, validates and cleans one byte range and spools the result to disk
+    (rejected rows next to it, for the parent to append to the rejected-rows file in order).
+    """
+    csv_path, header, start, end, spool_path = args
+    instrumentation = ImportInstrumentation()
+    try:
+        with instrumentation.stage('read') as timing:
+            with open(csv_path, 'rb') as file:
+                file.seek(start)
+                data = file.read(end - start)
+            df = pd.read_csv(io.BytesIO(data), header=None, names=header, usecols=CSVDataImporter._use_column, dtype=CSV_DTYPES)
+            timing['rows'] += len(df)
+    except Exception as e:
+        logger.exception("Error reading CSV file")
+        return {'results': {'success_count': 0, 'error_count': 1, 'error': str(e)}, 'lead_ids': [], 'path': None}
+
+    rows = len(df)
+    try:
+        with instrumentation.stage('parse', rows):
+            df, raw = CSVDataImporter._parse_dataframe(df)
+        with instrumentation.stage('clean', rows):
+            df, rejected = CSVDataImporter._clean_dataframe(df, raw)
+    except Exception as e:
+        logger.exception("Error processing DataFrame")
+        return {'results': {'success_count': 0, 'error_count': rows, 'error': str(e)}, 'lead_ids': [], 'path': None}
+
+    with instrumentation.stage('clean'):
+        rejected_path = None
+        if not rejected.empty:
+            rejected_path = f'{spool_path}.rejected'
+            rejected.to_pickle(rejected_path)
+        df, duplicates = CSVDataImporter._coalesce_duplicates(df)
+        df.to_pickle(spool_path)
+
+    results = CSVDataImporter._merge_results(CSVDataImporter._rejected_results(rejected), duplicates)
+    return {
+        'results': CSVDataImporter._merge_results(results, instrumentation.results()),
+        'lead_ids': df['LeadId'].tolist(),
+        'path': spool_path,
+        'rejected_path': rejected_path,
+    }
+
+
+def _write_shard(args):
+    """
+    Phase 2: writes one spooled shard, leaving out the LeadIds owned by later shards.
+    """
+    spool_path, drop_ids, mode, chunk_size = args
+    instrumentation = ImportInstrumentation()
+    df = pd.read_pickle(spool_path)
+    superseded = df['LeadId'].isin(drop_ids)
+    try:
+        with instrumentation.stage('write', int((~superseded).sum())):
+            results = CSVDataImporter._write_rows(df[~superseded], mode, chunk_size)
+    except Exception as e:
+        logger.exception("Error writing rows to the database")
+        return {'success_count': 0, 'error_count': len(df), 'error': str(e)}
+    finally:
+        connections.close_all()
+    CSVDataImporter._merge_results(results, instrumentation.results())
+    # Rows superseded by a later shard are coalesced duplicates too.
+    return CSVDataImporter._merge_results(results, {
+        'success_count': int(superseded.sum()),
+        'duplicate_count': int(superseded.sum()),
+    })
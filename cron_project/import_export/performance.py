@@ -0,0 +1,243 @@
+import logging
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the request duration histogram buckets.
+REQUEST_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Normalized SQL is cut to this length in the slow-query log and the metric labels.
+SLOW_QUERY_SQL_LENGTH = 500
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s')
+_PLACEHOLDER_LIST = re.compile(r'\(\?(?:\s*,\s*\?)+\)')
+_REPEATED_TUPLES = re.compile(r'(\(\.\.\.\)|\(\?\))(?:\s*,\s*(?:\(\.\.\.\)|\(\?\)))+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class PerformanceMiddleware:
+    """
+    Records the latency, query count and database time of every request, per view, and
+    logs requests slower than KAYAK_SLOW_REQUEST_SECONDS. Queries slower than
+    KAYAK_SLOW_QUERY_SECONDS go to the slow-query log with the code that ran them.
+    Responses to staff users, or any user with DEBUG on, get a Server-Timing header, so the
+    browser's network panel shows the split; others are not told how the server spends its time.
+    Queries run while a streaming response is consumed (the CSV exports) fall outside the
+    request and are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = _RequestQueries(request)
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        seconds = time.perf_counter() - started
+
+        view = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        request_metrics.observe(view, request.method, response.status_code, seconds, queries.count, queries.seconds)
+        if settings.DEBUG or getattr(getattr(request, 'user', None), 'is_staff', False):
+            response['Server-Timing'] = f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries", total;dur={seconds * 1000:.1f}'
+
+        if seconds >= getattr(settings, 'KAYAK_SLOW_REQUEST_SECONDS', 2.0):
+            logger.warning(
+                "Slow request: %s %s (%s) took %.2fs, %d queries in %.2fs",
+                request.method, request.path, view, seconds, queries.count, queries.seconds,
+            )
+        return response
+
+
+class _RequestQueries:
+    """
+    Database execute wrapper counting a request's queries and sending the slow ones to the
+    slow-query log.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.count = 0
+        self.seconds = 0.0
+        self.threshold = getattr(settings, 'KAYAK_SLOW_QUERY_SECONDS', 0.5)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            self.count += 1
+            self.seconds += seconds
+            if seconds >= self.threshold:
+                resolver_match = self.request.resolver_match
+                slow_queries.record(
+                    normalize_sql(sql), query_origin(), seconds,
+                    resolver_match.view_name if resolver_match else 'unresolved',
+                )
+
+
+class RequestMetrics:
+    """
+    Per-view request counters of this process: requests per method and status, a duration
+    histogram, and the total queries and database time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.views = {}
+
+    def observe(self, view, method, status, seconds, queries, query_seconds):
+        with self._lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            stats = self.views.setdefault(view, {
+                'buckets': [0] * len(REQUEST_DURATION_BUCKETS), 'count': 0, 'seconds': 0.0,
+                'queries': 0, 'query_seconds': 0.0,
+            })
+            for index, bound in enumerate(REQUEST_DURATION_BUCKETS):
+                if seconds <= bound:
+                    stats['buckets'][index] += 1
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['queries'] += queries
+            stats['query_seconds'] += query_seconds
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.requests), {view: {**stats, 'buckets': list(stats['buckets'])} for view, stats in self.views.items()}
+
+
+class SlowQueryLog:
+    """
+    The slow queries of this process, one entry per normalized statement and origin, keeping
+    the KAYAK_SLOW_QUERY_LOG_SIZE most recently seen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def record(self, sql, origin, seconds, view):
+        logger.warning("Slow query (%.3fs) in %s from %s: %s", seconds, view, origin, sql)
+        with self._lock:
+            entry = self.entries.pop((sql, origin), None) or {
+                'sql': sql, 'origin': origin, 'count': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+            }
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            self.entries[(sql, origin)] = entry
+            while len(self.entries) > getattr(settings, 'KAYAK_SLOW_QUERY_LOG_SIZE', 100):
+                self.entries.popitem(last=False)
+
+    def snapshot(self):
+        with self._lock:
+            return [dict(entry) for entry in self.entries.values()]
+
+
+request_metrics = RequestMetrics()
+slow_queries = SlowQueryLog()
+
+
+def normalize_sql(sql):
+    """
+    Reduces a statement to its shape: literals and placeholders become ?, IN lists and
+    multi-row VALUES collapse, and whitespace is squeezed, so that the same query with other
+    values is logged once.
+    """
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = _REPEATED_TUPLES.sub(r'\1, ...', sql)
+    return _WHITESPACE.sub(' ', sql).strip()[:SLOW_QUERY_SQL_LENGTH]
+
+
+def query_origin():
+    """
+    The innermost frame of the project's own code on the stack ("path:line in function"),
+    i.e. the code that ran the query, skipping Django, libraries and this module.
+    """
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        in_project = frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+        if in_project and frame.filename != __file__:
+            return f"{Path(frame.filename).relative_to(base_dir)}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+def prometheus_metrics():
+    """
+    The request metrics and the slow-query log in the Prometheus text exposition format.
+    """
+    requests, views = request_metrics.snapshot()
+    lines = [
+        '# HELP kayak_http_requests_total Requests handled, per view, method and status.',
+        '# TYPE kayak_http_requests_total counter',
+    ]
+    for (view, method, status), count in sorted(requests.items()):
+        lines.append(f'kayak_http_requests_total{_labels(view=view, method=method, status=status)} {count}')
+
+    lines += [
+        '# HELP kayak_http_request_duration_seconds Request latency, per view.',
+        '# TYPE kayak_http_request_duration_seconds histogram',
+    ]
+    for view, stats in sorted(views.items()):
+        for bound, count in zip(REQUEST_DURATION_BUCKETS, stats['buckets']):
+            lines.append(f'kayak_http_request_duration_seconds_bucket{_labels(view=view, le=bound)} {count}')
+        lines += [
+            f'kayak_http_request_duration_seconds_bucket{_labels(view=view, le="+Inf")} {stats["count"]}',
+            f'kayak_http_request_duration_seconds_sum{_labels(view=view)} {stats["seconds"]:.6f}',
+            f'kayak_http_request_duration_seconds_count{_labels(view=view)} {stats["count"]}',
+        ]
+
+    lines += [
+        '# HELP kayak_http_request_queries_total Database queries run by requests, per view.',
+        '# TYPE kayak_http_request_queries_total counter',
+    ]
+    lines += [f'kayak_http_request_queries_total{_labels(view=view)} {stats["queries"]}' for view, stats in sorted(views.items())]
+    lines += [
+        '# HELP kayak_http_request_db_seconds_total Time requests spent in database queries, per view.',
+        '# TYPE kayak_http_request_db_seconds_total counter',
+    ]
+    lines += [f'kayak_http_request_db_seconds_total{_labels(view=view)} {stats["query_seconds"]:.6f}' for view, stats in sorted(views.items())]
+
+    entries = slow_queries.snapshot()
+    lines += [
+        '# HELP kayak_slow_queries_total Queries slower than KAYAK_SLOW_QUERY_SECONDS, per normalized statement and origin.',
+        '# TYPE kayak_slow_queries_total counter',
+    ]
+    lines += [f'kayak_slow_queries_total{_slow_query_labels(entry)} {entry["count"]}' for entry in entries]
+    lines += [
+        '# HELP kayak_slow_query_seconds_total Time spent in each slow query.',
+        '# TYPE kayak_slow_query_seconds_total counter',
+    ]
+    lines += [f'kayak_slow_query_seconds_total{_slow_query_labels(entry)} {entry["seconds"]:.6f}' for entry in entries]
+    lines += [
+        '# HELP kayak_slow_query_max_seconds Slowest run of each slow query.',
+        '# TYPE kayak_slow_query_max_seconds gauge',
+    ]
+    lines += [f'kayak_slow_query_max_seconds{_slow_query_labels(entry)} {entry["max_seconds"]:.6f}' for entry in entries]
+    return '\n'.join(lines) + '\n'
+
+
+def _slow_query_labels(entry):
+    return _labels(query=entry['sql'], origin=entry['origin'])
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from import_export.db_modules.dimensions import clear_caches
+from import_export.models import Hotel, Location
+
+
+@receiver(post_delete, sender=Hotel)
+@receiver(post_delete, sender=Location)
+def forget_deleted_dimensions(sender, **kwargs):
+    """
+    A deleted hotel or location may still be cached by the importers of this process: drop
+    their cached ids. Other processes find out through is_missing_dimension.
+    """
+    clear_caches()
@@ -1,3 +1,997 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import random
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.timezone import make_aware
+
+from import_export.admin import ChartDataPreparer
+from import_export.checks import check_partitioned_transactions
+from import_export.db_modules.dimensions import LRUCache, _hotel_cache, _location_cache, clear_caches, hotel_ids
+from import_export.db_modules.partitions import conflict_fields, delete_moved_rows, is_partitioned, list_partitions
+from import_export.db_modules.rollups import rebuild_rollups, refresh_rollups, touched_months
+from import_export.incremental import commit, get_checkpoint, resume_offset
+from import_export.import_jobs import _Heartbeat, claim_next_job, enqueue_import, fail_stale_jobs, process_import_jobs
+from import_export.management.commands.check_query_plans import Command as CheckQueryPlans
+from import_export.models import DailyRollup, Hotel, ImportJob, KayakTransaction, Location, RevenueRollup
+from import_export.pagination import KeysetPaginator, make_cursor, parse_cursor
+from import_export.parallel_import import ParallelCSVImporter
+from import_export.performance import SLOW_QUERY_SQL_LENGTH, normalize_sql
+from import_export.utils import (
+    DUPLICATE_SAMPLE_COLUMNS, IMPORT_MODE_BULK, IMPORT_MODE_COPY, IMPORT_MODES, REJECT_REASON_COLUMN, CSVDataImporter,
+)
+
+
+def report_rows(*rows):
+    """
+    Raw report rows as read from a CSV, with valid values for the columns a row leaves out.
+    """
+    defaults = {
+        'LeadId': 'lead-1', 'LeadDate': '01/02/2024 10:00:00', 'LeadCheckin': '03/02/2024 00:00:00',
+        'LeadCheckout': '05/02/2024 00:00:00', 'Revenue': '10.50', 'Commission': '1.05',
+        'HotelID': '1001', 'HotelCountry': 'Netherlands', 'HotelCity': 'Amsterdam',
+        'HotelName': 'Canal Hotel', 'BrandID': '561434',
+    }
+    return pd.DataFrame([{**defaults, **row} for row in rows], dtype=object)
+
+
+def counts(success=0, errors=0, inserted=0, updated=0, unchanged=0, duplicates=0):
+    """
+    The counts an import is expected to report (see result_counts).
+    """
+    return {
+        'success_count': success, 'error_count': errors, 'inserted_count': inserted,
+        'updated_count': updated, 'unchanged_count': unchanged, 'duplicate_count': duplicates,
+    }
+
+
+def result_counts(results):
+    """
+    The counts of an import result, without its samples.
+    """
+    return {key: value for key, value in results.items() if key.endswith('_count')}
+
+
+def report_csv(*rows):
+    """
+    A report file holding `rows` (see report_rows).
+    """
+    return io.StringIO(report_rows(*rows).to_csv(index=False))
+
+
+def processed_rows(*rows):
+    """
+    Report rows as the write stage gets them: read, validated and processed. Tests alter them
+    afterwards to reach the database with values that validation keeps out.
+    """
+    df, _ = CSVDataImporter._process_dataframe(next(CSVDataImporter._read_csv_chunks(report_csv(*rows))))
+    return df
+
+
+class BulkUpsertTests(TestCase):
+
+    def test_rows_are_inserted_then_updated(self):
+        results = CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a'}, {'LeadId': 'b'}))
+        self.assertEqual(result_counts(results), counts(success=2, inserted=2))
+
+        results = CSVDataImporter.import_csv_data(report_csv({'LeadId': 'b', 'Revenue': '20'}, {'LeadId': 'c'}))
+        self.assertEqual(result_counts(results), counts(success=2, inserted=1, updated=1))
+        self.assertEqual(KayakTransaction.objects.count(), 3)
+        self.assertEqual(KayakTransaction.objects.get(lead_id='b').revenue, Decimal('20.00'))
+
+    def test_the_last_row_of_a_duplicated_lead_id_wins(self):
+        results = CSVDataImporter.import_csv_data(report_csv(
+            {'LeadId': 'a', 'Revenue': '1'}, {'LeadId': 'a', 'Revenue': '2'},
+        ))
+        self.assertEqual(result_counts(results), counts(success=2, inserted=1, duplicates=1))
+        self.assertEqual(KayakTransaction.objects.get().revenue, Decimal('2.00'))
+
+    def test_a_failed_chunk_is_replayed_row_by_row(self):
+        df = processed_rows({'LeadId': 'a'}, {'LeadId': 'b'}, {'LeadId': 'bad'}, {'LeadId': 'c'}, {'LeadId': 'd'})
+        df.loc[df['LeadId'] == 'bad', 'LeadId'] = 'x' * 256
+
+        with self.assertLogs('import_export', 'WARNING'):
+            results = CSVDataImporter._write_rows(df, IMPORT_MODE_BULK, chunk_size=2)
+        self.assertEqual((results['inserted_count'], results['error_count']), (4, 1))
+        self.assertEqual(
+            sorted(KayakTransaction.objects.values_list('lead_id', flat=True)), ['a', 'b', 'c', 'd'],
+        )
+
+class CopyImportTests(TestCase):
+
+    # Inserts, a re-delivered lead, a row without a location and one the table refuses.
+    FIXTURE = [
+        {'LeadId': 'a'},
+        {'LeadId': 'b', 'Revenue': '3.25', 'HotelCountry': None, 'HotelCity': ' '},
+        {'LeadId': 'a', 'Revenue': '7', 'LeadDate': '2024-03-05 08:30'},
+        {'LeadId': 'c', 'LeadDate': 'yesterday'},
+        {'LeadId': 'd', 'Commission': 'n/a', 'HotelID': None},
+    ]
+
+    def rows(self):
+        # Dimension ids differ between the rolled back runs, so compare what they point to
+        return list(KayakTransaction.objects.order_by('lead_id').values_list(
+            'lead_id', 'lead_date', 'lead_checkin', 'lead_checkout', 'revenue', 'commission',
+            'hotel__hotel_id', 'hotel__name', 'hotel__brand_id', 'location__country', 'location__city', 'location__label',
+        ))
+
+    def test_rows_are_merged_through_the_staging_table(self):
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a'}, {'LeadId': 'b'}), mode=IMPORT_MODE_BULK)
+
+        results = CSVDataImporter.import_csv_data(
+            report_csv({'LeadId': 'b', 'Revenue': '20'}, {'LeadId': 'c'}, {'LeadId': 'd', 'LeadDate': ''}),
+            mode=IMPORT_MODE_COPY,
+        )
+        self.assertEqual(result_counts(results), counts(success=2, errors=1, inserted=1, updated=1))
+        self.assertEqual(
+            list(KayakTransaction.objects.order_by('lead_id').values_list('lead_id', 'revenue')),
+            [('a', Decimal('10.50')), ('b', Decimal('20.00')), ('c', Decimal('10.50'))],
+        )
+
+    def test_a_failed_copy_falls_back_to_the_batched_upsert(self):
+        df = processed_rows({'LeadId': 'a'}, {'LeadId': 'bad'})
+        df.loc[df['LeadId'] == 'bad', 'LeadId'] = 'x' * 256
+
+        with self.assertLogs('import_export', 'WARNING'):
+            results = CSVDataImporter._write_rows(df, IMPORT_MODE_COPY)
+        self.assertEqual((results['inserted_count'], results['error_count']), (1, 1))
+        self.assertEqual(list(KayakTransaction.objects.values_list('lead_id', flat=True)), ['a'])
+
+    def test_every_mode_stores_the_same_rows(self):
+        imports = {}
+        for mode, _ in IMPORT_MODES:
+            with transaction.atomic():
+                results = CSVDataImporter.import_csv_data(report_csv(*self.FIXTURE), mode=mode)
+                imports[mode] = (results, self.rows())
+                transaction.set_rollback(True)
+
+        self.assertEqual(result_counts(imports[IMPORT_MODE_BULK][0]), counts(success=4, errors=1, inserted=3, duplicates=1))
+        self.assertEqual(len(imports[IMPORT_MODE_BULK][1]), 3)
+        for mode, (results, rows) in imports.items():
+            with self.subTest(mode):
+                self.assertEqual(result_counts(results), result_counts(imports[IMPORT_MODE_BULK][0]))
+                self.assertEqual(results['duplicate_samples'], imports[IMPORT_MODE_BULK][0]['duplicate_samples'])
+                self.assertEqual(rows, imports[IMPORT_MODE_BULK][1])
+
+
+class ParseDatesTests(SimpleTestCase):
+
+    def test_day_first_takes_precedence_over_month_first(self):
+        parsed = CSVDataImporter._parse_dates(pd.Series(['01/02/2024 10:00:00']))
+        self.assertEqual(parsed[0], make_aware(datetime(2024, 2, 1, 10)))
+
+    def test_later_formats_parse_what_earlier_ones_cannot(self):
+        parsed = CSVDataImporter._parse_dates(pd.Series([
+            '12/31/2024 10:00:00', '2024-03-05 08:30:00', ' 05/03/2024 08:30 ', '2024-03-05 08:30',
+        ]))
+        self.assertEqual(list(parsed), [
+            make_aware(datetime(2024, 12, 31, 10)), make_aware(datetime(2024, 3, 5, 8, 30)),
+            make_aware(datetime(2024, 3, 5, 8, 30)), make_aware(datetime(2024, 3, 5, 8, 30)),
+        ])
+
+    def test_unreadable_values_are_nat(self):
+        parsed = CSVDataImporter._parse_dates(pd.Series(['yesterday', '31/31/2024 10:00:00', None], dtype=object))
+        self.assertTrue(parsed.isna().all())
+
+    def test_matches_the_row_by_row_parser(self):
+        values = ['01/02/2024 10:00:00', '12/31/2024 10:00', '2024-03-05 08:30:00', 'yesterday']
+        parsed = CSVDataImporter._parse_dates(pd.Series(values))
+        for value, vectorized in zip(values, parsed):
+            expected = CSVDataImporter._parse_date(value)
+            self.assertEqual(None if pd.isna(vectorized) else vectorized, expected)
+
+
+class SupersededLeadIdsTests(SimpleTestCase):
+
+    def test_a_lead_id_belongs_to_the_last_shard_it_appears_in(self):
+        superseded = ParallelCSVImporter._superseded_lead_ids([['a', 'b'], ['b', 'c'], ['c', 'a'], ['d']])
+        self.assertEqual(superseded, [{'a', 'b'}, {'c'}, set(), set()])
+
+    def test_single_shard(self):
+        self.assertEqual(ParallelCSVImporter._superseded_lead_ids([['a', 'a']]), [set()])
+
+
+class ImportJobTests(TestCase):
+
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        settings_override = override_settings(KAYAK_IMPORT_SPOOL_DIR=spool_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def enqueue(self, name, *rows):
+        upload = SimpleUploadedFile(name, report_rows(*rows).to_csv(index=False).encode())
+        return enqueue_import(upload, mode=IMPORT_MODE_BULK)
+
+    def test_the_oldest_pending_job_is_claimed(self):
+        first, second = self.enqueue('first.csv', {}), self.enqueue('second.csv', {})
+        ImportJob.objects.filter(pk=second.pk).update(created_at=first.created_at - timedelta(minutes=1))
+
+        job = claim_next_job()
+        self.assertEqual(job, second)
+        self.assertEqual(job.status, ImportJob.STATUS_RUNNING)
+        self.assertIsNotNone(job.started_at)
+        self.assertEqual(claim_next_job(), first)
+        self.assertIsNone(claim_next_job())
+
+    def test_jobs_run_until_the_queue_is_empty(self):
+        self.enqueue('first.csv', {'LeadId': 'a'}, {'LeadId': 'b'})
+        self.enqueue('second.csv', {'LeadId': 'c'}, {'LeadId': 'x' * 256})
+
+        jobs = process_import_jobs()
+        self.assertEqual(
+            [(job.original_name, job.status, job.total_rows, job.processed_rows, job.success_count, job.error_count)
+             for job in jobs],
+            [('first.csv', ImportJob.STATUS_SUCCEEDED, 2, 2, 2, 0), ('second.csv', ImportJob.STATUS_SUCCEEDED, 2, 2, 1, 1)],
+        )
+        self.assertFalse(any(os.path.exists(job.file_path) for job in jobs))
+        self.assertEqual(KayakTransaction.objects.count(), 3)
+
+    def test_an_unreadable_file_fails_the_job(self):
+        job = self.enqueue('report.csv', {})
+        os.remove(job.file_path)
+
+        job, = process_import_jobs()
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertTrue(job.error)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_jobs_without_a_recent_heartbeat_are_failed(self):
+        stale, alive = self.enqueue('stale.csv', {}), self.enqueue('alive.csv', {})
+        self.assertIsNotNone(claim_next_job().heartbeat_at)
+        claim_next_job()
+        ImportJob.objects.filter(pk=stale.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        with override_settings(KAYAK_IMPORT_JOB_STALE_SECONDS=300):
+            self.assertEqual(fail_stale_jobs(), 1)
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((stale.status, alive.status), (ImportJob.STATUS_FAILED, ImportJob.STATUS_RUNNING))
+        self.assertIsNotNone(stale.finished_at)
+        self.assertTrue(os.path.exists(stale.file_path))
+
+    def test_job_pages_need_view_permission(self):
+        job = self.enqueue('report.csv', {})
+        user = get_user_model().objects.create_user('staff', password='password', is_staff=True)
+        self.client.force_login(user)
+        urls = [
+            reverse(f'admin:import_export_importjob_{name}', args=[job.pk])
+            for name in ('status', 'status_json', 'rejected_rows')
+        ]
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.STATUS_RUNNING, heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+        for url in urls:
+            with self.subTest(url):
+                self.assertEqual(self.client.get(url).status_code, 403)
+        # Only users allowed to see the job make its status poll fail it
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_RUNNING)
+
+        user.user_permissions.add(Permission.objects.get(codename='view_importjob'))
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(urls[1]).json()['status'], ImportJob.STATUS_FAILED)
+
+
+class HeartbeatTests(TransactionTestCase):
+    # The heartbeat thread has a connection of its own, so the job has to be committed
+
+    @override_settings(KAYAK_IMPORT_JOB_HEARTBEAT_SECONDS=0.01)
+    def test_running_jobs_are_kept_alive(self):
+        stale = timezone.now() - timedelta(hours=1)
+        job = ImportJob.objects.create(
+            original_name='report.csv', file_path='report.csv', status=ImportJob.STATUS_RUNNING, heartbeat_at=stale,
+        )
+        heartbeat = _Heartbeat(job)
+        heartbeat.start()
+        time.sleep(0.2)
+        heartbeat.stop()
+
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, stale)
+        self.assertEqual(fail_stale_jobs(), 0)
+
+
+class ResumeOffsetTests(TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.write(b'LeadId\na\nb\n')
+
+    def write(self, data, mode='wb'):
+        with open(self.path, mode) as file:
+            file.write(data)
+
+    def test_a_new_file_starts_at_the_beginning(self):
+        self.assertEqual(resume_offset(self.path, get_checkpoint(self.path)), 0)
+
+    def test_an_unchanged_file_is_skipped(self):
+        checkpoint = commit(self.path, os.path.getsize(self.path))
+        self.assertIsNone(resume_offset(self.path, checkpoint))
+
+    def test_a_grown_file_resumes_at_the_committed_offset(self):
+        offset = os.path.getsize(self.path)
+        checkpoint = commit(self.path, offset)
+        self.write(b'c\n', mode='ab')
+        self.assertEqual(resume_offset(self.path, checkpoint), offset)
+
+    def test_a_run_that_stopped_part_way_resumes(self):
+        checkpoint = commit(self.path, len(b'LeadId\na\n'))
+        self.assertEqual(resume_offset(self.path, checkpoint), len(b'LeadId\na\n'))
+
+    def test_a_rewritten_file_starts_over(self):
+        checkpoint = commit(self.path, os.path.getsize(self.path))
+        self.write(b'LeadId\nx\ny\nz\n', mode='r+b')
+        self.assertEqual(resume_offset(self.path, checkpoint), 0)
+
+    def test_a_truncated_file_starts_over(self):
+        checkpoint = commit(self.path, os.path.getsize(self.path))
+        self.write(b'LeadId\n')
+        self.assertEqual(resume_offset(self.path, checkpoint), 0)
+
+    def test_another_file_at_the_same_path_starts_over(self):
+        checkpoint = commit(self.path, os.path.getsize(self.path))
+        replacement = self.path + '.new'
+        with open(replacement, 'wb') as file:
+            file.write(b'LeadId\na\nb\nc\n')
+        os.replace(replacement, self.path)
+        self.assertEqual(resume_offset(self.path, checkpoint), 0)
+
+
+class RollupTests(TestCase):
+
+    def rollups(self):
+        return list(
+            RevenueRollup.objects.order_by('month', 'hotel_country')
+            .values_list('month', 'hotel_country', 'total_revenue', 'transaction_count')
+        )
+
+    def test_imports_refresh_the_months_they_touch(self):
+        CSVDataImporter.import_csv_data(report_csv(
+            {'LeadId': 'a', 'LeadDate': '15/01/2024 10:00:00'},
+            {'LeadId': 'b', 'Revenue': '5', 'HotelCountry': 'France', 'HotelCity': 'Paris'},
+            {'LeadId': 'c', 'Revenue': '2'},
+        ))
+        self.assertEqual(self.rollups(), [
+            (date(2024, 1, 1), 'Netherlands', Decimal('10.50'), 1),
+            (date(2024, 2, 1), 'France', Decimal('5.00'), 1),
+            (date(2024, 2, 1), 'Netherlands', Decimal('2.00'), 1),
+        ])
+
+        # A row that moves to another month is taken out of its old month as well
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a'}))
+        self.assertEqual(self.rollups(), [
+            (date(2024, 2, 1), 'France', Decimal('5.00'), 1),
+            (date(2024, 2, 1), 'Netherlands', Decimal('12.50'), 2),
+        ])
+
+    def test_refreshed_rollups_match_a_rebuild(self):
+        CSVDataImporter.import_csv_data(report_csv(
+            {'LeadId': 'a', 'LeadDate': '15/01/2024 10:00:00'}, {'LeadId': 'b', 'HotelCountry': None},
+        ), mode=IMPORT_MODE_COPY)
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'b', 'LeadDate': '31/03/2024 23:30:00'}))
+        refreshed = self.rollups()
+
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), refreshed)
+        self.assertEqual(len(refreshed), 2)
+
+    def test_imports_read_in_several_chunks_refresh_once_at_the_end(self):
+        results = CSVDataImporter.import_csv_data(report_csv(
+            {'LeadId': 'a', 'LeadDate': '15/01/2024 10:00:00'}, {'LeadId': 'b'}, {'LeadId': 'c'},
+        ), read_chunk_size=1, defer_rollups=True)
+        self.assertEqual(results['touched_months'], {date(2024, 1, 1), date(2024, 2, 1)})
+        self.assertEqual(self.rollups(), [])
+
+        CSVDataImporter.refresh_touched_rollups(results)
+        self.assertNotIn('touched_months', results)
+        self.assertEqual(self.rollups(), [
+            (date(2024, 1, 1), 'Netherlands', Decimal('10.50'), 1),
+            (date(2024, 2, 1), 'Netherlands', Decimal('21.00'), 2),
+        ])
+
+
+class QueryPlanTests(TestCase):
+    """
+    The hot admin and rollup queries are served by their indexes (see check_query_plans).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # A few months of rows from the start of this month on, stored out of lead_date order
+        # as they are after years of re-imports
+        cls.start = start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        locations = Location.objects.bulk_create([
+            Location(country=country, city=city, label=Location.build_label(country, city))
+            for country, city in [('Aruba', 'Oranjestad')] + [(f'Country {index}', f'City {index}') for index in range(19)]
+        ])
+        hotels = Hotel.objects.bulk_create([Hotel(hotel_id=f'{1000 + index}') for index in range(50)])
+        indexes = list(range(2000))
+        random.Random(0).shuffle(indexes)
+        KayakTransaction.objects.bulk_create([
+            KayakTransaction(
+                lead_id=f'lead-{index}', lead_date=start + timedelta(hours=index),
+                lead_checkin=start + timedelta(days=30), lead_checkout=start + timedelta(days=32),
+                revenue=Decimal('10.00'), commission=Decimal('1.00'),
+                hotel=hotels[index % 50], location=locations[index % 20],
+            )
+            for index in indexes
+        ])
+        refresh_rollups(touched_months(list(KayakTransaction.objects.values_list('lead_id', flat=True))))
+        # Plans are costed from statistics, which fresh test tables do not have yet
+        with connection.cursor() as cursor:
+            for model in (Hotel, Location, KayakTransaction, DailyRollup):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def assertUsesIndexes(self, queryset, index_names):
+        plan = CheckQueryPlans._explain(queryset, planner_choice=False)
+        for name in index_names:
+            self.assertIn(name, plan)
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_admin_filter_and_search_queries_use_their_indexes(self):
+        for label, queryset, index_names in CheckQueryPlans.hot_queries():
+            with self.subTest(label):
+                self.assertUsesIndexes(queryset, index_names)
+
+    def test_rollup_refresh_reads_its_months_through_the_lead_date_index(self):
+        transactions = KayakTransaction.objects.filter(
+            lead_date__gte=self.start, lead_date__lt=self.start + timedelta(days=31),
+        )
+        daily_totals = (
+            transactions.annotate(day=TruncDate('lead_date')).values('day', 'location_id')
+            .annotate(total_revenue=Sum('revenue'), transaction_count=Count('id')).order_by()
+        )
+        self.assertUsesIndexes(daily_totals, ['kayak_tx_lead_date_id_idx'])
+
+    def test_chart_rollups_of_a_date_range_use_the_daily_rollup_index(self):
+        start = self.start.date() + timedelta(days=10)
+        rollups = ChartDataPreparer.rollups(start=start, end=start + timedelta(days=10), granularity='day')
+        self.assertUsesIndexes(rollups, ['unique_daily_rollup_day_location'])
+
+
+class PartitionTests(TestCase):
+
+    def setUp(self):
+        CSVDataImporter.import_csv_data(report_csv(
+            {'LeadId': 'a', 'LeadDate': '15/01/2024 10:00:00'}, {'LeadId': 'b'},
+        ))
+        # The conversion is rolled back with the test; forget that the table was partitioned
+        self.addCleanup(is_partitioned.cache_clear)
+        with connection.cursor() as cursor:
+            # The table cannot be swapped while the foreign key checks of the rows above are pending
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        call_command('partition_transactions', stdout=io.StringIO())
+
+    def stored_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT lead_id, tableoid::regclass::text, revenue FROM {KayakTransaction._meta.db_table} '
+                f'ORDER BY lead_id, lead_date'
+            )
+            return cursor.fetchall()
+
+    def test_existing_rows_are_moved_into_monthly_partitions(self):
+        self.assertTrue(is_partitioned())
+        self.assertEqual(conflict_fields(), ['lead_id', 'lead_date'])
+        self.assertEqual([month for month, _ in list_partitions()], [date(2024, 1, 1), date(2024, 2, 1)])
+        self.assertEqual(self.stored_rows(), [
+            ('a', 'import_export_kayaktransaction_p202401', Decimal('10.50')),
+            ('b', 'import_export_kayaktransaction_p202402', Decimal('10.50')),
+        ])
+
+    def test_imports_create_missing_partitions(self):
+        for mode, _ in IMPORT_MODES:
+            with self.subTest(mode), transaction.atomic():
+                results = CSVDataImporter.import_csv_data(
+                    report_csv({'LeadId': 'c', 'LeadDate': '2024-03-05 08:30'}), mode=mode,
+                )
+                self.assertEqual(result_counts(results), counts(success=1, inserted=1))
+                self.assertIn(('c', 'import_export_kayaktransaction_p202403', Decimal('10.50')), self.stored_rows())
+                transaction.set_rollback(True)
+
+    def test_a_lead_whose_date_moved_is_not_duplicated(self):
+        for mode, _ in IMPORT_MODES:
+            with self.subTest(mode), transaction.atomic():
+                CSVDataImporter.import_csv_data(report_csv(
+                    {'LeadId': 'a', 'Revenue': '7'}, {'LeadId': 'b', 'Revenue': '8'},
+                ), mode=mode)
+                self.assertEqual(self.stored_rows(), [
+                    ('a', 'import_export_kayaktransaction_p202402', Decimal('7.00')),
+                    ('b', 'import_export_kayaktransaction_p202402', Decimal('8.00')),
+                ])
+                self.assertEqual(
+                    list(RevenueRollup.objects.values_list('month', 'total_revenue', 'transaction_count')),
+                    [(date(2024, 2, 1), Decimal('15.00'), 2)],
+                )
+                transaction.set_rollback(True)
+
+    def test_rows_replayed_one_by_one_match_on_lead_id_and_lead_date(self):
+        df = processed_rows({'LeadId': 'a', 'Revenue': '7'}, {'LeadId': 'b', 'Revenue': '8'}, {'LeadId': 'c'})
+        df.loc[2, 'LeadId'] = 'x' * 256
+        with self.assertLogs('import_export', 'WARNING'):
+            results = CSVDataImporter._write_rows(df, IMPORT_MODE_BULK, chunk_size=3)
+        self.assertEqual((results['inserted_count'], results['updated_count'], results['error_count']), (0, 2, 1))
+        self.assertEqual(self.stored_rows(), [
+            ('a', 'import_export_kayaktransaction_p202402', Decimal('7.00')),
+            ('b', 'import_export_kayaktransaction_p202402', Decimal('8.00')),
+        ])
+
+    def test_migrations_altering_the_partitioned_table_are_stopped(self):
+        self.assertEqual(check_partitioned_transactions(None, databases=['default']), [])
+
+        MigrationRecorder.Migration.objects.filter(app='import_export', name='0011_transaction_fingerprint').delete()
+        errors = check_partitioned_transactions(None, databases=['default'])
+        self.assertEqual([error.id for error in errors], ['import_export.E001'])
+        self.assertIn('0011_transaction_fingerprint', errors[0].msg)
+
+    def test_delete_moved_rows_keeps_rows_whose_date_did_not_change(self):
+        stored = dict(KayakTransaction.objects.values_list('lead_id', 'lead_date'))
+        delete_moved_rows(['a', 'b', 'c'], [stored['a'], stored['a'], stored['a']])
+        self.assertEqual([lead_id for lead_id, _, _ in self.stored_rows()], ['a'])
+
+
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        start = make_aware(datetime(2024, 1, 1))
+        # Pairs of rows share a lead_date, so pages also split on the id
+        KayakTransaction.objects.bulk_create([
+            KayakTransaction(
+                lead_id=f'lead-{index}', lead_date=start + timedelta(hours=index // 2),
+                lead_checkin=start, lead_checkout=start, revenue=Decimal('1.00'), commission=Decimal('0.10'),
+            )
+            for index in range(25)
+        ])
+
+    def transactions(self):
+        return KayakTransaction.objects.order_by(*KeysetPaginator.keyset_ordering)
+
+    def test_pages_match_offset_pagination(self):
+        paginator = KeysetPaginator(self.transactions(), 4)
+        expected = Paginator(self.transactions(), 4)
+        self.assertEqual(paginator.num_pages, 7)
+        for number in paginator.page_range:
+            with self.subTest(number):
+                self.assertEqual(list(paginator.page(number)), list(expected.page(number)))
+
+    def test_neighbouring_pages_are_sought_from_a_cursor(self):
+        expected = Paginator(self.transactions(), 4)
+        for number in range(2, 8):
+            with self.subTest(number):
+                previous, current = expected.page(number - 1), expected.page(number)
+                after = KeysetPaginator(self.transactions(), 4, after=make_cursor(previous[-1]))
+                self.assertEqual(list(after.page(number)), list(current))
+                self.assertEqual(after.cursor_params(number - 1, previous, number), {'after': make_cursor(previous[-1])})
+        for number in range(2, 7):
+            with self.subTest(number):
+                following, current = expected.page(number + 1), expected.page(number)
+                before = KeysetPaginator(self.transactions(), 4, before=make_cursor(following[0]))
+                self.assertEqual(list(before.page(number)), list(current))
+
+    def test_malformed_cursors_are_ignored(self):
+        self.assertIsNone(parse_cursor('yesterday,1'))
+        self.assertIsNone(parse_cursor(None))
+        paginator = KeysetPaginator(self.transactions(), 4, after='not-a-cursor')
+        self.assertEqual(list(paginator.page(3)), list(self.transactions()[8:12]))
+
+    def test_other_orderings_use_offset_pagination(self):
+        transactions = KayakTransaction.objects.order_by('lead_id')
+        self.assertEqual(list(KeysetPaginator(transactions, 4).page(3)), list(transactions[8:12]))
+
+    @override_settings(KAYAK_ADMIN_ESTIMATED_COUNT_THRESHOLD=10)
+    def test_unfiltered_counts_are_estimated_above_the_threshold(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {KayakTransaction._meta.db_table}')
+        KayakTransaction.objects.filter(lead_id__in=['lead-0', 'lead-1']).delete()
+
+        self.assertEqual(KeysetPaginator(self.transactions(), 4).count, 25)
+        self.assertEqual(KeysetPaginator(self.transactions().filter(lead_id__startswith='lead-1'), 4).count, 10)
+
+
+class DimensionTests(TestCase):
+
+    def test_imports_store_each_hotel_and_location_once(self):
+        CSVDataImporter.import_csv_data(report_csv(
+            {'LeadId': 'a'},
+            {'LeadId': 'b', 'HotelID': '1002', 'HotelName': 'Dam Hotel', 'HotelCity': ' Amsterdam '},
+            {'LeadId': 'c', 'HotelID': '1001', 'HotelCountry': 'Aruba', 'HotelCity': None},
+        ))
+        self.assertEqual(
+            list(Hotel.objects.order_by('hotel_id').values_list('hotel_id', 'name', 'brand_id')),
+            [('1001', 'Canal Hotel', '561434'), ('1002', 'Dam Hotel', '561434')],
+        )
+        self.assertEqual(
+            list(Location.objects.order_by('country').values_list('country', 'city', 'label')),
+            [('Aruba', '', None), ('Netherlands', 'Amsterdam', 'Amsterdam, Netherlands')],
+        )
+        self.assertEqual(
+            list(KayakTransaction.objects.order_by('lead_id').values_list('hotel__hotel_id', 'location__label')),
+            [('1001', 'Amsterdam, Netherlands'), ('1002', 'Amsterdam, Netherlands'), ('1001', None)],
+        )
+
+    def test_rows_whose_hotel_or_location_cannot_be_stored_are_errors(self):
+        long_city, long_hotel = 'x' * 101, '9' * 256
+        df = processed_rows(
+            {'LeadId': 'a'}, {'LeadId': 'b'}, {'LeadId': 'c'}, {'LeadId': 'd', 'HotelID': '1002', 'HotelCity': 'Utrecht'},
+        )
+        # Values validation rejects, written anyway
+        df = df.astype({'HotelCity': object, 'HotelID': object})
+        df.loc[1, 'HotelCity'], df.loc[2, 'HotelID'] = long_city, long_hotel
+        for mode, _ in IMPORT_MODES:
+            with self.subTest(mode), transaction.atomic():
+                with self.assertLogs('import_export', 'WARNING') as logs:
+                    results = CSVDataImporter._write_rows(df.copy(), mode)
+                self.assertEqual((results['inserted_count'], results['error_count']), (2, 2))
+                self.assertIn(f"Cannot store location ('Netherlands', '{long_city}')", '\n'.join(logs.output))
+                self.assertEqual(
+                    list(KayakTransaction.objects.order_by('lead_id').values_list('lead_id', 'location__city')),
+                    [('a', 'Amsterdam'), ('d', 'Utrecht')],
+                )
+                self.assertEqual(sorted(Hotel.objects.values_list('hotel_id', flat=True)), ['1001', '1002'])
+                transaction.set_rollback(True)
+
+    def test_a_city_too_long_to_store_does_not_stop_the_import(self):
+        with self.assertLogs('import_export', 'WARNING'):
+            results = CSVDataImporter.import_csv_data(report_csv(
+                {'LeadId': 'a'}, {'LeadId': 'b', 'HotelCity': 'x' * 101}, {'LeadId': 'c'},
+            ))
+        self.assertNotIn('error', results)
+        self.assertEqual((results['success_count'], results['error_count']), (2, 1))
+        self.assertEqual(sorted(KayakTransaction.objects.values_list('lead_id', flat=True)), ['a', 'c'])
+
+    def test_a_blank_hotel_name_is_filled_in_later(self):
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a', 'HotelName': None, 'BrandID': None}))
+        self.assertEqual(Hotel.objects.get().name, '')
+
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'b'}, {'LeadId': 'c', 'HotelName': 'Renamed'}))
+        self.assertEqual(list(Hotel.objects.values_list('name', 'brand_id')), [('Canal Hotel', '561434')])
+
+    def test_backfill_fills_in_missing_labels(self):
+        Location.objects.bulk_create([
+            Location(country='Netherlands', city='Amsterdam'), Location(country='Aruba', city=' '),
+        ])
+        call_command('backfill_hotel_location', stdout=io.StringIO())
+        self.assertEqual(
+            list(Location.objects.order_by('country').values_list('label', flat=True)),
+            [None, 'Amsterdam, Netherlands'],
+        )
+
+
+class DimensionCacheTests(TestCase):
+
+    def setUp(self):
+        self.addCleanup(clear_caches)
+        # Foreign keys are checked at commit, which a test never reaches
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    def import_cached(self, *rows, mode=IMPORT_MODE_BULK):
+        # The ids are cached once the import commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return CSVDataImporter.import_csv_data(report_csv(*rows), mode=mode)
+
+    def test_deleting_a_hotel_or_location_clears_the_caches(self):
+        self.import_cached({'LeadId': 'a'})
+        self.assertEqual(hotel_ids({'1001': ('', '')}), {'1001': Hotel.objects.get().pk})
+
+        KayakTransaction.objects.all().delete()
+        DailyRollup.objects.all().delete()
+        Location.objects.all().delete()
+        self.assertEqual(_hotel_cache.get_many(['1001']), ({}, ['1001']))
+        self.assertEqual(_location_cache.get_many([('Netherlands', 'Amsterdam')]), ({}, [('Netherlands', 'Amsterdam')]))
+
+        self.assertEqual(result_counts(self.import_cached({'LeadId': 'b'})), counts(success=1, inserted=1))
+
+    def test_dimensions_deleted_by_another_process_are_resolved_again(self):
+        for mode in (IMPORT_MODE_BULK, IMPORT_MODE_COPY):
+            with self.subTest(mode):
+                self.import_cached({'LeadId': 'a'})
+                # A delete of another process, which the receiver of this one does not see
+                with connection.cursor() as cursor:
+                    for model in (KayakTransaction, DailyRollup, Hotel, Location):
+                        cursor.execute(f'DELETE FROM {model._meta.db_table}')
+
+                with self.assertLogs('import_export', 'WARNING') as logs:
+                    results = self.import_cached({'LeadId': 'b'}, {'LeadId': 'c'}, mode=mode)
+                self.assertEqual(result_counts(results), counts(success=2, inserted=2))
+                self.assertIn('no longer exists', '\n'.join(logs.output))
+                self.assertEqual(KayakTransaction.objects.filter(hotel__hotel_id='1001').count(), 2)
+
+
+class LRUCacheTests(SimpleTestCase):
+
+    def test_the_least_recently_used_keys_are_forgotten(self):
+        cache = LRUCache(maxsize=2)
+        cache.update({'a': 1, 'b': 2})
+        cache.get_many(['a'])
+        cache.update({'c': 3})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), ({'a': 1, 'c': 3}, ['b']))
+
+
+class FingerprintTests(TestCase):
+
+    def row_versions(self):
+        # ctid is the physical row version: an UPDATE, even to the same values, changes it
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT lead_id, ctid::text FROM {KayakTransaction._meta.db_table} ORDER BY lead_id')
+            return cursor.fetchall()
+
+    def test_unchanged_rows_are_not_rewritten(self):
+        rows = [{'LeadId': 'a'}, {'LeadId': 'b', 'HotelCity': None}, {'LeadId': 'c', 'Revenue': '3.333'}]
+        for mode, _ in IMPORT_MODES:
+            with self.subTest(mode), transaction.atomic():
+                CSVDataImporter.import_csv_data(report_csv(*rows), mode=IMPORT_MODE_BULK)
+                versions = self.row_versions()
+
+                results = CSVDataImporter.import_csv_data(report_csv(*rows, {'LeadId': 'd'}), mode=mode)
+                self.assertEqual(result_counts(results), counts(success=4, inserted=1, unchanged=3))
+                self.assertEqual(self.row_versions()[:3], versions)
+                transaction.set_rollback(True)
+
+    def test_changed_rows_are_updated(self):
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a'}, {'LeadId': 'b'}))
+        for mode, _ in IMPORT_MODES:
+            with self.subTest(mode), transaction.atomic():
+                results = CSVDataImporter.import_csv_data(
+                    report_csv({'LeadId': 'a', 'HotelCity': 'Rotterdam'}, {'LeadId': 'b'}), mode=mode,
+                )
+                self.assertEqual(result_counts(results), counts(success=2, updated=1, unchanged=1))
+                self.assertEqual(KayakTransaction.objects.get(lead_id='a').location.city, 'Rotterdam')
+                transaction.set_rollback(True)
+
+    def test_rows_without_a_fingerprint_are_rewritten_once(self):
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a'}))
+        KayakTransaction.objects.update(fingerprint=None)
+
+        results = CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a'}))
+        self.assertEqual(result_counts(results), counts(success=1, updated=1))
+        self.assertIsNotNone(KayakTransaction.objects.get().fingerprint)
+        results = CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a'}))
+        self.assertEqual(result_counts(results), counts(success=1, unchanged=1))
+
+
+class CoalesceDuplicatesTests(SimpleTestCase):
+
+    def rows(self, *rows):
+        df = report_rows(*({'LeadId': lead_id, 'Revenue': revenue} for lead_id, revenue, _ in rows))
+        df['Fingerprint'] = [fingerprint for _, _, fingerprint in rows]
+        return df
+
+    def test_the_last_row_of_each_lead_id_is_kept(self):
+        with self.assertLogs('import_export.utils', 'WARNING'):
+            df, results = CSVDataImporter._coalesce_duplicates(self.rows(
+                ('a', '1', 1), ('b', '2', 2), ('a', '3', 3), ('c', '4', 4), ('a', '5', 5),
+            ))
+        self.assertEqual(list(df['LeadId']), ['b', 'c', 'a'])
+        self.assertEqual(list(df['Revenue']), ['2', '4', '5'])
+        self.assertEqual(results['success_count'], 2)
+        self.assertEqual(results['duplicate_count'], 2)
+
+    def test_only_conflicting_duplicates_are_sampled(self):
+        with self.assertLogs('import_export.utils', 'WARNING'):
+            _, results = CSVDataImporter._coalesce_duplicates(self.rows(
+                ('a', '1', 1), ('b', '2', 2), ('a', '3', 3), ('b', '2', 2),
+            ))
+        self.assertEqual([sample['lead_id'] for sample in results['duplicate_samples']], ['a'])
+        rows = results['duplicate_samples'][0]['rows']
+        self.assertEqual([row['Revenue'] for row in rows], ['1', '3'])
+        self.assertEqual(list(rows[0]), DUPLICATE_SAMPLE_COLUMNS)
+
+    @override_settings(KAYAK_DUPLICATE_SAMPLE_SIZE=1)
+    def test_samples_are_capped(self):
+        with self.assertLogs('import_export.utils', 'WARNING'):
+            _, results = CSVDataImporter._coalesce_duplicates(self.rows(
+                ('a', '1', 1), ('b', '2', 2), ('a', '3', 3), ('b', '4', 4),
+            ))
+        self.assertEqual(results['duplicate_count'], 2)
+        self.assertEqual(len(results['duplicate_samples']), 1)
+
+    def test_no_duplicates(self):
+        df, results = CSVDataImporter._coalesce_duplicates(self.rows(('a', '1', 1), ('b', '2', 2)))
+        self.assertEqual(len(df), 2)
+        self.assertEqual(results, {'success_count': 0, 'duplicate_count': 0, 'duplicate_samples': []})
+
+
+class RejectReasonsTests(SimpleTestCase):
+
+    def reject_reasons(self, raw):
+        _, rejected = CSVDataImporter._process_dataframe(raw)
+        return rejected[REJECT_REASON_COLUMN].to_dict()
+
+    def test_valid_rows_are_not_rejected(self):
+        self.assertEqual(self.reject_reasons(report_rows({}, {'LeadId': 'lead-2', 'Revenue': None})), {})
+
+    def test_each_rule_rejects_its_rows(self):
+        reasons = self.reject_reasons(report_rows(
+            {},
+            {'LeadId': ' '},
+            {'LeadId': 'x' * 256},
+            {'LeadDate': '2024-13-45'},
+            {'Revenue': 'ten'},
+            {'Commission': '100000000'},
+            {'Revenue': '-1'},
+            {'HotelID': '9' * 256},
+            {'HotelCountry': 'x' * 101},
+            {'HotelCity': 'x' * 101},
+            {'HotelCity': ' %s ' % ('x' * 100)},
+        ))
+        self.assertEqual(reasons, {
+            1: 'missing LeadId',
+            2: 'LeadId longer than 255 characters',
+            3: 'invalid LeadDate',
+            4: 'non-numeric Revenue',
+            5: 'Commission out of range',
+            6: 'negative Revenue',
+            7: 'HotelID longer than 255 characters',
+            8: 'HotelCountry longer than 100 characters',
+            9: 'HotelCity longer than 100 characters',
+        })
+
+    def test_a_row_lists_every_reason_it_fails(self):
+        reasons = self.reject_reasons(report_rows({'LeadId': None, 'LeadCheckout': '', 'Revenue': '-5'}))
+        self.assertEqual(reasons, {0: 'missing LeadId; invalid LeadCheckout; negative Revenue'})
+
+    def test_rejected_rows_are_counted_per_reason(self):
+        with self.assertLogs('import_export.utils', 'WARNING'):
+            results = CSVDataImporter._rejected_results(CSVDataImporter._process_dataframe(report_rows(
+                {'LeadId': None}, {'LeadId': None, 'Revenue': '-1'}, {},
+            ))[1])
+        self.assertEqual(results, {'error_count': 2, 'reject_reasons': {'missing LeadId': 2, 'negative Revenue': 1}})
+
+
+class BenchmarkImportTests(TestCase):
+
+    def benchmark(self, **options):
+        # The command quiets the import warnings of its run
+        logger = logging.getLogger('import_export')
+        self.addCleanup(logger.setLevel, logger.level)
+        stdout = io.StringIO()
+        call_command('benchmark_import', rows=500, read_chunk_size=200, stdout=stdout, **options)
+        return json.loads(stdout.getvalue())
+
+    def test_the_benchmark_leaves_no_rows_hotels_or_locations_behind(self):
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a'}))
+        for options in [{}, {'mode': IMPORT_MODE_COPY}, {'rollback': True}]:
+            with self.subTest(**options):
+                report = self.benchmark(**options)
+                self.assertEqual(list(report['stages']), ['read', 'parse', 'clean', 'write'])
+                self.assertEqual(report['stages']['read']['rows'], 500)
+                self.assertEqual(report['results']['success_count'] + report['results']['error_count'], 500)
+                self.assertEqual(list(KayakTransaction.objects.values_list('lead_id', flat=True)), ['a'])
+                self.assertEqual((Hotel.objects.count(), Location.objects.count()), (1, 1))
+
+
+class NormalizeSqlTests(SimpleTestCase):
+
+    def test_literals_and_placeholders_become_question_marks(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t1 WHERE name = 'O''Hara' AND id = %s AND revenue > 10.5 AND x = %(x)s"),
+            "SELECT * FROM t1 WHERE name = ? AND id = ? AND revenue > ? AND x = ?",
+        )
+
+    def test_in_lists_and_values_collapse(self):
+        self.assertEqual(normalize_sql('SELECT * FROM t WHERE id IN (%s, %s, %s)'), 'SELECT * FROM t WHERE id IN (...)')
+        self.assertEqual(
+            normalize_sql('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (...), ...',
+        )
+
+    def test_same_shape_for_other_values(self):
+        self.assertEqual(
+            normalize_sql('SELECT  *\n FROM t WHERE id IN (1, 2)'),
+            normalize_sql('SELECT * FROM t WHERE id IN (3, 4, 5, 6)'),
+        )
+
+    def test_long_statements_are_cut(self):
+        self.assertEqual(len(normalize_sql('SELECT ' + 'a, ' * 1000 + 'b FROM t')), SLOW_QUERY_SQL_LENGTH)
+
+
+class ServerTimingTests(TestCase):
+
+    def test_only_staff_get_server_timing_unless_debug_is_on(self):
+        url = reverse('admin:login')
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        with override_settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get(url))
+
+        self.client.force_login(get_user_model().objects.create_user('staff', password='password', is_staff=True))
+        self.assertRegex(self.client.get(reverse('admin:index'))['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries"')
+
+
+class ChartApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'a'}, {'LeadId': 'b', 'HotelCountry': 'Aruba'}))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('admin:import_export_kayaktransaction_chart_data', args=['monthly-revenue'])
+
+    def test_series_are_sent_with_an_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['series'], 'monthly-revenue')
+        self.assertTrue(response['ETag'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_a_matching_etag_gets_a_304_until_the_data_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        CSVDataImporter.import_csv_data(report_csv({'LeadId': 'c'}))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_each_series_and_filter_has_its_own_etag(self):
+        etags = {
+            self.client.get(self.url)['ETag'],
+            self.client.get(self.url, {'country': 'Aruba'})['ETag'],
+            self.client.get(reverse('admin:import_export_kayaktransaction_chart_data', args=['commission']))['ETag'],
+        }
+        self.assertEqual(len(etags), 3)
+
+    def test_bad_filters_get_a_400_without_an_etag(self):
+        response = self.client.get(self.url, {'start': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response)
+
+    def test_anonymous_requests_get_no_data(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('ETag', response)
+
+
+class ParseFiltersTests(SimpleTestCase):
+
+    def parse(self, query):
+        return ChartDataPreparer.parse_filters(QueryDict(query))
+
+    def test_defaults(self):
+        self.assertEqual(self.parse(''), {
+            'start': None, 'end': None, 'countries': [], 'cities': [], 'granularity': 'month',
+        })
+
+    def test_dates_and_months(self):
+        filters = self.parse('start=2024-01-15&end=2024-02')
+        self.assertEqual((filters['start'], filters['end']), (date(2024, 1, 15), date(2024, 2, 29)))
+        filters = self.parse('start=2024-02&end=2024-03-10&granularity=week')
+        self.assertEqual((filters['start'], filters['end']), (date(2024, 2, 1), date(2024, 3, 10)))
+        self.assertEqual(filters['granularity'], 'week')
+
+    def test_countries_and_cities_are_deduplicated(self):
+        filters = self.parse('country=NL&country=&country=AW&country=NL&city=Amsterdam')
+        self.assertEqual(filters['countries'], ['AW', 'NL'])
+        self.assertEqual(filters['cities'], ['Amsterdam'])
+
+    def test_invalid_filters(self):
+        for query in ['granularity=year', 'start=yesterday', 'end=2024-13', 'start=2024-03&end=2024-02-28']:
+            with self.subTest(query), self.assertRaises(ValueError):
+                self.parse(query)
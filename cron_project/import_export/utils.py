@@ -1,8 +1,85 @@
+import logging
+import os
+
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from django.utils.timezone import make_aware
-from .models import KayakTransaction
-from .db_modules.upsert_transactions import upsert_transaction_data
+from django.conf import settings
+from django.utils.timezone import get_current_timezone, make_aware
+from .models import Hotel, KayakTransaction, Location
+from .db_modules.upsert_transactions import bulk_upsert_transaction_data, stored_fingerprints
+from .db_modules.copy_transactions import copy_upsert_transaction_data
+from .db_modules.dimensions import clear_caches, hotel_ids, is_missing_dimension, location_ids
+from .db_modules.partitions import ensure_partitions, months_of
+from .db_modules.rollups import refresh_rollups, touched_months
+from .data_version import bump_data_version
+from .instrumentation import ImportInstrumentation, merge_stage_timings
+
+logger = logging.getLogger(__name__)
+
+# Import modes: batched INSERT ... ON CONFLICT, or COPY into a staging table and merge.
+IMPORT_MODE_BULK = 'bulk'
+IMPORT_MODE_COPY = 'copy'
+IMPORT_MODES = (
+    (IMPORT_MODE_BULK, 'Batched upsert'),
+    (IMPORT_MODE_COPY, 'PostgreSQL COPY (large files)'),
+)
+
+# Accepted date formats, in order of precedence (day-first before month-first).
+DATE_FORMATS = [
+    '%d/%m/%Y %H:%M:%S', '%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S',
+    '%d/%m/%Y %H:%M', '%m/%d/%Y %H:%M', '%Y-%m-%d %H:%M'
+]
+
+DATE_COLUMNS = ['LeadDate', 'LeadCheckin', 'LeadCheckout']
+
+# DataFrame column -> KayakTransaction field. HotelRef and LocationRef are not read from the
+# CSV: _resolve_dimensions derives them from the hotel and location columns.
+CSV_FIELD_MAP = {
+    'LeadId': 'lead_id',
+    'LeadDate': 'lead_date',
+    'LeadCheckin': 'lead_checkin',
+    'LeadCheckout': 'lead_checkout',
+    'Revenue': 'revenue',
+    'Commission': 'commission',
+    'HotelRef': 'hotel_id',
+    'LocationRef': 'location_id',
+    'Fingerprint': 'fingerprint',
+}
+
+# Columns read from the CSV and their dtypes. Revenue and Commission are read as text and
+# converted in _process_dataframe, so that a bad value rejects its row instead of failing the read.
+CSV_DTYPES = {
+    'LeadId': str,
+    'LeadDate': str,
+    'LeadCheckin': str,
+    'LeadCheckout': str,
+    'Revenue': str,
+    'Commission': str,
+    'HotelID': str,
+    'HotelCountry': 'category',
+    'HotelCity': 'category',
+    'HotelName': 'category',
+    'BrandID': str,
+}
+
+# Columns of CSV_DTYPES that older reports may not have; they are read as missing values.
+OPTIONAL_COLUMNS = ['HotelName', 'BrandID']
+
+# Column of the rejected-rows CSV holding the reasons a row was rejected for, '; '-separated.
+REJECT_REASON_COLUMN = 'RejectReason'
+
+# Columns shown for each row of the conflicting duplicates reported by _coalesce_duplicates.
+DUPLICATE_SAMPLE_COLUMNS = [
+    'LeadId', 'LeadDate', 'LeadCheckin', 'LeadCheckout', 'Revenue', 'Commission',
+    'HotelID', 'HotelCountry', 'HotelCity',
+]
+
+# Processed columns whose values end up on the KayakTransaction row, hashed into its fingerprint.
+FINGERPRINT_COLUMNS = [
+    'LeadDate', 'LeadCheckin', 'LeadCheckout', 'Revenue', 'Commission',
+    'HotelID', 'HotelCountry', 'HotelCity',
+]
 
 
 class CSVDataImporter:
@@ -12,65 +89,390 @@ class CSVDataImporter:
     """
 
     @staticmethod
-    def import_csv_data(csv_file):
+    def import_csv_data(csv_file, chunk_size=None, mode=None, read_chunk_size=None, progress_callback=None,
+                        rejected_file=None, instrumentation=None, defer_rollups=False):
         """
         Main method to import CSV data into the database.
-        Returns a dictionary with counts of successes and errors.
+        The file is streamed in chunks of `read_chunk_size` rows (defaults to
+        settings.KAYAK_IMPORT_READ_CHUNK_SIZE); each chunk is processed and written before
+        the next one is read, so memory use does not grow with the file size.
+        `mode` is one of IMPORT_MODES (defaults to settings.KAYAK_IMPORT_MODE). In bulk mode rows
+        are upserted in batches of `chunk_size` (defaults to settings.KAYAK_IMPORT_CHUNK_SIZE).
+        If given, `progress_callback` is called with the running totals after every chunk.
+        Rows that fail validation are never sent to the database; they are counted as errors, per
+        reason in reject_reasons, and appended with their reasons to the `rejected_file` CSV if given.
+        Each stage (read, parse, clean, write) is measured by `instrumentation` (defaults to
+        ImportInstrumentation.from_settings()); its timings are returned as stage_timings.
+        The rollups of the months the file touched are refreshed once, at the end; with
+        `defer_rollups` they are returned as touched_months instead, for a caller importing a
+        file in several parts to pass to refresh_touched_rollups once it is done.
+        Returns a dictionary with counts of successes and errors over the whole file.
         """
+        mode = mode or getattr(settings, 'KAYAK_IMPORT_MODE', IMPORT_MODE_BULK)
+        if mode not in dict(IMPORT_MODES):
+            return {'success_count': 0, 'error_count': 0, 'error': f"Unknown import mode: {mode}"}
+
+        instrumentation = instrumentation or ImportInstrumentation.from_settings()
+        results = {'success_count': 0, 'error_count': 0}
         try:
-            df = pd.read_csv(csv_file)
+            with instrumentation.run():
+                chunks = CSVDataImporter._read_csv_chunks(csv_file, read_chunk_size)
+                while True:
+                    with instrumentation.stage('read') as timing:
+                        df = next(chunks, None)
+                        timing['rows'] += 0 if df is None else len(df)
+                    if df is None:
+                        break
+                    CSVDataImporter._merge_results(
+                        results, CSVDataImporter._import_chunk(df, mode, chunk_size, rejected_file, instrumentation),
+                    )
+                    results.update(instrumentation.results())
+                    if progress_callback:
+                        progress_callback(results)
+                    if 'error' in results:
+                        break
         except Exception as e:
-            print(f"Error reading CSV file: {e}")
-            return {'success_count': 0, 'error_count': 1, 'error': str(e)}
+            logger.exception("Error reading CSV file")
+            CSVDataImporter._merge_results(results, {'success_count': 0, 'error_count': 1, 'error': str(e)})
+
+        if not defer_rollups:
+            with instrumentation.stage('write'):
+                CSVDataImporter.refresh_touched_rollups(results)
+        results.update(instrumentation.results())
+        if rejected_file and results.get('reject_reasons'):
+            results['rejected_file'] = str(rejected_file)
+        return results
 
+    @staticmethod
+    def refresh_touched_rollups(results):
+        """
+        Refreshes the rollups of the months an import touched, popped from
+        results['touched_months'], and bumps the data version that caches of aggregated data
+        are keyed by. A failure is recorded as the import's error.
+        """
+        months = results.pop('touched_months', set())
+        if not months:
+            return results
         try:
-            df = CSVDataImporter._process_dataframe(df)
+            refresh_rollups(months)
+            bump_data_version()
         except Exception as e:
-            print(f"Error processing DataFrame: {e}")
-            return {'success_count': 0, 'error_count': len(df) if 'df' in locals() else 1, 'error': str(e)}
+            logger.exception("Error refreshing the revenue rollups")
+            CSVDataImporter._merge_results(results, {'error': str(e)})
+        return results
+
+    @staticmethod
+    def _read_csv_chunks(csv_file, read_chunk_size=None):
+        """
+        Yields DataFrames of at most `read_chunk_size` rows, reading only the columns the
+        model uses. Repeated hotel text is loaded as categoricals to keep chunks small.
+        """
+        read_chunk_size = read_chunk_size or getattr(settings, 'KAYAK_IMPORT_READ_CHUNK_SIZE', 50000)
+        with pd.read_csv(csv_file, usecols=CSVDataImporter._use_column, dtype=CSV_DTYPES, chunksize=read_chunk_size) as reader:
+            yield from reader
 
-        success_count, error_count = 0, 0
+    @staticmethod
+    def _use_column(column):
+        return column in CSV_DTYPES
 
-        for _, row in df.iterrows():
+    @staticmethod
+    def _import_chunk(df, mode, chunk_size=None, rejected_file=None, instrumentation=None):
+        """
+        Processes and writes one chunk, timing the parse, clean and write stages with
+        `instrumentation` if given. Returns a result dictionary for the chunk; success_count
+        covers inserted, updated and unchanged rows as well as the duplicates that were coalesced,
+        error_count the rows rejected by validation and the rows the database refused.
+        """
+        instrumentation = instrumentation or ImportInstrumentation()
+        rows = len(df)
+        try:
+            with instrumentation.stage('parse', rows):
+                df, raw = CSVDataImporter._parse_dataframe(df)
+            with instrumentation.stage('clean', rows):
+                df, rejected = CSVDataImporter._clean_dataframe(df, raw)
+                if rejected_file:
+                    CSVDataImporter._write_rejected(rejected, rejected_file)
+                df, duplicates = CSVDataImporter._coalesce_duplicates(df)
+        except Exception as e:
+            logger.exception("Error processing DataFrame")
+            return {'success_count': 0, 'error_count': rows, 'error': str(e)}
+
+        try:
+            with instrumentation.stage('write', len(df)):
+                results = CSVDataImporter._write_rows(df, mode, chunk_size)
+        except Exception as e:
+            logger.exception("Error writing rows to the database")
+            return {'success_count': 0, 'error_count': rows, 'error': str(e)}
+        CSVDataImporter._merge_results(results, duplicates)
+        return CSVDataImporter._merge_results(results, CSVDataImporter._rejected_results(rejected))
+
+    @staticmethod
+    def _rejected_results(rejected):
+        """
+        Result dictionary of the rows rejected by validation: they count as errors, and
+        reject_reasons counts them per reason (a row rejected for two reasons counts for both).
+        """
+        if rejected.empty:
+            return {'error_count': 0}
+        reasons = rejected[REJECT_REASON_COLUMN].str.split('; ').explode().value_counts()
+        reject_reasons = {reason: int(count) for reason, count in reasons.items()}
+        logger.warning("Rejected %d rows: %s", len(rejected), reject_reasons)
+        return {'error_count': len(rejected), 'reject_reasons': reject_reasons}
+
+    @staticmethod
+    def _write_rejected(rejected, rejected_file):
+        """
+        Appends rejected rows to the rejected-rows CSV, writing the header when the file is new.
+        """
+        if rejected.empty:
+            return
+        header = not os.path.exists(rejected_file) or os.path.getsize(rejected_file) == 0
+        rejected.to_csv(rejected_file, mode='a', header=header, index=False)
+
+    @staticmethod
+    def _coalesce_duplicates(df):
+        """
+        Keeps only the last row of each LeadId: a batch may not hit the same lead_id twice, and
+        the earlier rows would only be overwritten. Duplicates in different chunks are written in
+        file order, so over the whole file the last row wins as well.
+        Returns the deduplicated DataFrame and a result dictionary: the coalesced rows count as
+        processed (success_count and duplicate_count), and duplicate_samples lists up to
+        KAYAK_DUPLICATE_SAMPLE_SIZE LeadIds whose rows disagree, with all of their rows in file order.
+        """
+        superseded = df.duplicated('LeadId', keep='last')
+        duplicate_count = int(superseded.sum())
+        results = {'success_count': duplicate_count, 'duplicate_count': duplicate_count, 'duplicate_samples': []}
+        if not duplicate_count:
+            return df, results
+
+        # Identical re-deliveries of a row are not worth an audit; rows that disagree are sampled,
+        # since all but the last of them are dropped
+        duplicates = df[df['LeadId'].isin(df.loc[superseded, 'LeadId'])]
+        versions = duplicates.groupby('LeadId', sort=False)['Fingerprint'].nunique()
+        sample_size = getattr(settings, 'KAYAK_DUPLICATE_SAMPLE_SIZE', 5)
+        for lead_id in versions[versions > 1].index[:sample_size]:
+            rows = duplicates.loc[duplicates['LeadId'] == lead_id, DUPLICATE_SAMPLE_COLUMNS].astype(str)
+            sample = {'lead_id': lead_id, 'rows': rows.to_dict('records')}
+            logger.warning("Coalesced conflicting rows of LeadId %s, keeping the last one: %s", lead_id, sample['rows'])
+            results['duplicate_samples'].append(sample)
+
+        return df[~superseded], results
+
+    @staticmethod
+    def _merge_results(results, chunk_results):
+        """
+        Adds the counts of one chunk to the running totals in place; the first error (and
+        rejected-rows file and profile) is kept, reject reasons are added up per reason, stage
+        timings per stage, touched months are joined, and duplicate samples are collected up to
+        KAYAK_DUPLICATE_SAMPLE_SIZE.
+        """
+        for key, value in chunk_results.items():
+            if key in ('error', 'rejected_file', 'profile_file'):
+                results.setdefault(key, value)
+            elif key == 'stage_timings':
+                merge_stage_timings(results.setdefault(key, {}), value)
+            elif key == 'reject_reasons':
+                reasons = results.setdefault(key, {})
+                for reason, count in value.items():
+                    reasons[reason] = reasons.get(reason, 0) + count
+            elif key == 'touched_months':
+                results[key] = results.get(key, set()) | value
+            elif key == 'duplicate_samples':
+                sample_size = getattr(settings, 'KAYAK_DUPLICATE_SAMPLE_SIZE', 5)
+                results[key] = (results.get(key, []) + value)[:sample_size]
+            else:
+                results[key] = results.get(key, 0) + value
+        return results
+
+    @staticmethod
+    def _write_rows(df, mode, chunk_size=None):
+        """
+        Writes the processed rows with the selected import mode. The months the rows were in
+        before and after the write are returned as touched_months, for refresh_touched_rollups.
+        Rows whose lead_id is stored with the same fingerprint are left out, so re-imported
+        rows that did not change cost one lookup and no write.
+        If the COPY path fails as a whole, the rows are retried through the batched upsert,
+        which isolates the failing rows and keeps the per-row error counts. If a hotel or location
+        was deleted after its id was cached, the ids are resolved again and the rows written once more.
+        Rows whose hotel or location the database refuses to store count as errors.
+        On a partitioned table, missing monthly partitions are created first.
+        Returns a result dictionary; success_count is the sum of the inserted, updated and
+        unchanged counts.
+        """
+        months = set()
+        df, unresolved_count = CSVDataImporter._resolve_dimensions(df)
+        stored = stored_fingerprints(df['LeadId'].dropna().tolist())
+        is_new = ~df['LeadId'].isin(stored.keys())
+        unchanged = ~is_new & df['LeadId'].map(stored).eq(df['Fingerprint'])
+        new_lead_ids = set(df.loc[is_new, 'LeadId'])
+        unchanged_count = int(unchanged.sum())
+        df = df[~unchanged]
+
+        inserted_count, updated_count, error_count = 0, 0, 0
+        if not df.empty:
+            lead_ids = df['LeadId'].dropna().tolist()
+            months = touched_months(lead_ids)
+            ensure_partitions(months_of(df['LeadDate']))
+
+            try:
+                counts = CSVDataImporter._upsert_rows(df, mode, chunk_size, new_lead_ids)
+            except Exception as e:
+                if not is_missing_dimension(e):
+                    raise
+                logger.warning("A cached hotel or location no longer exists, resolving them again: %s", e)
+                clear_caches()
+                df, retry_unresolved_count = CSVDataImporter._resolve_dimensions(df)
+                unresolved_count += retry_unresolved_count
+                counts = CSVDataImporter._upsert_rows(df, mode, chunk_size, new_lead_ids)
+            inserted_count, updated_count, error_count = counts
+            # Rows the COPY merge still found unchanged (e.g. just written by a concurrent import)
+            unchanged_count += len(df) - inserted_count - updated_count - error_count
+
+            months |= touched_months(lead_ids)
+
+        return {
+            'success_count': inserted_count + updated_count + unchanged_count,
+            'error_count': error_count + unresolved_count,
+            'inserted_count': inserted_count,
+            'updated_count': updated_count,
+            'unchanged_count': unchanged_count,
+            'touched_months': months,
+        }
+
+    @staticmethod
+    def _upsert_rows(df, mode, chunk_size, new_lead_ids):
+        """
+        Upserts the rows with the selected import mode, falling back from COPY to the batched
+        upsert. Returns an (inserted_count, updated_count, error_count) tuple.
+        """
+        if mode == IMPORT_MODE_COPY:
             try:
-                upsert_transaction_data(
-                    lead_id=row['LeadId'],
-                    lead_date=row['LeadDate'],
-                    lead_checkin=row['LeadCheckin'],
-                    lead_checkout=row['LeadCheckout'],
-                    revenue=row['Revenue'],
-                    commission=row['Commission'],
-                    hotel_id=row['HotelID'],  # Assuming hotel_id is not available in the CSV
-                    hotel_country=row['HotelCountry'],
-                    hotel_city=row['HotelCity']
+                return copy_upsert_transaction_data(
+                    df[list(CSV_FIELD_MAP)].rename(columns=CSV_FIELD_MAP), new_lead_ids=new_lead_ids,
                 )
-                success_count += 1
             except Exception as e:
-                print(f"Error processing row with LeadId {row.get('LeadId', 'Unknown')}: {e}")
-                error_count += 1
+                if is_missing_dimension(e):
+                    raise
+                logger.warning("COPY import failed, falling back to batched upsert: %s", e)
+        return bulk_upsert_transaction_data(
+            CSVDataImporter._to_records(df), chunk_size=chunk_size, new_lead_ids=new_lead_ids,
+        )
 
-        return {'success_count': success_count, 'error_count': error_count}
+    @staticmethod
+    def _to_records(df):
+        """
+        Converts the processed DataFrame into a list of dicts keyed by model field name,
+        with missing values (NaN/NaT) turned into None.
+        """
+        df = df[list(CSV_FIELD_MAP)].rename(columns=CSV_FIELD_MAP).astype(object)
+        return df.where(df.notna(), None).to_dict('records')
 
     @staticmethod
     def _process_dataframe(df):
         """
         Processes the DataFrame: applies data transformations and validations.
+        Returns (valid rows, rejected rows). Rejected rows keep the values read from the CSV,
+        with the reasons they were rejected for in the REJECT_REASON_COLUMN column.
+        """
+        df, raw = CSVDataImporter._parse_dataframe(df)
+        return CSVDataImporter._clean_dataframe(df, raw)
+
+    @staticmethod
+    def _parse_dataframe(df):
+        """
+        First half of _process_dataframe: checks the columns and converts the dates and
+        amounts from text. Returns the parsed DataFrame and a copy of the values as read.
         """
+        missing = [column for column in CSV_DTYPES if column not in df]
+        required = [column for column in missing if column not in OPTIONAL_COLUMNS]
+        if required:
+            raise ValueError(f"Missing CSV columns: {', '.join(required)}")
+        for column in missing:
+            df[column] = None
+        raw = df[list(CSV_DTYPES)].copy()
+
         # Apply date parsing
-        for date_column in ['LeadDate', 'LeadCheckin', 'LeadCheckout']:
-            df[date_column] = df[date_column].apply(CSVDataImporter._parse_date)
+        for date_column in DATE_COLUMNS:
+            df[date_column] = CSVDataImporter._parse_dates(df[date_column])
 
+        # Ensure Revenue and Commission are numeric; missing amounts are 0 (see _clean_dataframe)
+        df['Revenue'] = pd.to_numeric(df['Revenue'], errors='coerce')
+        df['Commission'] = pd.to_numeric(df['Commission'], errors='coerce')
+        return df, raw
+
+    @staticmethod
+    def _clean_dataframe(df, raw):
+        """
+        Second half of _process_dataframe: cleans the hotel text, sets the invalid rows aside
+        and fingerprints the valid ones. Returns (valid rows, rejected rows).
+        """
         # Clean and validate hotel data
-        df[['HotelCountry', 'HotelCity']] = df[['HotelCountry', 'HotelCity']].apply(
-            lambda row: CSVDataImporter._clean_hotel_data(row['HotelCountry'], row['HotelCity']),
-            axis=1, result_type='expand'
-        )
+        for text_column in ['HotelCountry', 'HotelCity', 'HotelID', 'HotelName', 'BrandID']:
+            df[text_column] = CSVDataImporter._clean_text(df[text_column])
+
+        reasons = CSVDataImporter._reject_reasons(df, raw)
+        invalid = df.index.isin(reasons.index)
+        rejected = raw[invalid].assign(**{REJECT_REASON_COLUMN: reasons})
+        df = df[~invalid].copy()
+
+        df['Revenue'] = df['Revenue'].fillna(0.0)
+        df['Commission'] = df['Commission'].fillna(0.0)
+        df['Fingerprint'] = CSVDataImporter._fingerprints(df)
+        return df, rejected
+
+    @staticmethod
+    def _reject_reasons(df, raw):
+        """
+        Checks every row against what the database would refuse, one vectorized mask per rule,
+        so bad rows are set aside before any database work. Returns the '; '-separated reasons
+        of the invalid rows, indexed like `df`. `raw` holds the values as read from the CSV.
+        """
+        lead_ids = df['LeadId'].astype(object).where(df['LeadId'].notna(), None)
+        lead_id_length = KayakTransaction._meta.get_field('lead_id').max_length
+        checks = {
+            'missing LeadId': lead_ids.isna() | lead_ids.str.strip().eq(''),
+            f'LeadId longer than {lead_id_length} characters': lead_ids.str.len().gt(lead_id_length),
+        }
+        # Cleaned hotel text as stored in the Hotel and Location tables
+        for column, field in [
+            ('HotelID', Hotel._meta.get_field('hotel_id')),
+            ('HotelCountry', Location._meta.get_field('country')),
+            ('HotelCity', Location._meta.get_field('city')),
+        ]:
+            checks[f'{column} longer than {field.max_length} characters'] = (
+                df[column].astype(object).str.len().gt(field.max_length)
+            )
+        for column in DATE_COLUMNS:
+            checks[f'invalid {column}'] = df[column].isna()
+        for column in ['Revenue', 'Commission']:
+            field = KayakTransaction._meta.get_field(column.lower())
+            checks[f'non-numeric {column}'] = df[column].isna() & raw[column].notna()
+            checks[f'{column} out of range'] = df[column].round(field.decimal_places).abs().ge(
+                10 ** (field.max_digits - field.decimal_places)
+            )
+        checks['negative Revenue'] = df['Revenue'].lt(0)
 
-        # Ensure Revenue and Commission are numeric
-        df['Revenue'] = pd.to_numeric(df['Revenue'], errors='coerce').fillna(0.0)
-        df['Commission'] = pd.to_numeric(df['Commission'], errors='coerce').fillna(0.0)
+        checks = pd.DataFrame(checks).fillna(False).astype(bool)
+        failed = checks[checks.any(axis=1)]
+        reasons = pd.Series('', index=failed.index, dtype=object)
+        for reason in failed.columns[failed.any()]:
+            reasons = reasons.mask(failed[reason], reasons + np.where(reasons.eq(''), '', '; ') + reason)
+        return reasons
 
-        return df
+    @staticmethod
+    def _fingerprints(df):
+        """
+        Hashes the FINGERPRINT_COLUMNS of every row into a signed 64-bit integer (what a
+        BigIntegerField stores). Values are normalized the way they are stored: amounts are
+        rounded to cents, and missing hotel text hashes like an empty string.
+        """
+        values = df[FINGERPRINT_COLUMNS].copy()
+        for column in ['Revenue', 'Commission']:
+            values[column] = values[column].round(2)
+        for column in ['HotelID', 'HotelCountry', 'HotelCity']:
+            values[column] = values[column].astype(object).fillna('')
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        return pd.Series(hashes.view('int64'), index=df.index)
 
     @staticmethod
     def _parse_date(date_str):
@@ -81,11 +483,7 @@ class CSVDataImporter:
         if pd.isna(date_str) or not isinstance(date_str, str):
             return None
 
-        formats = [
-            '%d/%m/%Y %H:%M:%S', '%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S',
-            '%d/%m/%Y %H:%M', '%m/%d/%Y %H:%M', '%Y-%m-%d %H:%M'
-        ]
-        for fmt in formats:
+        for fmt in DATE_FORMATS:
             try:
                 dt = datetime.strptime(date_str.strip(), fmt)
                 return make_aware(dt)
@@ -94,11 +492,77 @@ class CSVDataImporter:
         return None
 
     @staticmethod
-    def _clean_hotel_data(hotel_country, hotel_city):
+    def _parse_dates(series):
+        """
+        Vectorized counterpart of _parse_date for a whole column.
+        Each format is tried over the rows that earlier formats left unparsed, so the
+        precedence of DATE_FORMATS is kept. Values are localized to the current timezone
+        once per column. Returns a timezone-aware datetime Series with NaT for failures.
+        """
+        parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+        try:
+            # Non-string cells become NaN and are never parsed, as in _parse_date
+            values = series.str.strip()
+        except AttributeError:
+            values = pd.Series(None, index=series.index, dtype=object)
+
+        remaining = values.notna()
+        for fmt in DATE_FORMATS:
+            if not remaining.any():
+                break
+            attempt = pd.to_datetime(values[remaining], format=fmt, errors='coerce')
+            parsed[attempt.index] = attempt
+            remaining &= parsed.isna()
+
+        # Like make_aware(), resolve ambiguous wall times to the first (DST) occurrence
+        return parsed.dt.tz_localize(
+            get_current_timezone(),
+            ambiguous=np.ones(len(parsed), dtype=bool),
+            nonexistent='shift_forward',
+        )
+
+    @staticmethod
+    def _clean_text(series):
+        """
+        Validates and cleans a hotel text column (country, city): values are stripped and
+        missing values stay missing. Categorical columns are cleaned once per category.
+        """
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series.map(lambda value: str(value).strip(), na_action='ignore')
+        return series.astype(str).str.strip().where(series.notna(), None)
+
+    @staticmethod
+    def _resolve_dimensions(df):
         """
-        Validates and cleans hotel data (country, city).
+        Replaces the hotel and location text of the rows by Hotel and Location ids (the
+        HotelRef and LocationRef columns). Each distinct value is resolved once per chunk,
+        through the in-process caches and one bulk get-or-create for the values not cached.
+        Returns the rows and the number of rows left out because the database refused to store
+        their hotel or location.
         """
-        hotel_country = str(hotel_country).strip() if pd.notna(hotel_country) else None
-        hotel_city = str(hotel_city).strip() if pd.notna(hotel_city) else None
+        countries = df['HotelCountry'].astype(object).fillna('')
+        cities = df['HotelCity'].astype(object).fillna('')
+        codes, pairs = pd.MultiIndex.from_arrays([countries, cities]).factorize()
+        ids = location_ids(list(pairs))
+        df['LocationRef'] = pd.array([ids.get(pair) for pair in pairs], dtype='Int64').take(codes)
+        unresolved = df['LocationRef'].isna()
 
-        return hotel_country, hotel_city
+        hotel_codes = df['HotelID'].astype(object)
+        has_hotel = hotel_codes.notna() & hotel_codes.ne('')
+        details = (
+            df.loc[has_hotel, ['HotelID', 'HotelName', 'BrandID']]
+            .astype(object)
+            .groupby('HotelID', sort=False)
+            .first()
+            .fillna('')
+        )
+        ids = hotel_ids({
+            code: (name[:255], brand_id[:64])
+            for code, name, brand_id in details.itertuples(name=None)
+        })
+        df['HotelRef'] = hotel_codes.where(has_hotel).map(ids).astype('Int64')
+        unresolved |= has_hotel & df['HotelRef'].isna()
+        if unresolved.any():
+            logger.warning("Refused %d rows whose hotel or location could not be stored", int(unresolved.sum()))
+            df = df[~unresolved]
+        return df, int(unresolved.sum())
@@ -3,12 +3,15 @@ from django.urls import reverse_lazy
 from django.views.generic import TemplateView
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
-from django.db.models import Sum, Count
+from django.db.models import Sum
 from django.shortcuts import render
-from .models import KayakTransaction  # Add this import
-from django.db.models.functions import TruncMonth
-import plotly.graph_objects as go
-import pandas as pd
+from django.http import HttpResponse
+from django.core.cache import cache
+from django.contrib import admin
+from .admin import chart_urls
+from .models import RevenueRollup
+from .data_version import get_data_version
+from .performance import prometheus_metrics
 
 def home(request):
     return render(request, 'admin/custom_login.html')
@@ -26,52 +29,55 @@ class CustomAdminLoginView(LoginView):
         return super().form_invalid(form)
     
 
+@staff_member_required
+def metrics(request):
+    """
+    Request metrics and slow queries of this worker process, in Prometheus text format.
+    """
+    return HttpResponse(prometheus_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @method_decorator(staff_member_required, name='dispatch')
 class DashboardView(TemplateView):
     template_name = 'admin/dashboard.html'
+    # Entries are keyed by the data version, so they only need to expire to free memory
+    cache_timeout = 24 * 60 * 60
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
-        # Get transactions data
-        transactions = KayakTransaction.objects.all()
-        
-        # Monthly revenue
-        monthly_revenue = (
-            transactions
-            .annotate(month=TruncMonth('lead_date'))
-            .values('month')
-            .annotate(
-                total_revenue=Sum('revenue'),
-                total_commission=Sum('commission')
-            )
-            .order_by('month')
+
+        # Charts and stats only change when imports bump the data version
+        cache_key = f"dashboard:{get_data_version()}"
+        dashboard = cache.get(cache_key)
+        if dashboard is None:
+            dashboard = self._build_dashboard()
+            cache.set(cache_key, dashboard, self.cache_timeout)
+
+        context.update(dashboard)
+        context.update(admin.site.each_context(self.request), title="Dashboard", chart_urls=chart_urls())
+        return context
+
+    @staticmethod
+    def _build_dashboard():
+        """
+        Summary statistics and the countries of the chart filter, from the monthly rollups.
+        The charts themselves are loaded by the page from the chart API.
+        """
+        totals = RevenueRollup.objects.aggregate(
+            total_revenue=Sum('total_revenue'),
+            total_commission=Sum('total_commission'),
+            transaction_count=Sum('transaction_count'),
         )
-        
-        # Create revenue graph
-        df = pd.DataFrame(monthly_revenue)
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=df['month'],
-            y=df['total_revenue'],
-            name='Revenue',
-            line=dict(color='#4F46E5')
-        ))
-        fig.add_trace(go.Scatter(
-            x=df['month'],
-            y=df['total_commission'],
-            name='Commission',
-            line=dict(color='#EC4899')
-        ))
-        
-        context['revenue_chart'] = fig.to_html(
-            full_html=False,
-            config={'displayModeBar': False}
+        countries = (
+            RevenueRollup.objects
+            .exclude(hotel_country=None)
+            .values_list('hotel_country', flat=True)
+            .distinct()
+            .order_by('hotel_country')
         )
-        
-        # Add summary statistics
-        context['total_transactions'] = transactions.count()
-        context['total_revenue'] = transactions.aggregate(Sum('revenue'))['revenue__sum']
-        context['avg_commission'] = transactions.aggregate(Sum('commission'))['commission__sum']
-        
-        return context
\ No newline at end of file
+        return {
+            'total_transactions': totals['transaction_count'] or 0,
+            'total_revenue': totals['total_revenue'],
+            'avg_commission': totals['total_commission'],
+            'countries': list(countries),
+        }